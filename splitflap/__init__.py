@@ -1,7 +1,48 @@
-from . import utils, models, controller, ui
-from .models import *
+'''
+Split flap displays for Maya.
 
-# Load SOuP plugin
-from maya import cmds
-if not cmds.pluginInfo('SOuP', q=True, loaded=True):
-    cmds.loadPlugin('SOuP')
+Only the Maya-free core is imported with the package, layout, uv, mesh, lod,
+timeline, cost, stream, feed, manifest and shading need numpy at most so
+batch tools and tests can use them outside Maya. Modules using pymel, Qt or
+the splitflap nodes plugin are imported on first access, like
+splitflap.models or splitflap.SplitFlapWall, and plugins are loaded when a
+wall is first built.
+'''
+import importlib
+import sys
+from . import (
+    layout, uv, mesh, lod, timeline, cost, stream, feed, manifest, shading,
+)
+
+MAYA_MODULES = (
+    'utils', 'models', 'controller', 'ui', 'textures', 'video', 'scene',
+    'export', 'live', 'splitflap_nodes', 'bake',
+)
+
+# Names resolved from models, everything else is an AttributeError
+MODEL_NAMES = (
+    'SplitFlap', 'SplitFlapWall', 'BACKENDS', 'load_manifest',
+    'compare_backends', 'compare_rigs',
+)
+
+
+def __getattr__(name):
+    if name in MAYA_MODULES:
+        return importlib.import_module('.' + name, __name__)
+
+    if name in MODEL_NAMES:
+        models = importlib.import_module('.models', __name__)
+        return getattr(models, name)
+
+    raise AttributeError(
+        'module {!r} has no attribute {!r}'.format(__name__, name)
+    )
+
+
+# Module __getattr__ needs Python 3.7, import everything up front before
+if sys.version_info < (3, 7):
+    from . import (
+        utils, models, controller, ui, textures, video, scene, export,
+        live, splitflap_nodes, bake,
+    )
+    from .models import *
@@ -0,0 +1,174 @@
+'''
+Bake the nCloth of a SplitFlapWall in parallel local mayapy processes.
+
+Each tile of the bake is a chunk of the wall, see SplitFlapWall.create.
+Chunks have their own cloth and collider meshes, so their simulations are
+independent. A worker opens the saved scene and turns off the dynamics of
+every other tile. It runs pre-roll frames before the range and writes a
+geometry cache of its tile's cloth. The caches are then attached to the
+wall, which plays them back instead of simulating.
+'''
+from __future__ import division, print_function
+import multiprocessing
+import os
+import time
+import pymel.core as pm
+from . import utils
+from .models import SplitFlapWall
+from .textures import get_pool
+from .ui import ProgressBar
+
+
+def get_nucleus(ncloth):
+    '''Get the nucleus solving an nCloth shape.'''
+    return ncloth.currentState.outputs(type='nucleus')[0]
+
+
+def get_nrigids(collider):
+    '''Get the nRigid shapes of a collider mesh.'''
+    shape = collider.getShape(noIntermediate=True)
+    return shape.worldMesh.outputs(type='nRigid')
+
+
+def get_cache_path(output_dir, name, tile):
+    '''Get the xml path of a tile's geometry cache.'''
+    return os.path.join(output_dir, '{}_tile{:02d}.xml'.format(name, tile))
+
+
+def bake_tile(job):
+    '''
+    Simulate one tile of a wall and write a geometry cache of its cloth.
+    Runs in a worker process started by bake_wall.
+
+    :param job: Dict describing the tile created by bake_wall
+    :returns: (tile, cache path, seconds)
+    '''
+
+    s = time.time()
+    tile = job['tile']
+    pm.openFile(job['scene'], force=True)
+    wall = SplitFlapWall(pm.PyNode(job['wall']))
+
+    ncloth_shapes = wall.ncloth_shapes
+    for k, (ncloth, collider) in enumerate(
+            zip(ncloth_shapes, wall.collider_chunks)):
+        if k == tile:
+            continue
+        ncloth.isDynamic.set(False)
+        for nrigid in get_nrigids(collider):
+            nrigid.isDynamic.set(False)
+
+    # Simulate the pre-roll frames so the cache starts mid motion
+    start, end = job['start'], job['end']
+    first = start - job['pre_roll']
+    get_nucleus(ncloth_shapes[tile]).startFrame.set(first)
+    for frame in range(first, start):
+        pm.currentTime(frame, update=True)
+
+    path = get_cache_path(job['output_dir'], job['name'], tile)
+    cloth = wall.cloth_chunks[tile].getShape(noIntermediate=True)
+    pm.cacheFile(
+        fileName=os.path.splitext(os.path.basename(path))[0],
+        directory=job['output_dir'],
+        points=cloth.name(),
+        startTime=start,
+        endTime=end,
+        format='OneFile'
+    )
+    return tile, path, time.time() - s
+
+
+def attach_caches(wall, paths):
+    '''
+    Play geometry caches back on the cloth of every chunk and turn off
+    their nCloth.
+
+    :param wall: SplitFlapWall object
+    :param paths: Cache xml path of every chunk
+    '''
+
+    for ncloth, cloth, path in zip(wall.ncloth_shapes, wall.cloth_chunks,
+                                   paths):
+        shape = cloth.getShape(noIntermediate=True)
+        pm.mel.doImportCacheFile(
+            path.replace('\\', '/'),
+            'xmlcache',
+            [shape.name()],
+            []
+        )
+        ncloth.isDynamic.set(False)
+
+
+def bake_wall(wall, start, end, output_dir, pre_roll=10, processes=None,
+              attach=True):
+    '''
+    Bake every tile of a dynamic wall in its own mayapy process. Workers
+    open the saved scene, so save before baking. Build walls with chunks to
+    bake them in parallel, a wall with one chunk is one tile.
+
+    :param wall: SplitFlapWall object, see make_dynamic
+    :param start: First frame
+    :param end: Last frame, inclusive
+    :param output_dir: Directory to write the caches to
+    :param pre_roll: Number of frames simulated before start
+    :param processes: Number of worker processes (default: one per tile,
+        at most the cpu count)
+    :param attach: Attach the caches to the wall when done
+    :returns: Dict of tile index to (cache path, seconds), and the total
+        seconds under "seconds"
+    '''
+
+    scene = pm.sceneName()
+    if not scene or pm.isModified():
+        raise RuntimeError('Save the scene before baking, workers open it')
+    if not wall.is_dynamic:
+        raise RuntimeError('{} is not dynamic'.format(wall.pynode))
+
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+
+    name = wall.pynode.nodeName()
+    jobs = [
+        dict(
+            scene=scene,
+            wall=wall.pynode.longName(),
+            tile=tile,
+            start=int(start),
+            end=int(end),
+            pre_roll=int(pre_roll),
+            output_dir=os.path.abspath(output_dir),
+            name=name,
+        )
+        for tile in range(wall.number_of_chunks)
+    ]
+    processes = processes or min(len(jobs), multiprocessing.cpu_count())
+
+    ProgressBar.setup(
+        title='Baking Split Flap Wall',
+        text='Baking {} tiles...'.format(len(jobs)),
+        maximum=len(jobs),
+        parent=utils.get_maya_window()
+    )
+
+    s = time.time()
+    results = {}
+    pool = get_pool(processes)
+    try:
+        for tile, path, seconds in pool.imap_unordered(bake_tile, jobs):
+            results[tile] = path, seconds
+            ProgressBar.set(
+                len(results),
+                'Baked tile {} in {:.1f}s'.format(tile, seconds)
+            )
+        pool.close()
+    except BaseException:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+        ProgressBar.hide()
+
+    if attach:
+        attach_caches(wall, [results[k][0] for k in sorted(results)])
+    results['seconds'] = time.time() - s
+    return results
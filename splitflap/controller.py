@@ -1,7 +1,12 @@
+import os
+import time
+from contextlib import contextmanager
 import pymel.core as pm
-from .ui import Dialog
-from .utils import undo_chunk, get_maya_window
+from maya.api import OpenMaya
+from .ui import Dialog, ProgressBar, BuildCanceled
+from .utils import undo_chunk, tracked_build, get_maya_window
 from .models import SplitFlapWall, SplitFlap
+from . import cost
 from functools import partial
 
 
@@ -12,6 +17,53 @@ class SplitFlapDialog(Dialog):
 
         self.generate_base_flaps.clicked.connect(self.create_base_flaps)
         self.generate_wall.clicked.connect(self.create_wall)
+        self._selection_callback = None
+
+    def showEvent(self, event):
+        if self._selection_callback is None:
+            self._selection_callback = OpenMaya.MEventMessage.addEventCallback(
+                'SelectionChanged',
+                lambda *args: self.update_estimate()
+            )
+        self.update_estimate()
+        super(SplitFlapDialog, self).showEvent(event)
+
+    def hideEvent(self, event):
+        if self._selection_callback is not None:
+            OpenMaya.MMessage.removeCallback(self._selection_callback)
+            self._selection_callback = None
+        super(SplitFlapDialog, self).hideEvent(event)
+
+    @contextmanager
+    def build_context(self):
+        '''
+        Build with the progress dialog shown. Undoable builds are undone on
+        failure or cancel, others delete the nodes they created.
+        '''
+
+        context = tracked_build()
+        if self.undoable.isChecked():
+            context = undo_chunk(auto_undo=True)
+        with ProgressBar.shown(), context:
+            yield
+
+    def base_mesh_stats(self):
+        # A selected split flap or wall knows its base flaps
+        for node in pm.selected(type='dagNode'):
+            for parent in [node] + node.getAllParents():
+                if parent.hasAttr('split_flap_wall'):
+                    return SplitFlapWall(parent).split_flap.base_mesh_stats
+                if parent.hasAttr('split_flap'):
+                    return SplitFlap(parent).base_mesh_stats
+
+        meshes = pm.ls(sl=True, dag=True, type='mesh', noIntermediate=True)
+        if not meshes:
+            return None
+
+        # Base flaps are chosen at random, estimate with the average
+        vertices = sum(m.numVertices() for m in meshes) / len(meshes)
+        faces = sum(m.numFaces() for m in meshes) / len(meshes)
+        return int(vertices), int(faces)
 
     def create_base_flaps(self):
 
@@ -21,14 +73,18 @@ class SplitFlapDialog(Dialog):
             pm.headsUpMessage(msg)
             raise Exception('Select a base mesh to use for the flaps')
 
-        with undo_chunk(auto_undo=True):
-            SplitFlap.create(
-                base_flaps=selection,
-                num_images=self.num_images.value(),
-                rows=self.rows.value(),
-                columns=self.columns.value(),
-                radius=self.radius.value(),
-            )
+        try:
+            with self.build_context():
+                SplitFlap.create(
+                    base_flaps=selection,
+                    num_images=self.num_images.value(),
+                    rows=self.rows.value(),
+                    columns=self.columns.value(),
+                    radius=self.radius.value(),
+                    packing='dense' if self.dense_uvs.isChecked() else 'grid',
+                )
+        except BuildCanceled:
+            pm.headsUpMessage('Build canceled')
 
     def create_wall(self):
         selection = pm.selected()
@@ -37,11 +93,64 @@ class SplitFlapDialog(Dialog):
             pm.headsUpMessage(msg)
             raise Exception(msg)
 
-        with undo_chunk(auto_undo=True):
-            SplitFlapWall.create(
-                SplitFlap(selection[0]),
-                padding=(self.padding.value(), -self.padding.value() * 0.5)
-            ).make_dynamic()
+        split_flap = SplitFlap(selection[0])
+        start_memory = pm.memory(heapMemory=True, megaByte=True)
+        start = time.time()
+
+        # Publish a manifest next to the scene when asked to
+        manifest = None
+        scene_path = pm.sceneName()
+        if self.write_manifest.isChecked():
+            if scene_path:
+                manifest = os.path.join(
+                    os.path.dirname(scene_path),
+                    'manifests'
+                )
+            else:
+                pm.warning('Skipping the manifest of an unsaved scene')
+
+        # Builds that can't be undone take the faster OpenMaya backend
+        backend = self.backend()
+
+        try:
+            with self.build_context():
+                wall = SplitFlapWall.create(
+                    split_flap,
+                    padding=(
+                        self.padding.value(),
+                        -self.padding.value() * 0.5
+                    ),
+                    manifest=manifest,
+                    backend=backend
+                )
+                wall.make_dynamic()
+        except BuildCanceled:
+            pm.headsUpMessage('Build canceled')
+            return
+
+        if not self.calibrate.isChecked():
+            return
+
+        # Record the build to calibrate the cost model
+        build_seconds = time.time() - start
+        memory = pm.memory(heapMemory=True, megaByte=True) - start_memory
+        base_vertices, base_faces = split_flap.base_mesh_stats
+        cost.record_timing(
+            dict(
+                rows=split_flap.number_of_rows.get(),
+                columns=split_flap.number_of_columns.get(),
+                num_images=split_flap.number_of_images.get(),
+                base_vertices=base_vertices,
+                base_faces=base_faces,
+                rig=wall.rig,
+                backend=backend,
+            ),
+            build_seconds=build_seconds,
+            frame_seconds=wall.time_frames(1, 5, dynamics=True),
+            bytes=memory * 1024 ** 2,
+        )
+        self.cost_model = cost.CostModel()
+        self.update_estimate()
 
 
 def show(cache=[]):
@@ -0,0 +1,203 @@
+'''
+Pre-flight cost model for split flap builds.
+
+Geometry and node counts follow directly from the build parameters. Build
+time, per-frame simulation time and memory are linear in those counts, with
+coefficients calibrated from timings recorded by previous builds.
+'''
+from __future__ import division, print_function
+import json
+import os
+import numpy as np
+
+
+# Helper geometry created by SplitFlap.create per image and per split flap
+CLOTH_VERTICES_PER_IMAGE = 4
+CLOTH_FACES_PER_IMAGE = 1
+COLLIDER_VERTICES = 24
+COLLIDER_FACES = 20
+
+# Nodes created per wall cell by rig and backend. Every rig has a joint and
+# animCurve, the constraint rig adds 6 rot groups, a locator transform and
+# shape and a parentConstraint. The pymel backend duplicates a flap
+# transform and shape per cell, openmaya creates each chunk's flaps at once.
+NODES_PER_CELL = {
+    ('constraint', 'pymel'): 13,
+    ('constraint', 'openmaya'): 11,
+    ('matrix', 'pymel'): 4,
+    ('matrix', 'openmaya'): 2,
+}
+NODES_PER_WALL = 40
+
+# Features and coefficients of each linear model
+MODELS = {
+    'build_seconds': ('cells', 'vertices', 'constant'),
+    'frame_seconds': ('cloth_vertices', 'cells', 'constant'),
+    'bytes': ('vertices', 'nodes', 'constant'),
+}
+DEFAULT_COEFFICIENTS = {
+    'build_seconds': {'cells': 0.05, 'vertices': 2e-6, 'constant': 2.0},
+    'frame_seconds': {
+        'cloth_vertices': 4e-6,
+        'cells': 1e-4,
+        'constant': 0.02,
+    },
+    'bytes': {'vertices': 300, 'nodes': 8192, 'constant': 0},
+}
+
+
+def get_timings_path():
+    '''Get the path of the recorded build timings.'''
+
+    return os.environ.get(
+        'SPLITFLAP_TIMINGS',
+        os.path.join(os.path.expanduser('~'), '.splitflap', 'timings.json')
+    )
+
+
+def features(rows, columns, num_images, base_vertices, base_faces,
+             rig='constraint', backend='pymel'):
+    '''
+    Get the geometry and node counts of a wall.
+
+    :param rows: Number of rows in layout
+    :param columns: Number of columns in layout
+    :param num_images: Number of images in sequence
+    :param base_vertices: Vertex count of the base flap mesh
+    :param base_faces: Face count of the base flap mesh
+    :param rig: Rig type of the wall, see SplitFlapWall.create
+    :param backend: Backend building the wall, see SplitFlapWall.create
+    '''
+
+    cells = rows * columns
+    flap_vertices = num_images * base_vertices
+    flap_faces = num_images * base_faces
+    cloth_vertices = num_images * CLOTH_VERTICES_PER_IMAGE
+    cloth_faces = num_images * CLOTH_FACES_PER_IMAGE
+    return dict(
+        cells=cells,
+        vertices=cells * (flap_vertices + cloth_vertices + COLLIDER_VERTICES),
+        faces=cells * (flap_faces + cloth_faces + COLLIDER_FACES),
+        cloth_vertices=cells * cloth_vertices,
+        nodes=cells * NODES_PER_CELL[rig, backend] + NODES_PER_WALL,
+        constant=1,
+    )
+
+
+def load_timings(path=None):
+    '''Load recorded build timings.'''
+
+    path = path or get_timings_path()
+    if not os.path.isfile(path):
+        return []
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def record_timing(params, path=None, **measured):
+    '''
+    Record measured costs of a build.
+
+    :param params: Dict of keyword arguments to features
+    :param measured: Measured build_seconds, frame_seconds or bytes
+    '''
+
+    path = path or get_timings_path()
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+
+    timings = load_timings(path)
+    timings.append(dict(params=params, **measured))
+    with open(path, 'w') as f:
+        json.dump(timings, f, indent=4)
+
+
+def calibrate(timings):
+    '''
+    Fit model coefficients to recorded timings with non-negative least
+    squares. Models without enough records keep their default coefficients.
+
+    :param timings: List of records, see record_timing
+    '''
+
+    coefficients = dict(
+        (name, dict(values)) for name, values in DEFAULT_COEFFICIENTS.items()
+    )
+    for name, names in MODELS.items():
+        records = [t for t in timings if t.get(name) is not None]
+        if len(records) < len(names):
+            continue
+
+        x = np.array([
+            [features(**t['params'])[n] for n in names] for t in records
+        ], dtype=np.float64)
+        y = np.array([t[name] for t in records], dtype=np.float64)
+
+        # Drop negative terms until every coefficient is non-negative
+        active = list(range(len(names)))
+        while active:
+            solution = np.linalg.lstsq(x[:, active], y, rcond=None)[0]
+            if (solution >= 0).all():
+                break
+            active.pop(int(np.argmin(solution)))
+
+        values = dict((n, 0.0) for n in names)
+        for i, value in zip(active, solution if active else []):
+            values[names[i]] = float(value)
+        coefficients[name] = values
+    return coefficients
+
+
+class CostModel(object):
+    '''
+    Predicts the cost of building a wall.
+
+    :param coefficients: Model coefficients (default: calibrated from the
+        recorded timings)
+    '''
+
+    def __init__(self, coefficients=None):
+        if coefficients is None:
+            coefficients = calibrate(load_timings())
+        self.coefficients = coefficients
+
+    def estimate(self, rows, columns, num_images, base_vertices, base_faces,
+                 rig='constraint', backend='pymel'):
+        '''
+        Estimate counts, memory and times of a wall.
+
+        :returns: Dict of features plus build_seconds, frame_seconds and bytes
+        '''
+
+        result = features(
+            rows,
+            columns,
+            num_images,
+            base_vertices,
+            base_faces,
+            rig,
+            backend
+        )
+        for name, names in MODELS.items():
+            values = self.coefficients[name]
+            result[name] = sum(values[n] * result[n] for n in names)
+        return result
+
+
+def format_bytes(value):
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if value < 1024:
+            return '{:.1f} {}'.format(value, unit)
+        value /= 1024
+    return '{:.1f} TB'.format(value)
+
+
+def format_seconds(value):
+    minutes, seconds = divmod(int(round(value)), 60)
+    hours, minutes = divmod(minutes, 60)
+    if hours:
+        return '{}h {:02d}m'.format(hours, minutes)
+    if minutes:
+        return '{}m {:02d}s'.format(minutes, seconds)
+    return '{:.1f}s'.format(value)
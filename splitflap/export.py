@@ -0,0 +1,323 @@
+'''
+Export SplitFlapWalls for downstream renderers and playback engines.
+
+Walls are written as a single prototype flap mesh plus per-cell arrays, so
+file size grows with the number of cells rather than the merged flaps_geo.
+USD PointInstancers are written when pxr is available, otherwise Alembic
+points with arbitrary geometry parameters. Flap rotations can also be
+written as a binary stream, see stream.py.
+'''
+from __future__ import division, print_function
+import math
+import pymel.core as pm
+from maya.api import OpenMaya
+from . import utils
+from .stream import StreamWriter
+
+try:
+    from pxr import Usd, UsdGeom, Sdf, Vt, Gf
+except ImportError:
+    Usd = None
+
+try:
+    import alembic
+    import imath
+except ImportError:
+    alembic = None
+
+
+def get_dag_paths(nodes):
+    '''Get MDagPaths for a list of pymel.PyNode dag nodes.'''
+
+    selection = OpenMaya.MSelectionList()
+    for node in nodes:
+        selection.add(node.name())
+    return [selection.getDagPath(i) for i in range(selection.length())]
+
+
+def get_prototype(split_flap):
+    '''
+    Get the mesh data of a SplitFlap's flaps geometry.
+
+    :returns: Dict with points, counts, indices, uvs and uv_indices
+    '''
+
+    dag_path = get_dag_paths([split_flap.flaps])[0]
+    mesh = OpenMaya.MFnMesh(dag_path)
+    counts, indices = mesh.getVertices()
+    uv_counts, uv_indices = mesh.getAssignedUVs()
+    us, vs = mesh.getUVs()
+    return dict(
+        points=[tuple(p)[:3] for p in mesh.getPoints()],
+        counts=list(counts),
+        indices=list(indices),
+        uvs=list(zip(us, vs)),
+        uv_indices=list(uv_indices),
+    )
+
+
+def sample_cells(wall):
+    '''
+    Sample the world transform and flap index of every cell of a wall at
+    the current time.
+
+    :returns: Dict with positions, orientations as (w, x, y, z) quaternions
+        and flap_indices, in row, column order
+    '''
+
+    num_images = wall.number_of_images.get()
+    locators = get_dag_paths(wall.cell_xforms)
+    joints = get_dag_paths(wall.anim_joints)
+
+    positions = []
+    orientations = []
+    for dag_path in locators:
+        matrix = OpenMaya.MTransformationMatrix(dag_path.inclusiveMatrix())
+        positions.append(tuple(matrix.translation(OpenMaya.MSpace.kWorld)))
+        q = matrix.rotation(asQuaternion=True)
+        orientations.append((q.w, q.x, q.y, q.z))
+
+    flap_indices = []
+    for dag_path in joints:
+        plug = OpenMaya.MFnDependencyNode(dag_path.node()).findPlug(
+            'rotateX',
+            False
+        )
+        rotation = math.degrees(plug.asDouble())
+        flap_indices.append(utils.rotation_to_index(rotation, num_images))
+
+    return dict(
+        positions=positions,
+        orientations=orientations,
+        flap_indices=flap_indices,
+    )
+
+
+def get_uv_offsets(wall, split_flap=None):
+    '''
+    Get the uv offset of every cell from the prototype's uvs, matching
+    SplitFlapWall.create, from the split flap's uv.CellPacking and layout
+    index.
+
+    :param wall: SplitFlapWall object
+    :param split_flap: SplitFlap of the prototype (default: wall.split_flap)
+    '''
+
+    split_flap = split_flap or wall.split_flap
+    return [tuple(offset) for offset in split_flap.cell_uv_offsets.tolist()]
+
+
+def write_usd(path, prototype, uv_offsets, samples):
+    '''
+    Write a UsdGeomPointInstancer.
+
+    :param path: Output .usd, .usda or .usdc path
+    :param prototype: Mesh data, see get_prototype
+    :param uv_offsets: Per cell uv offsets
+    :param samples: List of (frame, cells) where cells is from sample_cells
+    '''
+
+    stage = Usd.Stage.CreateNew(path)
+    UsdGeom.SetStageUpAxis(stage, UsdGeom.Tokens.y)
+    frames = [frame for frame, _ in samples]
+    stage.SetStartTimeCode(frames[0])
+    stage.SetEndTimeCode(frames[-1])
+
+    wall = UsdGeom.Xform.Define(stage, '/wall')
+    stage.SetDefaultPrim(wall.GetPrim())
+    instancer = UsdGeom.PointInstancer.Define(stage, '/wall/instancer')
+
+    mesh = UsdGeom.Mesh.Define(stage, '/wall/instancer/prototypes/flaps')
+    mesh.CreatePointsAttr(Vt.Vec3fArray(prototype['points']))
+    mesh.CreateFaceVertexCountsAttr(Vt.IntArray(prototype['counts']))
+    mesh.CreateFaceVertexIndicesAttr(Vt.IntArray(prototype['indices']))
+    st = UsdGeom.PrimvarsAPI(mesh).CreatePrimvar(
+        'st',
+        Sdf.ValueTypeNames.TexCoord2fArray,
+        UsdGeom.Tokens.faceVarying
+    )
+    st.Set(Vt.Vec2fArray(prototype['uvs']))
+    st.SetIndices(Vt.IntArray(prototype['uv_indices']))
+
+    num_cells = len(uv_offsets)
+    instancer.CreatePrototypesRel().SetTargets([mesh.GetPath()])
+    instancer.CreateProtoIndicesAttr(Vt.IntArray([0] * num_cells))
+
+    primvars = UsdGeom.PrimvarsAPI(instancer)
+    primvars.CreatePrimvar(
+        'uvOffset',
+        Sdf.ValueTypeNames.Float2Array,
+        UsdGeom.Tokens.vertex
+    ).Set(Vt.Vec2fArray(uv_offsets))
+    flap_index = primvars.CreatePrimvar(
+        'flapIndex',
+        Sdf.ValueTypeNames.IntArray,
+        UsdGeom.Tokens.vertex
+    )
+
+    positions = instancer.CreatePositionsAttr()
+    orientations = instancer.CreateOrientationsAttr()
+    for frame, cells in samples:
+        positions.Set(Vt.Vec3fArray(cells['positions']), frame)
+        orientations.Set(
+            Vt.QuathArray([Gf.Quath(w, x, y, z)
+                           for w, x, y, z in cells['orientations']]),
+            frame
+        )
+        flap_index.Set(Vt.IntArray(cells['flap_indices']), frame)
+
+    stage.GetRootLayer().Save()
+
+
+def write_alembic(path, prototype, uv_offsets, samples, fps=24.0):
+    '''
+    Write an Alembic archive with the prototype as a PolyMesh and the cells
+    as Points carrying orientation, uvOffset and flapIndex arrays.
+
+    :param path: Output .abc path
+    :param prototype: Mesh data, see get_prototype
+    :param uv_offsets: Per cell uv offsets
+    :param samples: List of (frame, cells) where cells is from sample_cells
+    :param fps: Frames per second used for the time sampling
+    '''
+
+    AbcGeom = alembic.AbcGeom
+    archive = alembic.Abc.OArchive(path)
+    time_sampling = alembic.AbcCoreAbstract.TimeSampling(
+        1.0 / fps,
+        samples[0][0] / fps
+    )
+    ts_index = archive.addTimeSampling(time_sampling)
+    top = archive.getTop()
+
+    # Prototype
+    mesh = AbcGeom.OPolyMesh(top, 'flaps')
+    uvs = AbcGeom.OV2fGeomParamSample(
+        _array(imath.V2fArray, imath.V2f, prototype['uvs']),
+        _array(imath.UnsignedIntArray, int, prototype['uv_indices']),
+        AbcGeom.GeometryScope.kFacevaryingScope
+    )
+    mesh.getSchema().set(AbcGeom.OPolyMeshSchemaSample(
+        _array(imath.V3fArray, imath.V3f, prototype['points']),
+        _array(imath.IntArray, int, prototype['indices']),
+        _array(imath.IntArray, int, prototype['counts']),
+        uvs
+    ))
+
+    # Instances
+    points = AbcGeom.OPoints(top, 'instances', ts_index)
+    schema = points.getSchema()
+    params = schema.getArbGeomParams()
+    scope = AbcGeom.GeometryScope.kVaryingScope
+
+    # Geom params share the time sampling of the points
+    def geom_param(param_type, name):
+        return param_type(params, name, False, scope, 1, ts_index)
+
+    orient = geom_param(AbcGeom.OQuatfGeomParam, 'orient')
+    uv_offset = geom_param(AbcGeom.OV2fGeomParam, 'uvOffset')
+    flap_index = geom_param(AbcGeom.OInt32GeomParam, 'flapIndex')
+
+    # Offsets are constant, a single sample holds for every frame
+    num_cells = len(uv_offsets)
+    ids = _array(imath.UInt64Array, int, range(num_cells))
+    uv_offset.set(AbcGeom.OV2fGeomParamSample(
+        _array(imath.V2fArray, imath.V2f, uv_offsets),
+        scope
+    ))
+    for frame, cells in samples:
+        schema.set(AbcGeom.OPointsSchemaSample(
+            _array(imath.V3fArray, imath.V3f, cells['positions']),
+            ids
+        ))
+        quats = imath.QuatfArray(num_cells)
+        for i, (w, x, y, z) in enumerate(cells['orientations']):
+            quats[i] = imath.Quatf(w, x, y, z)
+        orient.set(AbcGeom.OQuatfGeomParamSample(quats, scope))
+        flap_index.set(AbcGeom.OInt32GeomParamSample(
+            _array(imath.IntArray, int, cells['flap_indices']),
+            scope
+        ))
+
+
+def _array(array_type, item_type, values):
+    values = list(values)
+    array = array_type(len(values))
+    for i, value in enumerate(values):
+        if isinstance(value, (tuple, list)):
+            array[i] = item_type(*value)
+        else:
+            array[i] = item_type(value)
+    return array
+
+
+def export_instancer(wall, path, start=None, end=None, split_flap=None):
+    '''
+    Export a SplitFlapWall as one prototype flap mesh and per-cell
+    transform, uv offset and flap index arrays.
+
+    Cell transforms are taken from the world_grp locators, or from the anim
+    joints of walls built with the matrix rig.
+
+    Files ending in .abc are written with Alembic, everything else with USD.
+
+    :param wall: SplitFlapWall object
+    :param path: Output file path
+    :param start: First frame to sample (default: current frame)
+    :param end: Last frame to sample (default: start)
+    :param split_flap: SplitFlap of the prototype (default: wall.split_flap)
+    '''
+
+    use_alembic = path.lower().endswith('.abc')
+    if use_alembic and alembic is None:
+        raise ImportError('Exporting .abc requires the alembic module')
+    if not use_alembic and Usd is None:
+        raise ImportError('Exporting USD requires the pxr module')
+
+    split_flap = split_flap or wall.split_flap
+    prototype = get_prototype(split_flap)
+    uv_offsets = get_uv_offsets(wall, split_flap)
+
+    current = pm.currentTime(query=True)
+    start = current if start is None else start
+    end = start if end is None else end
+    samples = []
+    try:
+        for frame in range(int(start), int(end) + 1):
+            pm.currentTime(frame, update=True)
+            samples.append((frame, sample_cells(wall)))
+    finally:
+        pm.currentTime(current, update=True)
+
+    if use_alembic:
+        fps = pm.mel.currentTimeUnitToFPS()
+        write_alembic(path, prototype, uv_offsets, samples, fps)
+    else:
+        write_usd(path, prototype, uv_offsets, samples)
+    return path
+
+
+def export_stream(wall, path, start, end, keyframe_interval=240):
+    '''
+    Export the flap rotation of every cell of a SplitFlapWall over a frame
+    range as a binary stream, see stream.StreamReader.
+
+    Rotations are evaluated directly from the anim joints' rotateX
+    animCurves, the scene time is not changed.
+
+    :param wall: SplitFlapWall object
+    :param path: Output file path
+    :param start: First frame
+    :param end: Last frame, inclusive
+    :param keyframe_interval: Frames between full key records
+    '''
+
+    unit = OpenMaya.MTime.uiUnit()
+    fps = OpenMaya.MTime(1, OpenMaya.MTime.kSeconds).asUnits(unit)
+    rotations = utils.evaluate_rotations(wall.anim_joints, start, end)
+
+    with StreamWriter(path, rotations.shape[1], int(start), fps,
+                      keyframe_interval) as writer:
+        for angles in rotations.tolist():
+            writer.add_frame(angles)
+    return path
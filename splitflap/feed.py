@@ -0,0 +1,253 @@
+'''
+Local socket feed of live updates for a SplitFlapWall.
+
+Clients send one update per line, either plain text to display or JSON::
+
+    {"text": "HELLO"}
+    {"cells": {"0": 4, "12": 7}}
+    {"indices": [4, 7, 0]}
+
+Lines are parsed on listener threads and queued until taken, see
+live.LiveWallDriver for applying them to a wall in Maya. This module only
+uses the standard library, run it as a script to send updates from a
+stand-in client::
+
+    python feed.py 127.0.0.1:5007 "HELLO WORLD"
+    python feed.py /tmp/splitflap.sock '{"cells": {"3": 12}}'
+'''
+from __future__ import print_function
+from collections import deque
+from contextlib import closing
+import argparse
+import json
+import os
+import socket
+import threading
+import time
+
+try:
+    string_types = basestring
+except NameError:
+    string_types = str
+
+
+DEFAULT_ADDRESS = ('127.0.0.1', 5007)
+
+
+def parse_address(value):
+    '''
+    Parse "host:port" to a TCP address, anything else is a Unix socket path.
+    '''
+
+    host, sep, port = value.rpartition(':')
+    if sep and port.isdigit():
+        return host or '127.0.0.1', int(port)
+    return value
+
+
+def get_family(address):
+    if isinstance(address, string_types):
+        return socket.AF_UNIX
+    return socket.AF_INET
+
+
+def parse_update(line):
+    '''
+    Parse a line sent by a client.
+
+    :returns: ("text", message), ("cells", {cell: index}) or None for empty
+        lines
+    :raises ValueError: When a JSON update is malformed
+    '''
+
+    line = line.strip()
+    if not line:
+        return None
+    if not line.startswith('{'):
+        return 'text', line
+
+    data = json.loads(line)
+    try:
+        if isinstance(data.get('text'), string_types):
+            return 'text', data['text']
+        if isinstance(data.get('cells'), dict):
+            cells = data['cells'].items()
+            return 'cells', dict((int(k), int(v)) for k, v in cells)
+        if isinstance(data.get('indices'), list):
+            indices = (int(v) for v in data['indices'])
+            return 'cells', dict(enumerate(indices))
+    except (TypeError, ValueError):
+        pass
+    raise ValueError('Malformed update: {}'.format(line))
+
+
+class FeedServer(object):
+    '''
+    Listen for clients on a TCP or Unix socket and queue their updates.
+
+    :param address: (host, port) tuple or Unix socket path, port 0 picks a
+        free port
+    '''
+
+    def __init__(self, address=DEFAULT_ADDRESS):
+        self.address = address
+        self.updates = deque()
+        self._socket = None
+        self._running = False
+
+    @property
+    def is_running(self):
+        return self._running
+
+    def start(self):
+        if self._running:
+            return self.address
+
+        family = get_family(self.address)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_UNIX:
+            if os.path.exists(self.address):
+                os.remove(self.address)
+        else:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind(self.address)
+        sock.listen(5)
+        sock.settimeout(0.2)
+
+        self.address = sock.getsockname()
+        self._socket = sock
+        self._running = True
+        self._start_thread(self._serve)
+        return self.address
+
+    def stop(self):
+        if not self._running:
+            return
+
+        self._running = False
+        self._socket.close()
+        self._socket = None
+        if isinstance(self.address, string_types):
+            if os.path.exists(self.address):
+                os.remove(self.address)
+
+    def take(self):
+        '''Remove and return every queued update, oldest first.'''
+
+        updates = []
+        while True:
+            try:
+                updates.append(self.updates.popleft())
+            except IndexError:
+                return updates
+
+    def push(self, line):
+        '''Parse and queue a line.'''
+
+        try:
+            update = parse_update(line)
+        except ValueError as e:
+            print('Skipping update: {}'.format(e))
+            return
+        if update:
+            self.updates.append(update)
+
+    def _start_thread(self, target, *args):
+        thread = threading.Thread(target=target, args=args)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def _serve(self):
+        sock = self._socket
+        while self._running:
+            try:
+                connection, _ = sock.accept()
+            except socket.timeout:
+                continue
+            except socket.error:
+                break
+            self._start_thread(self._read, connection)
+
+    def _read(self, connection):
+        connection.settimeout(0.2)
+        buffer = b''
+        with closing(connection):
+            while self._running:
+                try:
+                    data = connection.recv(4096)
+                except socket.timeout:
+                    continue
+                except socket.error:
+                    break
+                if not data:
+                    break
+
+                lines = (buffer + data).split(b'\n')
+                buffer = lines.pop()
+                for line in lines:
+                    self._push_bytes(line)
+
+        if buffer:
+            self._push_bytes(buffer)
+
+    def _push_bytes(self, data):
+        try:
+            line = data.decode('utf-8')
+        except UnicodeDecodeError as e:
+            print('Skipping update: {}'.format(e))
+            return
+        self.push(line)
+
+
+def send(address, updates, interval=0):
+    '''
+    Send updates to a FeedServer, acting as a stand-in client.
+
+    :param address: (host, port) tuple or Unix socket path
+    :param updates: Lines of text, or dicts sent as JSON
+    :param interval: Seconds to wait between updates
+    '''
+
+    sock = socket.socket(get_family(address), socket.SOCK_STREAM)
+    with closing(sock):
+        sock.connect(address)
+        for update in updates:
+            if not isinstance(update, string_types):
+                update = json.dumps(update)
+            sock.sendall((update.replace('\n', ' ') + '\n').encode('utf-8'))
+            if interval:
+                time.sleep(interval)
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(
+        description='Send updates to a live split flap wall.'
+    )
+    parser.add_argument(
+        'address',
+        help='host:port or Unix socket path of the wall'
+    )
+    parser.add_argument('updates', nargs='+', help='Lines to send')
+    parser.add_argument(
+        '--interval',
+        type=float,
+        default=0,
+        help='Seconds between updates'
+    )
+    parser.add_argument(
+        '--repeat',
+        type=int,
+        default=1,
+        help='Number of times to send the updates'
+    )
+    args = parser.parse_args(args)
+    send(
+        parse_address(args.address),
+        args.updates * args.repeat,
+        args.interval
+    )
+
+
+if __name__ == '__main__':
+    main()
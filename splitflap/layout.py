@@ -0,0 +1,303 @@
+'''
+Layout engine computing the transforms of flaps and wall cells as arrays.
+
+Matrices use Maya's row vector convention, points are transformed with
+point @ matrix and the translation is stored in the last row.
+'''
+from __future__ import division, print_function
+import numpy as np
+
+
+def radial_angles(num_flaps):
+    '''
+    Get the rotateX in degrees of every flap, see radial_translations.
+    '''
+
+    return -np.arange(num_flaps) * (360 / num_flaps)
+
+
+def radial_translations(num_flaps, radius):
+    '''
+    Get the translation of every flap arranged radially around the X-axis.
+    Flap i is placed at angle 360 / num_flaps * i and rotated by the
+    negative of that angle.
+
+    :param num_flaps: Number of flaps
+    :param radius: Radius of arrangement
+    :returns: float array of shape (num_flaps, 3)
+    '''
+
+    theta = np.radians(-radial_angles(num_flaps))
+    return np.column_stack([
+        np.zeros(num_flaps),
+        np.cos(theta) * radius,
+        -np.sin(theta) * radius,
+    ])
+
+
+def rotate_x_matrices(angles):
+    '''
+    Get rotation matrices around the X-axis.
+
+    :param angles: Angles in degrees
+    :returns: float array of shape (len(angles), 4, 4)
+    '''
+
+    theta = np.radians(np.asarray(angles, dtype=np.float64))
+    cos, sin = np.cos(theta), np.sin(theta)
+    matrices = np.zeros((len(theta), 4, 4))
+    matrices[:, 0, 0] = 1
+    matrices[:, 1, 1] = cos
+    matrices[:, 1, 2] = sin
+    matrices[:, 2, 1] = -sin
+    matrices[:, 2, 2] = cos
+    matrices[:, 3, 3] = 1
+    return matrices
+
+
+ROTATE_ORDERS = ('xyz', 'yzx', 'zxy', 'xzy', 'yxz', 'zyx')
+
+
+def axis_rotations(axis, angles):
+    '''
+    Get 3x3 rotation matrices around the X, Y or Z-axis.
+
+    :param axis: 0, 1 or 2
+    :param angles: Angles in radians
+    :returns: float array of shape (len(angles), 3, 3)
+    '''
+
+    j, k = (axis + 1) % 3, (axis + 2) % 3
+    cos, sin = np.cos(angles), np.sin(angles)
+    matrices = np.zeros((len(angles), 3, 3))
+    matrices[:, axis, axis] = 1
+    matrices[:, j, j] = cos
+    matrices[:, j, k] = sin
+    matrices[:, k, j] = -sin
+    matrices[:, k, k] = cos
+    return matrices
+
+
+def euler_matrices(rotations, translations=None, order='xyz'):
+    '''
+    Get matrices of euler rotations, matching a transform with the same
+    rotateOrder.
+
+    :param rotations: Angles in degrees of shape (n, 3)
+    :param translations: Optional float array of shape (n, 3)
+    :param order: Rotate order, one of ROTATE_ORDERS
+    :returns: float array of shape (n, 4, 4)
+    '''
+
+    theta = np.radians(np.asarray(rotations, dtype=np.float64))
+    theta = theta.reshape(-1, 3)
+    i, j, k = ('xyz'.index(axis) for axis in order)
+    matrices = np.zeros((len(theta), 4, 4))
+    matrices[:, :3, :3] = np.matmul(
+        np.matmul(
+            axis_rotations(i, theta[:, i]),
+            axis_rotations(j, theta[:, j])
+        ),
+        axis_rotations(k, theta[:, k])
+    )
+    matrices[:, 3, 3] = 1
+    if translations is not None:
+        matrices[:, 3, :3] = translations
+    return matrices
+
+
+def matrix_to_euler(matrices, order='xyz'):
+    '''
+    Get the euler rotations of matrices, see euler_matrices. Scale is
+    removed before decomposing.
+
+    :param matrices: float array of shape (n, 4, 4)
+    :param order: Rotate order, one of ROTATE_ORDERS
+    :returns: Angles in degrees of shape (n, 3)
+    '''
+
+    axes = np.asarray(matrices, dtype=np.float64)[:, :3, :3]
+    axes = axes / np.linalg.norm(axes, axis=2)[:, :, None]
+    i, j, k = ('xyz'.index(axis) for axis in order)
+
+    # Orders that are not a cyclic shift of xyz flip the off-axis terms
+    sign = 1 if order in ROTATE_ORDERS[:3] else -1
+    angles = np.zeros((len(axes), 3))
+    angles[:, i] = np.arctan2(sign * axes[:, j, k], axes[:, k, k])
+    angles[:, j] = np.arcsin(np.clip(-sign * axes[:, i, k], -1, 1))
+    angles[:, k] = np.arctan2(sign * axes[:, i, j], axes[:, i, i])
+    return np.degrees(angles)
+
+
+def translate_matrices(translations):
+    '''
+    Get translation matrices.
+
+    :param translations: float array of shape (n, 3)
+    :returns: float array of shape (n, 4, 4)
+    '''
+
+    translations = np.asarray(translations, dtype=np.float64)
+    matrices = np.tile(np.identity(4), (len(translations), 1, 1))
+    matrices[:, 3, :3] = translations
+    return matrices
+
+
+def radial_matrices(num_flaps, radius):
+    '''
+    Get the matrix of every flap arranged radially around the X-axis,
+    matching radial_arrangement.
+
+    :returns: float array of shape (num_flaps, 4, 4)
+    '''
+
+    matrices = rotate_x_matrices(radial_angles(num_flaps))
+    matrices[:, 3, :3] = radial_translations(num_flaps, radius)
+    return matrices
+
+
+def grid_translations(rows, columns, x_step, y_step):
+    '''
+    Get the translation of every cell of a wall in row, column order. The
+    grid is centered in X and its bottom row sits at Y 0.
+
+    :param rows: Number of rows in layout
+    :param columns: Number of columns in layout
+    :param x_step: Distance between columns
+    :param y_step: Distance between rows
+    :returns: float array of shape (rows * columns, 3)
+    '''
+
+    r, c = np.divmod(np.arange(rows * columns), columns)
+    return np.column_stack([
+        c * x_step - x_step * (columns - 1) * 0.5,
+        -r * y_step + y_step * (rows - 1),
+        np.zeros(rows * columns),
+    ])
+
+
+def grid_matrices(rows, columns, x_step, y_step):
+    '''
+    Get the matrix of every cell of a wall, see grid_translations.
+
+    :returns: float array of shape (rows * columns, 4, 4)
+    '''
+
+    return translate_matrices(
+        grid_translations(rows, columns, x_step, y_step)
+    )
+
+
+def chunk_cells(num_cells, num_chunks):
+    '''
+    Split cells into contiguous chunks of nearly equal size.
+
+    :param num_cells: Number of cells
+    :param num_chunks: Number of chunks, clamped to [1, num_cells]
+    :returns: List of int arrays of cell indices
+    '''
+
+    num_chunks = max(1, min(int(num_chunks), num_cells))
+    return np.array_split(np.arange(num_cells), num_chunks)
+
+
+def transform_points(points, matrices):
+    '''
+    Transform points by every matrix.
+
+    :param points: float array of shape (num_points, 3)
+    :param matrices: float array of shape (n, 4, 4)
+    :returns: float array of shape (n, num_points, 3)
+    '''
+
+    points = np.asarray(points, dtype=np.float64)
+    return np.einsum('pi,nij->npj', points, matrices[:, :3, :3]) + \
+        matrices[:, None, 3, :3]
+
+
+def rotate_points_x(points, angles, pivots):
+    '''
+    Rotate every point around the X-axis through its own pivot, like
+    parenting it to a transform at pivot with rotateX angle.
+
+    :param points: float array of shape (n, 3)
+    :param angles: Angles in degrees of shape (n,)
+    :param pivots: float array of shape (n, 3)
+    :returns: float array of shape (n, 3)
+    '''
+
+    theta = np.radians(np.asarray(angles, dtype=np.float64))
+    cos, sin = np.cos(theta), np.sin(theta)
+    local = np.asarray(points, dtype=np.float64) - pivots
+    rotated = np.column_stack([
+        local[:, 0],
+        local[:, 1] * cos - local[:, 2] * sin,
+        local[:, 1] * sin + local[:, 2] * cos,
+    ])
+    return rotated + pivots
+
+
+class LayoutTable(object):
+    '''
+    Transforms of every flap of every cell of a wall.
+
+    :param rows: Number of rows in layout
+    :param columns: Number of columns in layout
+    :param num_flaps: Number of flaps per cell
+    :param radius: Radius of the flap arrangement
+    :param x_step: Distance between columns
+    :param y_step: Distance between rows
+    '''
+
+    def __init__(self, rows, columns, num_flaps, radius, x_step, y_step):
+        self.rows = rows
+        self.columns = columns
+        self.num_flaps = num_flaps
+        self.radius = radius
+        self.x_step = x_step
+        self.y_step = y_step
+        self.radial = radial_matrices(num_flaps, radius)
+        self.grid = grid_matrices(rows, columns, x_step, y_step)
+
+    @property
+    def num_cells(self):
+        return self.rows * self.columns
+
+    def cell_matrix(self, row, column):
+        return self.grid[row * self.columns + column]
+
+    def flap_matrices(self):
+        '''
+        Get the matrix of every flap of every cell.
+
+        :returns: float array of shape (num_cells, num_flaps, 4, 4)
+        '''
+
+        return np.einsum('fij,cjk->cfik', self.radial, self.grid)
+
+
+def advance_rotation(rotation, index, num_images):
+    '''
+    Get the rotation that shows the image at index, rotating forward from
+    rotation. Split flaps only ever turn in one direction.
+
+    :param rotation: Current rotateX of a flap anim joint in degrees
+    :param index: Index of the image to show
+    :param num_images: Number of images in sequence
+    '''
+
+    step = 360 / num_images
+    current = rotation_to_index(rotation, num_images)
+    return rotation + ((index - current) % num_images) * step
+
+
+def rotation_to_index(rotation, num_images):
+    '''
+    Get the index of the image shown at a rotation.
+
+    :param rotation: rotateX of a flap anim joint in degrees
+    :param num_images: Number of images in sequence
+    '''
+
+    step = 360 / num_images
+    return int(round(rotation / step)) % num_images
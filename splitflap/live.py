@@ -0,0 +1,137 @@
+'''
+Drive a SplitFlapWall from a live feed in an interactive session.
+
+Updates received by a feed.FeedServer are folded together and applied to
+the wall's anim joints by a QTimer on the main thread, at most once per
+frame. Only cells whose image changed are set, by keying their rotateX
+animCurves at the current time so the curves do not override them.
+'''
+from __future__ import division, print_function
+from Qt import QtCore
+from maya.api import OpenMaya, OpenMayaAnim
+from . import utils, feed
+from .ui import message_to_cells
+
+
+class LiveWallDriver(QtCore.QObject):
+    '''
+    Apply updates from a feed.FeedServer to a SplitFlapWall.
+
+    :param wall: SplitFlapWall object
+    :param characters: Character shown by each image index, used to convert
+        text updates. Characters missing from it show image 0.
+    :param address: (host, port) tuple or Unix socket path to listen on
+    :param fps: Maximum updates per second (default: scene frame rate)
+    '''
+
+    def __init__(self, wall, characters, address=feed.DEFAULT_ADDRESS,
+                 fps=None, parent=None):
+        super(LiveWallDriver, self).__init__(parent)
+        self.wall = wall
+        self.characters = characters
+        self.rows = wall.number_of_rows.get()
+        self.columns = wall.number_of_columns.get()
+        self.num_images = wall.number_of_images.get()
+        self.server = feed.FeedServer(address)
+        self.fps = fps
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self.apply)
+
+        selection = OpenMaya.MSelectionList()
+        for joint in wall.anim_joints:
+            selection.add(joint.rotateX.name())
+        self.plugs = [selection.getPlug(i) for i in range(selection.length())]
+        self.curves = [self.get_curve(plug) for plug in self.plugs]
+        self.indices = [None] * len(self.plugs)
+
+    @staticmethod
+    def get_curve(plug):
+        '''Get the animCurve of a rotateX plug, creating one when missing.'''
+
+        curves = OpenMayaAnim.MAnimUtil.findAnimation(plug)
+        if curves:
+            return OpenMayaAnim.MFnAnimCurve(curves[0])
+        curve = OpenMayaAnim.MFnAnimCurve()
+        curve.create(plug, OpenMayaAnim.MFnAnimCurve.kAnimCurveTA)
+        return curve
+
+    @property
+    def address(self):
+        return self.server.address
+
+    def start(self):
+        '''Start listening and applying updates, returns the address.'''
+
+        if self.fps is None:
+            unit = OpenMaya.MTime.uiUnit()
+            self.fps = OpenMaya.MTime(1, OpenMaya.MTime.kSeconds).asUnits(unit)
+        address = self.server.start()
+        self.timer.start(max(1, int(1000 / self.fps)))
+        return address
+
+    def stop(self):
+        self.timer.stop()
+        self.server.stop()
+
+    def text_to_indices(self, text):
+        '''Get the image index of every cell for a text message.'''
+
+        indices = {}
+        cells = message_to_cells(text, self.rows, self.columns)
+        for cell, character in enumerate(cells):
+            index = self.characters.find(character)
+            if index < 0:
+                index = self.characters.find(character.upper())
+            indices[cell] = max(index, 0)
+        return indices
+
+    def collect(self):
+        '''
+        Fold every queued update into one {cell: index} dict, later updates
+        win.
+        '''
+
+        changes = {}
+        for kind, value in self.server.take():
+            if kind == 'text':
+                value = self.text_to_indices(value)
+            changes.update(value)
+        return changes
+
+    def apply(self):
+        '''
+        Apply queued updates to the anim joints, keyed at the current time,
+        returns the number of cells changed.
+        '''
+
+        num_cells = len(self.plugs)
+        changes = [
+            (cell, index % self.num_images)
+            for cell, index in self.collect().items()
+            if 0 <= cell < num_cells
+        ]
+        changes = [(cell, index) for cell, index in changes
+                   if index != self.indices[cell]]
+        if not changes:
+            return 0
+
+        time = OpenMayaAnim.MAnimControl.currentTime()
+        for cell, index in changes:
+            curve = self.curves[cell]
+            rotation = OpenMaya.MAngle(curve.evaluate(time)).asDegrees()
+            rotation = utils.advance_rotation(
+                rotation,
+                index,
+                self.num_images
+            )
+            value = OpenMaya.MAngle(
+                rotation,
+                OpenMaya.MAngle.kDegrees
+            ).asRadians()
+            key = curve.find(time)
+            if key is None:
+                curve.addKey(time, value)
+            else:
+                curve.setValue(key, value)
+            self.indices[cell] = index
+        return len(changes)
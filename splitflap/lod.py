@@ -0,0 +1,93 @@
+'''
+Level of detail for the cells of a wall.
+
+Each cell is given a level from the height in pixels it covers on screen,
+full flaps up close, decimated flaps further away and flat cards for cells
+only a few pixels tall. Cells can be grouped into square tiles that share
+the most detailed level of their cells.
+'''
+from __future__ import division, print_function
+import numpy as np
+
+
+LEVELS = ('full', 'decimated', 'card')
+FULL, DECIMATED, CARD = range(len(LEVELS))
+
+# Minimum pixel coverage of the full and decimated levels
+DEFAULT_THRESHOLDS = (64, 16)
+
+
+def screen_coverage(centers, size, camera_position, fov, resolution,
+                    forward=None):
+    '''
+    Get the height in pixels every cell covers on screen.
+
+    :param centers: World space cell centers of shape (num_cells, 3)
+    :param size: World space height of a cell
+    :param camera_position: World space camera position
+    :param fov: Vertical field of view in radians
+    :param resolution: Vertical resolution in pixels
+    :param forward: Optional camera view direction, when given the depth
+        along it is used instead of the distance to the camera and cells
+        behind the camera cover no pixels
+    :returns: float array of shape (num_cells,)
+    '''
+
+    offsets = np.asarray(centers, dtype=np.float64) - camera_position
+    if forward is None:
+        depth = np.linalg.norm(offsets, axis=1)
+    else:
+        forward = np.asarray(forward, dtype=np.float64)
+        depth = offsets.dot(forward / np.linalg.norm(forward))
+
+    frustum_height = 2 * np.maximum(depth, 1e-6) * np.tan(fov * 0.5)
+    coverage = size / frustum_height * resolution
+    coverage[depth <= 0] = 0
+    return coverage
+
+
+def assign_levels(coverage, thresholds=DEFAULT_THRESHOLDS):
+    '''
+    Get the level of every cell from its screen coverage.
+
+    :param coverage: Pixel coverage of every cell, see screen_coverage
+    :param thresholds: Minimum coverage of each level but the last, from
+        most to least detailed
+    :returns: int array of levels
+    '''
+
+    thresholds = np.asarray(thresholds, dtype=np.float64)
+    return np.searchsorted(-thresholds, -np.asarray(coverage), side='right')
+
+
+def tile_levels(levels, rows, columns, tile_size):
+    '''
+    Give every cell of a square tile the most detailed level in the tile.
+
+    :param levels: Level of every cell in row, column order
+    :param rows: Number of rows in layout
+    :param columns: Number of columns in layout
+    :param tile_size: Number of rows and columns per tile
+    :returns: int array of levels
+    '''
+
+    levels = np.asarray(levels).reshape(rows, columns)
+    if tile_size <= 1:
+        return levels.ravel()
+
+    r, c = np.divmod(np.arange(rows * columns), columns)
+    tiles = (r // tile_size) * -(-columns // tile_size) + c // tile_size
+    best = np.full(tiles.max() + 1, levels.max())
+    np.minimum.at(best, tiles, levels.ravel())
+    return best[tiles]
+
+
+def level_cells(levels, num_levels=len(LEVELS)):
+    '''
+    Get the cells of every level.
+
+    :returns: List of int arrays
+    '''
+
+    levels = np.asarray(levels)
+    return [np.flatnonzero(levels == level) for level in range(num_levels)]
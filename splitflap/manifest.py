@@ -0,0 +1,204 @@
+'''
+Wall manifests describing a SplitFlapWall outside of Maya.
+
+A manifest is a JSON file with the build parameters, node names and content
+hash of a wall, next to a .npz file holding its arrays: cell translations,
+uv offsets, flap indices, chunk ids and the prototype flaps mesh. See
+SplitFlapWall.write_manifest and models.load_manifest for writing and
+rehydrating them in Maya.
+
+This module only needs numpy, so published walls can be inspected without
+Maya by running it as a script::
+
+    python manifest.py /path/to/walls
+'''
+from __future__ import division, print_function
+import argparse
+import hashlib
+import json
+import os
+import numpy as np
+
+
+VERSION = 1
+EXTENSION = '.splitflap.json'
+ARRAYS = (
+    'translations',
+    'uv_offsets',
+    'indices',
+    'chunks',
+    'prototype_points',
+    'prototype_counts',
+    'prototype_connects',
+    'prototype_uvs',
+    'prototype_uv_connects',
+)
+
+
+def get_arrays_path(path):
+    '''Get the path of the .npz arrays of a manifest.'''
+    return path[:-len('.json')] + '.npz'
+
+
+def get_manifest_path(directory, name):
+    '''Get the manifest path of a wall named name.'''
+    return os.path.join(directory, name.replace('|', '_') + EXTENSION)
+
+
+def content_hash(params, arrays):
+    '''
+    Hash the parameters and arrays of a manifest.
+
+    :returns: sha1 hex digest
+    '''
+
+    sha = hashlib.sha1()
+    sha.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+    for name in ARRAYS:
+        array = np.ascontiguousarray(arrays[name])
+        sha.update(name.encode('utf-8'))
+        sha.update(str(array.dtype).encode('utf-8'))
+        sha.update(str(array.shape).encode('utf-8'))
+        sha.update(array.tobytes())
+    return sha.hexdigest()
+
+
+class Manifest(object):
+    '''
+    Build parameters, node names and arrays of a wall.
+
+    :param params: Dict of build parameters
+    :param nodes: Dict of node names
+    :param arrays: Dict of numpy arrays, see ARRAYS
+    '''
+
+    def __init__(self, params, nodes, arrays):
+        missing = set(ARRAYS) - set(arrays)
+        if missing:
+            raise ValueError('Missing arrays: {}'.format(sorted(missing)))
+        self.params = params
+        self.nodes = nodes
+        self.arrays = arrays
+        self.hash = content_hash(params, arrays)
+
+    def __getattr__(self, name):
+        if name in ARRAYS:
+            return self.arrays[name]
+        raise AttributeError(name)
+
+    @property
+    def num_cells(self):
+        return len(self.arrays['translations'])
+
+    def write(self, path):
+        '''Write the manifest JSON and its arrays next to it.'''
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+
+        arrays_path = get_arrays_path(path)
+        with open(arrays_path, 'wb') as f:
+            np.savez(f, **self.arrays)
+        with open(path, 'w') as f:
+            json.dump(
+                dict(
+                    version=VERSION,
+                    hash=self.hash,
+                    params=self.params,
+                    nodes=self.nodes,
+                    arrays=os.path.basename(arrays_path),
+                ),
+                f,
+                indent=4,
+                sort_keys=True
+            )
+        return path
+
+    @classmethod
+    def read_header(cls, path):
+        '''Read the JSON of a manifest without loading its arrays.'''
+
+        with open(path, 'r') as f:
+            header = json.load(f)
+        if header.get('version') != VERSION:
+            raise IOError(
+                'Unsupported manifest version {}'.format(header.get('version'))
+            )
+        return header
+
+    @classmethod
+    def read(cls, path, verify=True):
+        '''
+        Read a manifest and its arrays.
+
+        :param verify: Raise IOError when the content hash does not match
+        '''
+
+        header = cls.read_header(path)
+        arrays_path = os.path.join(os.path.dirname(path), header['arrays'])
+        with np.load(arrays_path) as data:
+            arrays = dict((name, data[name]) for name in ARRAYS)
+
+        manifest = cls(header['params'], header['nodes'], arrays)
+        if verify and manifest.hash != header['hash']:
+            raise IOError('{} does not match its content hash'.format(path))
+        return manifest
+
+    def summary(self):
+        '''Get a one line description of the wall.'''
+
+        params = self.params
+        return '{} {}x{} cells, {} images, {} chunks, {}'.format(
+            self.nodes.get('wall'),
+            params['rows'],
+            params['columns'],
+            params['number_of_images'],
+            params.get('number_of_chunks', 1),
+            self.hash[:12],
+        )
+
+
+def find_manifests(directory):
+    '''Find every manifest under a directory.'''
+
+    paths = []
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if name.endswith(EXTENSION):
+                paths.append(os.path.join(root, name))
+    return paths
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Inspect wall manifests.')
+    parser.add_argument('paths', nargs='+', help='Manifests or directories')
+    parser.add_argument(
+        '--verify',
+        action='store_true',
+        help='Load arrays and check content hashes'
+    )
+    args = parser.parse_args(args)
+
+    for path in args.paths:
+        manifests = [path]
+        if os.path.isdir(path):
+            manifests = find_manifests(path)
+        for manifest_path in manifests:
+            if args.verify:
+                description = Manifest.read(manifest_path).summary()
+            else:
+                header = Manifest.read_header(manifest_path)
+                params = header['params']
+                description = '{} {}x{} cells, {} images, {}'.format(
+                    header['nodes'].get('wall'),
+                    params['rows'],
+                    params['columns'],
+                    params['number_of_images'],
+                    header['hash'][:12],
+                )
+            print('{}: {}'.format(manifest_path, description))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,318 @@
+'''
+Procedural mesh kernel.
+
+Vertex and face arrays for the helper geometry of a SplitFlap are computed
+here with numpy, so each combined mesh can be created in Maya with a single
+MFnMesh.create call instead of many small poly commands.
+'''
+from __future__ import division, print_function
+import numpy as np
+from . import layout
+
+
+# Vertex order of a maya polyCube
+CUBE_POINTS = np.array([
+    (-0.5, -0.5, 0.5),
+    (0.5, -0.5, 0.5),
+    (-0.5, 0.5, 0.5),
+    (0.5, 0.5, 0.5),
+    (-0.5, 0.5, -0.5),
+    (0.5, 0.5, -0.5),
+    (-0.5, -0.5, -0.5),
+    (0.5, -0.5, -0.5),
+])
+CUBE_FACES = [
+    (0, 1, 3, 2),
+    (2, 3, 5, 4),
+    (4, 5, 7, 6),
+    (6, 7, 1, 0),
+    (1, 7, 5, 3),
+    (6, 0, 2, 4),
+]
+
+
+class MeshData(object):
+    '''
+    Polygon mesh arrays.
+
+    :param points: float array of shape (num_vertices, 3)
+    :param counts: int array of vertices per face
+    :param connects: int array of face vertex indices
+    :param uvs: Optional float array of shape (num_uvs, 2)
+    :param uv_connects: Optional int array of face vertex uv indices, when
+        omitted there is one uv per vertex
+    '''
+
+    def __init__(self, points, counts, connects, uvs=None, uv_connects=None):
+        self.points = np.asarray(points, dtype=np.float64)
+        self.counts = np.asarray(counts, dtype=np.int32)
+        self.connects = np.asarray(connects, dtype=np.int32)
+        self.uvs = None if uvs is None else np.asarray(uvs, dtype=np.float64)
+        self.uv_connects = None
+        if uv_connects is not None:
+            self.uv_connects = np.asarray(uv_connects, dtype=np.int32)
+
+    @property
+    def num_vertices(self):
+        return len(self.points)
+
+    @property
+    def num_faces(self):
+        return len(self.counts)
+
+    @property
+    def num_uvs(self):
+        return 0 if self.uvs is None else len(self.uvs)
+
+    @property
+    def face_uvs(self):
+        '''Face vertex uv indices.'''
+        if self.uv_connects is None:
+            return self.connects
+        return self.uv_connects
+
+
+def plane(width, height, center=(0, 0, 0),
+          subdivisions_width=1, subdivisions_height=1):
+    '''
+    Plane facing +Z with normalized uvs, like polyPlane(axis=[0, 0, 1]).
+
+    :param width: Size along X-axis
+    :param height: Size along Y-axis
+    :param center: Center of the plane
+    :param subdivisions_width: Number of subdivisions along X-axis
+    :param subdivisions_height: Number of subdivisions along Y-axis
+    '''
+
+    sw, sh = subdivisions_width, subdivisions_height
+    u, v = np.meshgrid(np.linspace(0, 1, sw + 1), np.linspace(0, 1, sh + 1))
+    u, v = u.ravel(), v.ravel()
+    points = np.column_stack([
+        (u - 0.5) * width + center[0],
+        (v - 0.5) * height + center[1],
+        np.full(u.size, center[2], dtype=np.float64),
+    ])
+
+    i, j = np.meshgrid(np.arange(sw), np.arange(sh))
+    a = (j * (sw + 1) + i).ravel()
+    connects = np.column_stack([a, a + 1, a + sw + 2, a + sw + 1]).ravel()
+    counts = np.full(sw * sh, 4)
+    return MeshData(points, counts, connects, np.column_stack([u, v]))
+
+
+def cube(size, center=(0, 0, 0)):
+    '''
+    Cube with the vertex and face order of polyCube.
+
+    :param size: (width, height, depth)
+    :param center: Center of the cube
+    '''
+
+    points = CUBE_POINTS * np.asarray(size) + np.asarray(center)
+    counts = [len(face) for face in CUBE_FACES]
+    connects = [i for face in CUBE_FACES for i in face]
+    return MeshData(points, counts, connects)
+
+
+def merge_vertices(mesh, pairs):
+    '''
+    Move vertex a onto vertex b and merge them for each (a, b) pair, like
+    polyMergeVertex. Faces collapsing to less than three vertices are removed.
+
+    :param mesh: MeshData
+    :param pairs: List of (a, b) vertex index pairs
+    '''
+
+    remap = np.arange(mesh.num_vertices)
+    for a, b in pairs:
+        remap[a] = b
+
+    keep = np.unique(remap)
+    compact = np.full(mesh.num_vertices, -1)
+    compact[keep] = np.arange(len(keep))
+
+    counts = []
+    connects = []
+    start = 0
+    for count in mesh.counts:
+        face = compact[remap[mesh.connects[start:start + count]]].tolist()
+        start += count
+        face = [i for n, i in enumerate(face) if i != face[n - 1]]
+        if len(set(face)) < 3:
+            continue
+        counts.append(len(face))
+        connects.extend(face)
+
+    uvs = None if mesh.uvs is None else mesh.uvs[keep]
+    return MeshData(mesh.points[keep], counts, connects, uvs)
+
+
+def combine(meshes):
+    '''
+    Combine meshes into one, like polyUnite.
+
+    :param meshes: List of MeshData
+    '''
+
+    offsets = np.cumsum([0] + [m.num_vertices for m in meshes[:-1]])
+    connects = [m.connects + offset for m, offset in zip(meshes, offsets)]
+    uvs = None
+    uv_connects = None
+    if all(m.uvs is not None for m in meshes):
+        uvs = np.concatenate([m.uvs for m in meshes])
+        if any(m.uv_connects is not None for m in meshes):
+            uv_offsets = np.cumsum([0] + [m.num_uvs for m in meshes[:-1]])
+            uv_connects = np.concatenate([
+                m.face_uvs + offset for m, offset in zip(meshes, uv_offsets)
+            ])
+    return MeshData(
+        np.concatenate([m.points for m in meshes]),
+        np.concatenate([m.counts for m in meshes]),
+        np.concatenate(connects),
+        uvs,
+        uv_connects
+    )
+
+
+def copies(mesh, matrices):
+    '''
+    Copy a mesh once per matrix.
+
+    :param mesh: MeshData
+    :param matrices: float array of shape (num_copies, 4, 4)
+    '''
+
+    num_copies = len(matrices)
+    points = layout.transform_points(mesh.points, matrices)
+
+    offsets = (np.arange(num_copies) * mesh.num_vertices)[:, None]
+    uvs = None
+    uv_connects = None
+    if mesh.uvs is not None:
+        uvs = np.tile(mesh.uvs, (num_copies, 1))
+    if mesh.uv_connects is not None:
+        uv_offsets = (np.arange(num_copies) * mesh.num_uvs)[:, None]
+        uv_connects = (mesh.uv_connects + uv_offsets).ravel()
+    return MeshData(
+        points.reshape(-1, 3),
+        np.tile(mesh.counts, num_copies),
+        (mesh.connects + offsets).ravel(),
+        uvs,
+        uv_connects
+    )
+
+
+def radial_copies(mesh, num_copies, radius):
+    '''
+    Copy a mesh radially around the X-axis, matching radial_arrangement.
+    Copy i is rotated by -360 / num_copies * i degrees and placed at radius.
+
+    :param mesh: MeshData
+    :param num_copies: Number of copies
+    :param radius: Radius of arrangement
+    '''
+
+    return copies(mesh, layout.radial_matrices(num_copies, radius))
+
+
+def bounds(points):
+    '''
+    Get the width, height and center of the bounding box of points.
+    '''
+
+    low = points.min(axis=0)
+    high = points.max(axis=0)
+    size = high - low
+    return size[0], size[1], ((low + high) * 0.5).tolist()
+
+
+def cloth_flaps(width, height, center, num_flaps, radius,
+                subdivisions_width=1, subdivisions_height=1):
+    '''
+    Radially arranged cloth flaps of a split flap as one mesh.
+
+    :param width: Width of a flap
+    :param height: Height of a flap
+    :param center: Center of the unarranged flap
+    :param num_flaps: Number of flaps
+    :param radius: Radius of arrangement
+    '''
+
+    flap = plane(
+        width,
+        height,
+        center,
+        subdivisions_width,
+        subdivisions_height
+    )
+    return radial_copies(flap, num_flaps, radius)
+
+
+def reverse_faces(counts, connects):
+    '''
+    Reverse the winding of every face.
+
+    :returns: int array of face vertex indices
+    '''
+
+    faces = np.split(np.asarray(connects), np.cumsum(counts)[:-1])
+    return np.concatenate([face[::-1] for face in faces])
+
+
+def card_flaps(cloth, num_flaps):
+    '''
+    Double sided cards of a split flap built from its cloth flaps. The front
+    of each flap shows the top half of its image and the back the bottom
+    half, with uvs in [0, 1] ready for pack_uvs.
+
+    :param cloth: MeshData of the cloth flaps, see cloth_flaps
+    :param num_flaps: Number of flaps in cloth
+    :returns: (MeshData, flap index of every uv, top uv mask)
+    '''
+
+    uvs = cloth.uvs
+    front_uvs = np.column_stack([uvs[:, 0], 0.5 + uvs[:, 1] * 0.5])
+    back_uvs = np.column_stack([uvs[:, 0], 0.5 - uvs[:, 1] * 0.5])
+    face_uvs = cloth.face_uvs
+    data = MeshData(
+        cloth.points,
+        np.concatenate([cloth.counts, cloth.counts]),
+        np.concatenate([
+            cloth.connects,
+            reverse_faces(cloth.counts, cloth.connects)
+        ]),
+        np.concatenate([front_uvs, back_uvs]),
+        np.concatenate([
+            face_uvs,
+            reverse_faces(cloth.counts, face_uvs) + cloth.num_uvs
+        ])
+    )
+
+    flaps = np.arange(cloth.num_uvs) // (cloth.num_uvs // num_flaps)
+    top = np.zeros(data.num_uvs, dtype=bool)
+    top[:cloth.num_uvs] = True
+    return data, np.concatenate([flaps, flaps]), top
+
+
+def collider(width, height, radius, size=(0.2, 0.05, 0.05)):
+    '''
+    Four wedges stopping the flaps above and below the wheel.
+
+    :param width: Width of the combined flaps
+    :param height: Height of the combined flaps
+    :param radius: Radius of the wheel
+    :param size: Size of each wedge before merging
+    '''
+
+    tx = width * 0.5
+    ty = height * 0.505 - radius
+    tz = radius * 1.08
+    tz2 = radius * 1.15
+    upper = [(7, 5), (6, 4)]
+    lower = [(3, 1), (2, 0)]
+    return combine([
+        merge_vertices(cube(size, (tx, ty, tz)), upper),
+        merge_vertices(cube(size, (-tx, ty, tz)), upper),
+        merge_vertices(cube(size, (tx, -ty, -tz2)), lower),
+        merge_vertices(cube(size, (-tx, -ty, -tz2)), lower),
+    ])
@@ -1,20 +1,50 @@
 from __future__ import division, print_function
+import json
+import os
+import random
+import time
 import pymel.core as pm
-from . import utils
+from maya import cmds
+from maya.api import OpenMaya
+import numpy as np
+from . import utils, layout, lod, mesh, shading, splitflap_nodes
+from .timeline import StateTimeline
+from .manifest import Manifest, get_manifest_path
+from .uv import CellPacking
 from .ui import ProgressBar
 
 
+BACKENDS = ('pymel', 'openmaya')
+
+
 class SplitFlapWall(object):
 
     def __init__(self, pynode):
         self.pynode = pynode
-        self._split_flaps = None
+        self._split_flap = None
         self._world_grp = None
         self._flaps = None
         self._cloth = None
         self._collider = None
         self._anim_grp = None
         self._dyn_grp = None
+        self._anim_joints = None
+        self._deformer = None
+        self._deformers = None
+        self._deformer_plugs = {}
+        self._lods = None
+        self._chunk_nodes = {}
+        self._attrs = {}
+
+    def clear_cache(self):
+        '''Forget all cached nodes and attributes.'''
+        self.__init__(self.pynode)
+
+    def attr(self, name):
+        '''Get a cached attribute of the wall root.'''
+        if name not in self._attrs:
+            self._attrs[name] = self.pynode.attr(name)
+        return self._attrs[name]
 
     @property
     def flaps(self):
@@ -34,12 +64,137 @@ class SplitFlapWall(object):
             self._collider = self.pynode.collider.inputs()[0]
         return self._collider
 
+    def _chunks(self, name):
+        if name not in self._chunk_nodes:
+            if self.pynode.hasAttr(name + '_chunks'):
+                nodes = self.pynode.attr(name + '_chunks').inputs()
+            else:
+                nodes = [getattr(self, name)]
+            self._chunk_nodes[name] = nodes
+        return self._chunk_nodes[name]
+
+    @property
+    def number_of_chunks(self):
+        if not self.pynode.hasAttr('number_of_chunks'):
+            return 1
+        return self.attr('number_of_chunks').get()
+
+    @property
+    def chunk_cells(self):
+        '''Cell indices of every chunk in row, column order'''
+        return layout.chunk_cells(
+            self.number_of_rows.get() * self.number_of_columns.get(),
+            self.number_of_chunks
+        )
+
+    @property
+    def flaps_chunks(self):
+        '''Flaps mesh of every chunk, flaps is the first'''
+        return self._chunks('flaps')
+
+    @property
+    def cloth_chunks(self):
+        '''Cloth mesh of every chunk, cloth is the first'''
+        return self._chunks('cloth')
+
+    @property
+    def collider_chunks(self):
+        '''Collider mesh of every chunk, collider is the first'''
+        return self._chunks('collider')
+
     @property
     def dyn_grp(self):
         if not self._dyn_grp:
             self._dyn_grp = self.pynode.dyn_grp.inputs()[0]
         return self._dyn_grp
 
+    @property
+    def world_grp(self):
+        if not self._world_grp:
+            self._world_grp = self.pynode.world_grp.inputs()[0]
+        return self._world_grp
+
+    @property
+    def anim_grp(self):
+        if not self._anim_grp:
+            self._anim_grp = self.pynode.anim_grp.inputs()[0]
+        return self._anim_grp
+
+    @property
+    def split_flap(self):
+        '''SplitFlap the wall was created from'''
+        if not self._split_flap:
+            root = self.pynode.base_split_flap.inputs()[0]
+            self._split_flap = SplitFlap(root)
+        return self._split_flap
+
+    @property
+    def anim_joints(self):
+        '''anim_{rc}_xform joints in row, column order'''
+        if not self._anim_joints:
+            self._anim_joints = self.anim_grp.getChildren(type='joint')
+        return self._anim_joints
+
+    @property
+    def deformer(self):
+        '''The splitFlapWallDeformer on flaps, see add_deformer'''
+        if not self._deformer and self.pynode.hasAttr('deformer'):
+            inputs = self.pynode.deformer.inputs()
+            self._deformer = inputs[0] if inputs else None
+        return self._deformer
+
+    @property
+    def deformers(self):
+        '''
+        List of (deformer, cells) of every flaps chunk, cells is None when
+        the deformer covers the whole wall
+        '''
+        if self._deformers is None:
+            self._deformers = []
+            if self.deformer:
+                chunks = self.flaps_chunks
+                for flaps, cells in zip(chunks, self.chunk_cells):
+                    found = flaps.history(type=splitflap_nodes.WALL_DEFORMER)
+                    if found:
+                        cells = cells if len(chunks) > 1 else None
+                        self._deformers.append((found[0], cells))
+        return self._deformers
+
+    @property
+    def rig(self):
+        if not self.pynode.hasAttr('rig'):
+            return 'constraint'
+        return self.attr('rig').get()
+
+    @property
+    def cell_xforms(self):
+        '''Transforms driving each cell in row, column order'''
+        if self.rig == 'matrix':
+            return self.anim_joints
+        return self.world_grp.getChildren()
+
+    @property
+    def cell_translations(self):
+        '''Translation of every cell in row, column order'''
+        return np.array([j.getTranslation() for j in self.anim_joints])
+
+    @property
+    def cell_uv_offsets(self):
+        '''Uv offset of every cell from the base split flap's uvs'''
+        return self.split_flap.cell_uv_offsets
+
+    @property
+    def number_of_rows(self):
+        return self.attr('number_of_rows')
+
+    @property
+    def number_of_columns(self):
+        return self.attr('number_of_columns')
+
+    @property
+    def number_of_images(self):
+        return self.attr('number_of_images')
+
     @property
     def is_dynamic(self):
         return bool(self.cloth.history(type='nCloth'))
@@ -49,15 +204,61 @@ class SplitFlapWall(object):
         cloth_shape = self.cloth.getShape(noIntermediate=True)
         return cloth_shape.inMesh.inputs(type='nCloth')[0]
 
+    @property
+    def ncloth_shapes(self):
+        '''nCloth shape of every chunk'''
+        return [
+            cloth.getShape(noIntermediate=True).inMesh.inputs(type='nCloth')[0]
+            for cloth in self.cloth_chunks
+        ]
+
+    @property
+    def transform_arrays(self):
+        '''Transforms array node of every chunk, feeding its copiers'''
+        arrays = []
+        for cloth in self.cloth_chunks:
+            # The cloth copier drives the intermediate shape once dynamic
+            for shape in cloth.getShapes():
+                inputs = shape.inMesh.inputs()
+                if inputs and inputs[0].hasAttr('posArray'):
+                    arrays.append(inputs[0].posArray.inputs()[0])
+                    break
+        return arrays
+
     @classmethod
-    def create(cls, split_flap, padding=(0.2, 0)):
+    def create(cls, split_flap, padding=(0.2, 0), rig='constraint', chunks=1,
+               manifest=None, backend=None, offset_uvs=False):
         '''
         :param split_flap: SplitFlap object
         :param rows: Number of rows in layout
         :param columns: Number of columns in layout
         :param padding: Padding in cm between SplitFlaps
+        :param rig: "constraint" drives the copiers through a rot_* group
+            chain and parentConstrained world locator per cell. "matrix"
+            connects each anim joint's worldMatrix to the copiers directly,
+            with no constraints, locators or rot groups to evaluate.
+        :param chunks: Number of flaps, cloth and collider meshes to split
+            the cells into. Each chunk has its own copiers and deformers so
+            chunks can be evaluated in parallel.
+        :param manifest: Directory to write a manifest of the wall to, see
+            write_manifest
+        :param backend: "pymel" creates every cell with pymel commands.
+            "openmaya" batches node creation, keys and connections in
+            OpenMaya modifiers and creates each chunk's flaps as one mesh,
+            its changes can not be undone so build it in a
+            utils.tracked_build. Defaults to the SPLITFLAP_BACKEND
+            environment variable or "pymel", see compare_backends.
+        :param offset_uvs: Apply the uv offsets of cells and images at
+            shading time, see add_offset_uvs
         '''
 
+        if rig not in ('constraint', 'matrix'):
+            raise ValueError('Unknown rig type: {}'.format(rig))
+        if backend is None:
+            backend = os.environ.get('SPLITFLAP_BACKEND', 'pymel')
+        if backend not in BACKENDS:
+            raise ValueError('Unknown backend: {}'.format(backend))
+
         ProgressBar.setup(
             title='Creating Split Flap Wall',
             text='Duplicating base split flap...',
@@ -70,75 +271,111 @@ class SplitFlapWall(object):
         bounds = split_flap.flaps.boundingBox()
         x_step = bounds.width() + padding[0]
         y_step = bounds.height() + padding[1]
-        x_offset = x_step * (columns - 1) * 0.5
-        y_offset = y_step * (rows - 1)
-        u_step = 1 / columns
-        v_step = 1 / rows
-        uvs = utils.get_uvs(split_flap.flaps)
-        uvids = utils.get_uvs_in_range(uvs, 0, 0, 9999, 9999)
+        translations = layout.grid_translations(rows, columns, x_step, y_step)
 
         world_grp = pm.group(name='world_grp', em=True)
         anim_grp = pm.group(name='anim_grp', em=True)
 
-        # Create soup copiers
-        arrays = []
-        xforms = []
-
-        ProgressBar.set(10, 'Copying rotate geo...')
-        rotators = list(split_flap.rotators)
-        rot_copier = utils.create_copier(
-            [rotators.pop()],
-            name=str(rotators) + '_cp')
-        rot_xform, rot_copier, rot_array = rot_copier
-        arrays.append(rot_array)
-        xforms.append(rot_xform)
-
-        while rotators:
-            r = rotators.pop()
-            copier = utils.create_copier(
-                [r],
-                name=str(r) + '_cp',
-                in_array=rot_array
+        # Create copiers, one set per chunk of cells
+        cells = layout.chunk_cells(rows * columns, chunks)
+        chunk_copiers = []
+        for k in range(len(cells)):
+            ProgressBar.set(
+                10 + k * 30 // len(cells),
+                'Creating copiers...'
             )
-            xforms.append(copier[0])
-
-        ProgressBar.set(20, 'Copying translate geo...')
-        copies = list(split_flap.copies)
-        while copies:
-            copy = copies.pop()
-            static_copier = utils.create_copier(
-                [copy],
-                name=str(copy) + '_cp',
-                in_array=rot_array,
-                rotate=False
-            )
-            xforms.append(static_copier[0])
+            suffix = '_{:02d}'.format(k) if len(cells) > 1 else ''
+            chunk_copiers.append(cls._create_copiers(split_flap, suffix))
+
+        cloth_xforms = [c[1] for c in chunk_copiers]
+        cldr_xforms = [c[2] for c in chunk_copiers]
+        xforms = [x for c in chunk_copiers for x in c[3]]
+        dyn_grp = pm.group(cldr_xforms + cloth_xforms, name='dynamics_grp')
+
+        create_cells = cls._create_cells_pymel
+        if backend == 'openmaya':
+            create_cells = cls._create_cells_openmaya
+        flaps_geos = create_cells(
+            split_flap,
+            translations,
+            cells,
+            chunk_copiers,
+            rig,
+            world_grp,
+            anim_grp
+        )
 
-        ProgressBar.set(30, 'Copying cloth geo...')
-        cloth_copier = utils.create_copier(
-            [split_flap.cloth],
-            name='ncloth_cp',
-            in_array=rot_array
+        ProgressBar.set(95, 'Grouping and adding attributes...')
+        split_flap.pynode.hide()
+        grp = pm.group(
+            flaps_geos + xforms + [world_grp, anim_grp, dyn_grp],
+            name='wall_grp')
+        grp.addAttr('split_flap_wall', at='bool', dv=True)
+        grp.addAttr('rig', dt='string')
+        grp.rig.set(rig)
+        grp.addAttr('number_of_rows', at='long', dv=rows)
+        grp.addAttr('number_of_columns', at='long', dv=columns)
+        grp.addAttr(
+            'number_of_images',
+            at='long',
+            dv=split_flap.number_of_images.get()
         )
-        cloth_xform, cloth_copier, cloth_array = cloth_copier
-        cloth_xform.hide()
+        grp.addAttr('number_of_chunks', at='long', dv=len(cells))
+        grp.addAttr('padding', dt='doubleArray')
+        grp.padding.set(list(padding), type='doubleArray')
+        grp.addAttr('world_grp', at='message')
+        grp.addAttr('flaps', at='message')
+        grp.addAttr('cloth', at='message')
+        grp.addAttr('collider', at='message')
+        grp.addAttr('anim_grp', at='message')
+        grp.addAttr('dyn_grp', at='message')
+        grp.addAttr('base_split_flap', at='message')
+        for name in ('flaps', 'cloth', 'collider'):
+            grp.addAttr(name + '_chunks', at='message', multi=True)
+        world_grp.message.connect(grp.world_grp)
+        flaps_geos[0].message.connect(grp.flaps)
+        anim_grp.message.connect(grp.anim_grp)
+        cloth_xforms[0].message.connect(grp.cloth)
+        cldr_xforms[0].message.connect(grp.collider)
+        dyn_grp.message.connect(grp.dyn_grp)
+        for k in range(len(cells)):
+            flaps_geos[k].message.connect(grp.flaps_chunks[k])
+            cloth_xforms[k].message.connect(grp.cloth_chunks[k])
+            cldr_xforms[k].message.connect(grp.collider_chunks[k])
+        split_flap.pynode.message.connect(grp.base_split_flap)
+
+        wall = cls(grp)
+        if offset_uvs:
+            ProgressBar.set(97, 'Adding offset uvs...')
+            wall.add_offset_uvs()
+        if manifest:
+            ProgressBar.set(98, 'Writing manifest...')
+            wall.write_manifest(manifest)
 
-        ProgressBar.set(40, 'Copying collider geo...')
-        cldr_copier = utils.create_copier(
-            [split_flap.collider],
-            'nrigid_cp',
-            rotate=False,
-            in_array=rot_array)
-        cldr_xform, cldr_copier, cldr_array = cldr_copier
-        cldr_xform.hide()
+        ProgressBar.set(100, 'Done!')
+        ProgressBar.hide()
+        return wall
 
-        dyn_grp = pm.group([cldr_xform, cloth_xform], name='dynamics_grp')
+    @staticmethod
+    def _create_cells_pymel(split_flap, translations, cells, chunk_copiers,
+                            rig, world_grp, anim_grp):
+        '''
+        Create the flaps, anim joints and cell xforms of every cell with
+        pymel commands, returns the flaps mesh of every chunk.
+        '''
+
+        rows = split_flap.number_of_rows.get()
+        columns = split_flap.number_of_columns.get()
+        uv_offsets = split_flap.cell_uv_offsets.tolist()
+        uvs = utils.get_uvs(split_flap.flaps)
+        uvids = utils.get_uvs_in_range(uvs, 0, 0, 9999, 9999)
 
         split_flaps = []
+        anim_jnts = []
         step = 30 / rows * columns
         i = 0
-        for r in xrange(rows):
-            for c in xrange(columns):
+        for r in range(rows):
+            for c in range(columns):
                 ProgressBar.set(
                     40 + i * step,
                     'Creating Split Flap {}'.format(i + 1)
@@ -149,86 +386,691 @@ class SplitFlapWall(object):
                     name=name,
                     un=True,
                     rc=False)[0]
-                translate = (c * x_step - x_offset, r * -y_step + y_offset, 0)
-
-                # Translate flaps
-                new_flap.setTranslation(translate)
 
                 # Create animation hierarchy
-                loc = pm.spaceLocator(name='world_{}_xform'.format(index_name))
-                loc.hide()
-                loc.setTranslation(translate)
-
                 jnt_name = 'anim_{}_xform'.format(index_name)
                 anim_jnt = utils.create_joint(jnt_name)
-                anim_jnt.setTranslation(translate)
                 anim_jnt.rotateX.setKey(v=0, t=1)
                 anim_jnt.rotateX.setKey(v=90, t=24)
-                parent = anim_jnt
-                for i in range(6):
-                    rot_name = 'rot_{}_{:02d}'.format(index_name, i)
-                    rot_grp = pm.group(em=True, name=rot_name)
-                    pm.parent(rot_grp, parent, relative=True)
-                    parent = rot_grp
-
                 pm.parent(anim_jnt, anim_grp)
-                pm.parent(loc, world_grp)
-                pm.parentConstraint(parent, loc)
+
+                if rig == 'constraint':
+                    # Locators follow the parentConstraint so only flaps and
+                    # joints are translated
+                    loc = pm.spaceLocator(
+                        name='world_{}_xform'.format(index_name)
+                    )
+                    loc.hide()
+
+                    parent = anim_jnt
+                    for k in range(6):
+                        rot_name = 'rot_{}_{:02d}'.format(index_name, k)
+                        rot_grp = pm.group(em=True, name=rot_name)
+                        pm.parent(rot_grp, parent, relative=True)
+                        parent = rot_grp
+
+                    pm.parent(loc, world_grp)
+                    pm.parentConstraint(parent, loc)
 
                 # Shift uvs
                 mesh_uvs = list(uvs)
-                utils.shift_uvs(mesh_uvs, uvids, c * u_step, r * -v_step)
+                utils.shift_uvs(mesh_uvs, uvids, *uv_offsets[i])
                 utils.set_uvs(new_flap, mesh_uvs)
 
                 split_flaps.append(new_flap)
+                anim_jnts.append(anim_jnt)
                 i += 1
 
+        ProgressBar.set(70, 'Translating split flaps...')
+        utils.set_transforms(
+            split_flaps + anim_jnts,
+            np.concatenate([translations, translations])
+        )
+
         ProgressBar.set(75, 'Connecting xforms to copier arrays...')
-        for i, l in enumerate(world_grp.getChildren()):
-            l.rotateOrder.connect(rot_array.inTransforms[i].inRotateOrder)
-            l.worldMatrix[0].connect(rot_array.inTransforms[i].inMatrix)
+        if rig == 'constraint':
+            cell_xforms = world_grp.getChildren()
+        else:
+            cell_xforms = anim_jnts
+        for chunk, copiers in zip(cells, chunk_copiers):
+            rot_array = copiers[0]
+            for i, l in enumerate(cell_xforms[chunk[0]:chunk[-1] + 1]):
+                l.rotateOrder.connect(
+                    rot_array.inTransforms[i].inRotateOrder
+                )
+                l.worldMatrix[0].connect(rot_array.inTransforms[i].inMatrix)
 
         ProgressBar.set(80, 'Combining flap geometry...takes awhile')
-        flaps_geo = pm.polyUnite(
-            split_flaps,
-            ch=False,
-            mergeUVSets=True,
-            name='flaps_geo'
-        )[0]
+        flaps_geos = []
+        for k, chunk in enumerate(cells):
+            name = 'flaps_geo'
+            if len(cells) > 1:
+                name = 'flaps_{:02d}_geo'.format(k)
+            chunk_flaps = split_flaps[chunk[0]:chunk[-1] + 1]
+            if len(chunk_flaps) == 1:
+                flaps_geos.append(chunk_flaps[0].rename(name))
+                continue
+            flaps_geos.append(pm.polyUnite(
+                chunk_flaps,
+                ch=False,
+                mergeUVSets=True,
+                name=name
+            )[0])
+        return flaps_geos
+
+    @staticmethod
+    def _create_cells_openmaya(split_flap, translations, cells, chunk_copiers,
+                               rig, world_grp, anim_grp):
+        '''
+        Create the flaps, anim joints and cell xforms of every cell with
+        OpenMaya modifiers, returns the flaps mesh of every chunk. Nodes are
+        created in a few batches instead of one command per node, and the
+        flaps of each chunk are created as one mesh instead of duplicated
+        and united.
+        '''
 
-        ProgressBar.set(95, 'Grouping and adding attributes...')
-        split_flap.pynode.hide()
-        grp = pm.group(
-            [flaps_geo, xforms, world_grp, anim_grp, dyn_grp],
-            name='wall_grp')
-        grp.addAttr('world_grp', at='message')
-        grp.addAttr('flaps', at='message')
-        grp.addAttr('cloth', at='message')
-        grp.addAttr('collider', at='message')
-        grp.addAttr('anim_grp', at='message')
-        grp.addAttr('dyn_grp', at='message')
-        world_grp.message.connect(grp.world_grp)
-        flaps_geo.message.connect(grp.flaps)
-        anim_grp.message.connect(grp.anim_grp)
-        cloth_xform.message.connect(grp.cloth)
-        cldr_xform.message.connect(grp.collider)
-        dyn_grp.message.connect(grp.dyn_grp)
+        rows = split_flap.number_of_rows.get()
+        columns = split_flap.number_of_columns.get()
+        index_names = [
+            '{:02d}{:02d}'.format(r, c)
+            for r in range(rows)
+            for c in range(columns)
+        ]
+
+        # Create animation hierarchy
+        ProgressBar.set(40, 'Creating anim joints...')
+        anim_obj = utils.get_mobject(anim_grp.name())
+        anim_jnts = utils.create_dag_nodes(
+            'joint',
+            ['anim_{}_xform'.format(n) for n in index_names],
+            [anim_obj] * len(index_names)
+        )
+        utils.key_plugs(
+            [utils.find_plug(j, 'rotateX') for j in anim_jnts],
+            (1, 24),
+            (0, 90)
+        )
 
-        ProgressBar.set(100, 'Done!')
-        ProgressBar.hide()
-        return cls(grp)
+        cell_xforms = anim_jnts
+        if rig == 'constraint':
+            ProgressBar.set(50, 'Creating rot groups and locators...')
+            parents = anim_jnts
+            for i in range(6):
+                parents = utils.create_dag_nodes(
+                    'transform',
+                    ['rot_{}_{:02d}'.format(n, i) for n in index_names],
+                    parents
+                )
+
+            # Locators follow the parentConstraint so only flaps and joints
+            # are translated
+            world_obj = utils.get_mobject(world_grp.name())
+            locs = utils.create_dag_nodes(
+                'transform',
+                ['world_{}_xform'.format(n) for n in index_names],
+                [world_obj] * len(index_names)
+            )
+            utils.create_dag_nodes(
+                'locator',
+                ['world_{}_xformShape'.format(n) for n in index_names],
+                locs
+            )
+            modifier = OpenMaya.MDGModifier()
+            for loc in locs:
+                modifier.newPlugValueBool(
+                    utils.find_plug(loc, 'visibility'),
+                    False
+                )
+            modifier.doIt()
+
+            ProgressBar.set(60, 'Constraining locators...')
+            get_path = OpenMaya.MDagPath.getAPathTo
+            for parent, loc in zip(parents, locs):
+                cmds.parentConstraint(
+                    get_path(parent).fullPathName(),
+                    get_path(loc).fullPathName()
+                )
+            cell_xforms = locs
+
+        ProgressBar.set(70, 'Translating anim joints...')
+        modifier = OpenMaya.MDGModifier()
+        for jnt, translation in zip(anim_jnts, translations.tolist()):
+            for axis, value in zip('XYZ', translation):
+                modifier.newPlugValueDouble(
+                    utils.find_plug(jnt, 'translate' + axis),
+                    value
+                )
+        modifier.doIt()
+
+        ProgressBar.set(75, 'Connecting xforms to copier arrays...')
+        connections = []
+        for chunk, copiers in zip(cells, chunk_copiers):
+            rot_array = utils.get_mobject(copiers[0].name())
+            for i, xform in enumerate(cell_xforms[chunk[0]:chunk[-1] + 1]):
+                element = 'inTransforms[{}].'.format(i)
+                connections.append((
+                    utils.find_plug(xform, 'rotateOrder'),
+                    utils.find_plug(rot_array, element + 'inRotateOrder')
+                ))
+                connections.append((
+                    utils.find_plug(xform, 'worldMatrix[0]'),
+                    utils.find_plug(rot_array, element + 'inMatrix')
+                ))
+        utils.connect_plugs(connections)
+
+        ProgressBar.set(80, 'Creating flap geometry...')
+        data = utils.read_mesh(split_flap.flaps)
+        shading_engine = utils.get_shading_engine(split_flap.flaps)
+        uv_offsets = split_flap.cell_uv_offsets
+        flaps_geos = []
+        for k, chunk in enumerate(cells):
+            name = 'flaps_geo'
+            if len(cells) > 1:
+                name = 'flaps_{:02d}_geo'.format(k)
+            flaps_geos.append(utils.create_cell_mesh(
+                data,
+                translations[chunk],
+                uv_offsets[chunk],
+                name=name,
+                shading_engine=shading_engine
+            ))
+        return flaps_geos
+
+    @staticmethod
+    def _create_copiers(split_flap, suffix=''):
+        '''
+        Create the copiers of one chunk of cells, all sharing one transforms
+        array.
+
+        :returns: (array, cloth_xform, collider_xform, other copier xforms)
+        '''
+
+        cloth_xform, _, rot_array = utils.create_copier(
+            [split_flap.cloth],
+            name='ncloth{}_cp'.format(suffix)
+        )
+        cloth_xform.hide()
+
+        xforms = []
+        for r in split_flap.rotators:
+            xforms.append(utils.create_copier(
+                [r],
+                name='{}{}_cp'.format(r, suffix),
+                in_array=rot_array
+            )[0])
+
+        for copy in split_flap.copies:
+            xforms.append(utils.create_copier(
+                [copy],
+                name='{}{}_cp'.format(copy, suffix),
+                in_array=rot_array,
+                rotate=False
+            )[0])
+
+        cldr_xform = utils.create_copier(
+            [split_flap.collider],
+            'nrigid{}_cp'.format(suffix),
+            rotate=False,
+            in_array=rot_array
+        )[0]
+        cldr_xform.hide()
+        return rot_array, cloth_xform, cldr_xform, xforms
 
     def make_dynamic(self):
         if self.is_dynamic:
             return
 
-        ncloth_shapes, ncloth_transforms = utils.make_nCloth(self.cloth)
-        ncol_shapes, ncol_transforms = utils.make_nCollider(self.collider)
-        wrap, base = utils.create_wrap_deformer(self.cloth, self.flaps)
+        # Every chunk gets its own nCloth, nRigid and wrap deformer
+        cloth_chunks = self.cloth_chunks
+        ncloth_shapes, ncloth_transforms = utils.make_nCloth(*cloth_chunks)
+        ncol_shapes, ncol_transforms = utils.make_nCollider(
+            *self.collider_chunks
+        )
+        bases = []
+        for cloth, flaps in zip(cloth_chunks, self.flaps_chunks):
+            wrap, base = utils.create_wrap_deformer(cloth, flaps)
+            bases.append(base)
 
         pm.parent(ncloth_transforms, self.dyn_grp)
         pm.parent(ncol_transforms, self.dyn_grp)
-        pm.parent(base, self.dyn_grp)
+        pm.parent(bases, self.dyn_grp)
+
+    def add_deformer(self):
+        '''
+        Add a splitFlapWallDeformer to every flaps chunk so every cell can be
+        rotated by setting one array, see set_cell_indices and
+        set_cell_rotations. Cells rotate around their anim joint.
+        '''
+
+        if self.deformer:
+            return self.deformer
+
+        pivots = np.array([j.getTranslation() for j in self.anim_joints])
+        num_images = self.number_of_images.get()
+        deformers = [
+            utils.create_wall_deformer(
+                flaps,
+                len(cells),
+                pivots[cells],
+                num_images
+            )
+            for flaps, cells in zip(self.flaps_chunks, self.chunk_cells)
+        ]
+        if not self.pynode.hasAttr('deformer'):
+            self.pynode.addAttr('deformer', at='message')
+        deformers[0].message.connect(self.pynode.deformer)
+        self._deformer = deformers[0]
+        self._deformers = None
+        return deformers[0]
+
+    def _deformer_plug(self, deformer, name):
+        key = deformer.name(), name
+        if key not in self._deformer_plugs:
+            self._deformer_plugs[key] = splitflap_nodes.get_plug(
+                deformer.attr(name).name()
+            )
+        return self._deformer_plugs[key]
+
+    def _set_deformers(self, name, values, use_indices):
+        set_array = splitflap_nodes.set_double_array
+        if use_indices:
+            set_array = splitflap_nodes.set_int_array
+
+        targets = list(self.deformers)
+        targets += [(d, cells) for _, d, cells in self.lods if d]
+        values = np.asarray(values)
+        for deformer, cells in targets:
+            plug = self._deformer_plug(deformer, name)
+            set_array(plug, values if cells is None else values[cells])
+            self._deformer_plug(deformer, 'useIndices').setBool(use_indices)
+
+    def set_cell_indices(self, indices):
+        '''
+        Show image indices[i] on cell i, in row, column order. Lod meshes
+        built after add_deformer follow too.
+
+        :param indices: Sequence of ints
+        '''
+
+        self._set_deformers('cellIndices', indices, True)
+
+    def set_cell_rotations(self, rotations):
+        '''
+        Rotate cell i by rotations[i] degrees, in row, column order. Lod
+        meshes built after add_deformer follow too.
+
+        :param rotations: Sequence of floats
+        '''
+
+        self._set_deformers('cellRotations', rotations, False)
+
+    @property
+    def has_offset_uvs(self):
+        return self.pynode.hasAttr('image_orders')
+
+    @property
+    def image_orders(self):
+        '''
+        Image shown in place of every image of every cell, of shape
+        (num_cells, num_images), see set_image_orders
+        '''
+        num_images = self.number_of_images.get()
+        orders = None
+        if self.has_offset_uvs:
+            orders = np.array(
+                self.attr('image_orders').get(),
+                dtype=np.int64
+            ).reshape(-1, num_images)
+        return shading.cell_orders(
+            orders,
+            len(self.anim_joints),
+            num_images
+        )
+
+    def _offset_uv_meshes(self):
+        '''List of (mesh, cells) of every flaps chunk and lod mesh'''
+        meshes = list(zip(self.flaps_chunks, self.chunk_cells))
+        meshes += [(node, cells) for node, _, cells in self.lods]
+        return meshes
+
+    def _add_offset_uvs(self, node, cells, orders):
+        split_flap = self.split_flap
+        utils.add_offset_uvs(
+            node,
+            self.cell_uv_offsets[cells],
+            self.number_of_images.get(),
+            split_flap.packing.tile_offset(split_flap.layout_index.get()),
+            orders[cells]
+        )
+
+    def add_offset_uvs(self, orders=None):
+        '''
+        Keep one canonical uv layout on the flaps and lod meshes and apply
+        the uv offsets of every cell and image at shading time, see
+        shading.py. Images can then be swapped with set_image_orders without
+        touching the geometry. Textures read the offsets once connected
+        with connect_offset_shader.
+
+        :param orders: Images shown by every cell, see shading.cell_orders
+        '''
+
+        if self.has_offset_uvs:
+            return
+
+        num_images = self.number_of_images.get()
+        orders = shading.cell_orders(
+            orders,
+            len(self.anim_joints),
+            num_images
+        )
+        for node, cells in self._offset_uv_meshes():
+            self._add_offset_uvs(node, cells, orders)
+        self.pynode.addAttr('image_orders', dt='Int32Array')
+        self.attr('image_orders').set(
+            orders.ravel().tolist(),
+            type='Int32Array'
+        )
+
+    def set_image_orders(self, orders):
+        '''
+        Show image orders[c][i] in place of image i on cell c, only the
+        offset uvs are written. A single order is used by every cell.
+
+        :param orders: Image indices of shape (num_images,) or (num_cells,
+            num_images), see shading.cell_orders
+        '''
+
+        if not self.has_offset_uvs:
+            raise RuntimeError(
+                '{} has no offset uvs, see add_offset_uvs'.format(self.pynode)
+            )
+
+        num_images = self.number_of_images.get()
+        uv_offsets = self.cell_uv_offsets
+        orders = shading.cell_orders(orders, len(uv_offsets), num_images)
+        for node, cells in self._offset_uv_meshes():
+            utils.set_offset_uvs(
+                node,
+                uv_offsets[cells],
+                num_images,
+                orders[cells]
+            )
+        self.attr('image_orders').set(
+            orders.ravel().tolist(),
+            type='Int32Array'
+        )
+
+    def connect_offset_shader(self, texture):
+        '''
+        Make a udim file texture apply the offset uvs of the flaps and lod
+        meshes, reconnect it after build_lods.
+
+        :param texture: pymel.PyNode file texture
+        '''
+
+        return utils.connect_offset_shader(
+            [node for node, _ in self._offset_uv_meshes()],
+            texture
+        )
+
+    @property
+    def lod_grp(self):
+        if self.pynode.hasAttr('lod_grp'):
+            inputs = self.pynode.lod_grp.inputs()
+            if inputs:
+                return inputs[0]
+
+    @property
+    def lods(self):
+        '''
+        List of (mesh, deformer, cells) of every lod mesh, see build_lods.
+        '''
+        if self._lods is None:
+            self._lods = []
+            if self.lod_grp:
+                for node in self.lod_grp.getChildren():
+                    deformers = node.history(
+                        type=splitflap_nodes.WALL_DEFORMER
+                    )
+                    cells = np.array(node.lod_cells.get(), dtype=np.int64)
+                    self._lods.append(
+                        (node, deformers[0] if deformers else None, cells)
+                    )
+        return self._lods
+
+    def cell_levels(self, camera, start=None, end=None,
+                    thresholds=lod.DEFAULT_THRESHOLDS, tile_size=1):
+        '''
+        Get the lod level of every cell as seen through a camera. Over a
+        frame range each cell gets the most detailed level it needs on any
+        frame.
+
+        :param camera: pymel.PyNode camera transform or shape
+        :param start: First frame (default: current frame)
+        :param end: Last frame (default: start)
+        :param thresholds: Minimum pixel coverage of the full and decimated
+            levels
+        :param tile_size: Number of rows and columns of cells sharing a level
+        :returns: int array of levels in row, column order
+        '''
+
+        if isinstance(camera, pm.nt.Transform):
+            camera = camera.getShape()
+        start = pm.currentTime(query=True) if start is None else start
+        end = start if end is None else end
+
+        joints = self.anim_joints
+        centers = np.array([j.getTranslation(space='world') for j in joints])
+        size = self.split_flap.flaps.boundingBox().height()
+        resolution = pm.PyNode('defaultResolution').height.get()
+
+        coverage = np.zeros(len(joints))
+        for frame in range(int(start), int(end) + 1):
+            matrix = np.array(
+                camera.getParent().worldMatrix.get(time=frame)
+            )
+            focal_length = camera.focalLength.get(time=frame)
+            aperture = camera.verticalFilmAperture.get(time=frame) * 25.4
+            fov = 2 * np.arctan(aperture * 0.5 / focal_length)
+            coverage = np.maximum(coverage, lod.screen_coverage(
+                centers,
+                size,
+                matrix[3, :3],
+                fov,
+                resolution,
+                forward=-matrix[2, :3]
+            ))
+
+        levels = lod.assign_levels(coverage, thresholds)
+        return lod.tile_levels(
+            levels,
+            self.number_of_rows.get(),
+            self.number_of_columns.get(),
+            tile_size
+        )
+
+    def build_lods(self, levels):
+        '''
+        Replace flaps with one mesh per lod level holding the cells given
+        that level. Lod meshes are static, or driven by set_cell_indices and
+        set_cell_rotations when the wall has a deformer. The split flap
+        proxies are created when missing, see SplitFlap.create_lods.
+
+        :param levels: Lod level of every cell in row, column order
+        '''
+
+        self.clear_lods()
+
+        split_flap = self.split_flap
+        proxies = split_flap.create_lods()
+        translations = self.cell_translations
+        uv_offsets = self.cell_uv_offsets
+        num_images = self.number_of_images.get()
+        shading_engine = utils.get_shading_engine(split_flap.flaps)
+
+        orders = self.image_orders
+        lod_grp = pm.group(em=True, name='lod_grp', parent=self.pynode)
+        for level, cells in enumerate(lod.level_cells(levels)):
+            if not len(cells):
+                continue
+
+            name = 'flaps_{}_geo'.format(lod.LEVELS[level])
+            node = utils.create_cell_mesh(
+                utils.read_mesh(proxies[level]),
+                translations[cells],
+                uv_offsets[cells],
+                name=name,
+                shading_engine=shading_engine
+            )
+            node.addAttr('lod_cells', dt='Int32Array')
+            node.lod_cells.set(cells.tolist(), type='Int32Array')
+            pm.parent(node, lod_grp)
+            if self.has_offset_uvs:
+                self._add_offset_uvs(node, cells, orders)
+            if self.deformer:
+                utils.create_wall_deformer(
+                    node,
+                    len(cells),
+                    translations[cells],
+                    num_images
+                )
+
+        if not self.pynode.hasAttr('lod_grp'):
+            self.pynode.addAttr('lod_grp', at='message')
+        lod_grp.message.connect(self.pynode.lod_grp)
+        pm.hide(self.flaps_chunks)
+        self._lods = None
+        return self.lods
+
+    def assign_lods(self, camera, start=None, end=None,
+                    thresholds=lod.DEFAULT_THRESHOLDS, tile_size=1):
+        '''
+        Build lod meshes for a shot, see cell_levels and build_lods.
+
+        :returns: int array of levels in row, column order
+        '''
+
+        levels = self.cell_levels(camera, start, end, thresholds, tile_size)
+        self.build_lods(levels)
+        return levels
+
+    def clear_lods(self):
+        '''Delete the lod meshes and show the full flaps again.'''
+
+        if self.lod_grp:
+            pm.delete(self.lod_grp)
+        self._lods = None
+        self._deformer_plugs = {}
+        pm.showHidden(self.flaps_chunks)
+
+    def timeline(self, start, end, **kwargs):
+        '''
+        Get the flap index of every cell over a frame range as a
+        StateTimeline, evaluated from the anim joints' animCurves.
+
+        :param start: First frame
+        :param end: Last frame, inclusive
+        :param kwargs: StateTimeline keyword arguments
+        '''
+
+        return StateTimeline.from_rotations(
+            utils.evaluate_rotations(self.anim_joints, start, end),
+            self.number_of_images.get(),
+            start,
+            **kwargs
+        )
+
+    def to_manifest(self):
+        '''
+        Describe the wall's build parameters, node names and cell layout as
+        a manifest.Manifest, with the base flaps mesh as the prototype of
+        every cell.
+        '''
+
+        split_flap = self.split_flap
+        num_images = self.number_of_images.get()
+        padding = None
+        if self.pynode.hasAttr('padding'):
+            padding = list(self.pynode.padding.get())
+        seed = None
+        if split_flap.pynode.hasAttr('seed'):
+            seed = split_flap.attr('seed').get()
+        params = dict(
+            rows=self.number_of_rows.get(),
+            columns=self.number_of_columns.get(),
+            number_of_images=num_images,
+            number_of_chunks=self.number_of_chunks,
+            rig=self.rig,
+            padding=padding,
+            layout_index=split_flap.layout_index.get(),
+            seed=seed,
+            packing=split_flap.packing.to_dict(),
+        )
+        nodes = dict(
+            wall=self.pynode.name(),
+            split_flap=split_flap.pynode.name(),
+            flaps=[n.name() for n in self.flaps_chunks],
+            cloth=[n.name() for n in self.cloth_chunks],
+            collider=[n.name() for n in self.collider_chunks],
+            deformers=[d.name() for d, _ in self.deformers],
+            anim_joints=[j.name() for j in self.anim_joints],
+        )
+
+        chunk_cells = self.chunk_cells
+        prototype = utils.read_mesh(split_flap.flaps)
+        arrays = dict(
+            translations=self.cell_translations,
+            uv_offsets=self.cell_uv_offsets,
+            indices=np.array([
+                utils.rotation_to_index(j.rotateX.get(), num_images)
+                for j in self.anim_joints
+            ], dtype=np.int32),
+            chunks=np.repeat(
+                np.arange(len(chunk_cells), dtype=np.int32),
+                [len(cells) for cells in chunk_cells]
+            ),
+            prototype_points=prototype.points,
+            prototype_counts=prototype.counts,
+            prototype_connects=prototype.connects,
+            prototype_uvs=prototype.uvs,
+            prototype_uv_connects=prototype.uv_connects,
+        )
+        return Manifest(params, nodes, arrays)
+
+    def write_manifest(self, directory):
+        '''
+        Write a manifest of the wall to directory, see load_manifest for
+        rebuilding it.
+
+        :returns: Path of the manifest JSON
+        '''
+
+        path = get_manifest_path(directory, self.pynode.name())
+        return self.to_manifest().write(path)
+
+    def time_frames(self, start=1, end=24, dynamics=False):
+        '''
+        Measure the average time to evaluate the wall's rig per frame, the
+        copiers of every chunk and the transforms arrays, joints and
+        constraints driving them.
+
+        :param start: First frame
+        :param end: Last frame, inclusive
+        :param dynamics: Evaluate the flaps of a dynamic wall instead, which
+            also simulates the nCloth and wraps the flaps
+        '''
+
+        if dynamics:
+            plugs = [flaps.getShape(noIntermediate=True).outMesh
+                     for flaps in self.flaps_chunks]
+            return utils.time_frames(plugs, start, end)
+
+        plugs = []
+        for array in self.transform_arrays:
+            for copier in array.outPositionPP.outputs():
+                if copier.outputMesh not in plugs:
+                    plugs.append(copier.outputMesh)
+        return utils.time_frames(plugs, start, end)
 
 
 class SplitFlap(object):
@@ -239,26 +1081,72 @@ class SplitFlap(object):
         self._cloth = None
         self._collider = None
         self._rotators = None
+        self._copies = None
+        self._attrs = {}
+
+    def clear_cache(self):
+        '''Forget all cached nodes and attributes.'''
+        self.__init__(self.pynode)
+
+    def attr(self, name):
+        '''Get a cached attribute of the split flap root.'''
+        if name not in self._attrs:
+            self._attrs[name] = self.pynode.attr(name)
+        return self._attrs[name]
 
     @property
     def layout_index(self):
-        return self.pynode.layout_index
+        return self.attr('layout_index')
 
     @property
     def layout_row(self):
-        return self.pynode.layout_row
+        return self.attr('layout_row')
 
     @property
     def layout_column(self):
-        return self.pynode.layout_column
+        return self.attr('layout_column')
 
     @property
     def number_of_rows(self):
-        return self.pynode.number_of_rows
+        return self.attr('number_of_rows')
 
     @property
     def number_of_columns(self):
-        return self.pynode.number_of_columns
+        return self.attr('number_of_columns')
+
+    @property
+    def number_of_images(self):
+        if not self.pynode.hasAttr('number_of_images'):
+            # Split flaps from before the attribute have one cloth face per
+            # image, migrate them so walls can be built from them
+            cloth = self.cloth.getShape(noIntermediate=True)
+            self.pynode.addAttr(
+                'number_of_images',
+                at='long',
+                dv=cloth.numFaces()
+            )
+        return self.attr('number_of_images')
+
+    @property
+    def packing(self):
+        '''uv.CellPacking of the layout, see create'''
+        if not self.pynode.hasAttr('uv_packing'):
+            return CellPacking(
+                self.number_of_rows.get(),
+                self.number_of_columns.get()
+            )
+        return CellPacking.from_dict(json.loads(self.attr('uv_packing').get()))
+
+    @property
+    def cell_uv_offsets(self):
+        '''
+        Uv offset of every cell of a wall from the split flap's uvs, in row,
+        column order
+        '''
+        return np.array(
+            self.packing.cell_offsets(self.layout_index.get()),
+            dtype=np.float64
+        )
 
     @property
     def flaps(self):
@@ -266,6 +1154,16 @@ class SplitFlap(object):
             self._flaps = self.pynode.flaps.inputs()[0]
         return self._flaps
 
+    @property
+    def base_mesh_stats(self):
+        '''Average (vertices, faces) of the base flap chosen for each image'''
+        num_images = self.number_of_images.get()
+        shape = self.flaps.getShape(noIntermediate=True)
+        return (
+            shape.numVertices() // num_images,
+            shape.numFaces() // num_images
+        )
+
     @property
     def cloth(self):
         if not self._cloth:
@@ -280,16 +1178,18 @@ class SplitFlap(object):
 
     @property
     def rotators(self):
-        rotate_grp = self.pynode.rotate_grp.inputs()[0]
-        for t in rotate_grp.getChildren():
-            if t != self.cloth:
-                yield t
+        if self._rotators is None:
+            rotate_grp = self.pynode.rotate_grp.inputs()[0]
+            self._rotators = [t for t in rotate_grp.getChildren()
+                              if t != self.cloth]
+        return self._rotators
 
     @property
     def copies(self):
-        copy_grp = self.pynode.copy_grp.inputs()[0]
-        for t in copy_grp.getChildren():
-            yield t
+        if self._copies is None:
+            copy_grp = self.pynode.copy_grp.inputs()[0]
+            self._copies = copy_grp.getChildren()
+        return self._copies
 
     @property
     def is_dynamic(self):
@@ -300,9 +1200,63 @@ class SplitFlap(object):
         cloth_shape = self.cloth.getShape(noIntermediate=True)
         return cloth_shape.inMesh.inputs(type='nCloth')[0]
 
+    @property
+    def lods(self):
+        '''
+        Flap geometry of every lod level, see lod.LEVELS. Missing levels are
+        None until create_lods is called.
+        '''
+        lods = [self.flaps]
+        for name in ('lod_decimated', 'lod_card'):
+            inputs = []
+            if self.pynode.hasAttr(name):
+                inputs = self.pynode.attr(name).inputs()
+            lods.append(inputs[0] if inputs else None)
+        return lods
+
+    def create_lods(self, percentage=75):
+        '''
+        Create the decimated and card proxies of the flaps used by
+        SplitFlapWall.build_lods.
+
+        :param percentage: Percentage of vertices removed from the decimated
+            flaps
+        '''
+
+        flaps, decimated, card = self.lods
+        name = str(flaps).replace('_geo', '')
+        if decimated is None:
+            decimated = utils.create_reduced_mesh(
+                flaps,
+                percentage,
+                name=name + '_decimated_geo'
+            )
+            self._connect_lod('lod_decimated', decimated)
+        if card is None:
+            card = utils.create_card_flaps(
+                self.cloth,
+                self.number_of_images.get(),
+                self.layout_index.get(),
+                self.number_of_rows.get(),
+                self.number_of_columns.get(),
+                name=name + '_card_geo',
+                shading_engine=utils.get_shading_engine(flaps),
+                packing=self.packing
+            )
+            self._connect_lod('lod_card', card)
+        return [flaps, decimated, card]
+
+    def _connect_lod(self, name, node):
+        node.hide()
+        pm.parent(node, self.flaps.getParent())
+        if not self.pynode.hasAttr(name):
+            self.pynode.addAttr(name, at='message')
+        node.message.connect(self.pynode.attr(name))
+
     @classmethod
     def create(cls, base_flaps, num_images,
-               rows, columns, radius, layout_index=0):
+               rows, columns, radius, layout_index=0, seed=None,
+               packing='grid', max_tiles=1):
         '''
         :param base_flaps: Base flaps to choose from
         :param num_images: Number of images in sequence
@@ -310,6 +1264,15 @@ class SplitFlap(object):
         :param columns: Number of columns in layout
         :param radius: Radius
         :param layout_index: Index in row column layout
+        :param seed: Random seed used to choose base flaps, rebuilding with
+            the same seed produces the same split flap
+        :param packing: "grid" packs every cell of the layout into a
+            1 / columns x 1 / rows region of each image's udim tile. "dense"
+            packs cells with the aspect of the flaps, so walls far from
+            square need smaller textures for the same resolution, see
+            uv.CellPacking.dense.
+        :param max_tiles: Maximum number of udim tiles per image when
+            packing is "dense"
         '''
 
         ProgressBar.setup(
@@ -319,43 +1282,53 @@ class SplitFlap(object):
             parent=utils.get_maya_window()
         )
 
-        flaps = utils.create_flaps(
-            num_images,
-            base_flaps,
-            layout_index,
-            rows,
-            columns)
-
-        ProgressBar.set(10, 'Creating cloth flaps...')
-        cloth_flaps = [utils.create_cloth_flap(flaps[0])]
-        cloth_flaps.extend([cloth_flaps[0].duplicate(rc=True)[0]
-                            for i in xrange(num_images - 1)])
-
-        ProgressBar.set(20, 'Radially arranging flaps...')
-        utils.radial_arrangement(flaps, radius)
-
-        ProgressBar.set(30, 'Radially arranging cloth flaps')
-        utils.radial_arrangement(cloth_flaps, radius)
+        if seed is None:
+            seed = random.randrange(2 ** 31)
 
         r, c = utils.get_row_col(layout_index, None, columns)
         rowcol = '{:02d}{:02d}'.format(int(r), int(c))
         cloth_name = 'cloth_flap_{}'.format(rowcol)
         flaps_name = 'flaps_{}'.format(rowcol)
 
-        ProgressBar.set(50, 'Combining cloth geo...')
-        cloth = pm.polyUnite(
-            cloth_flaps,
-            ch=False,
-            mergeUVSets=True,
-            name=cloth_name + '_geo',
-        )[0]
-        ProgressBar.set(60, 'Combining flap geo...')
-        flaps = pm.polyUnite(
-            flaps,
-            ch=False,
-            mergeUVSets=True,
+        ProgressBar.set(10, 'Preparing base flaps...')
+        if packing == 'grid':
+            cell_packing = CellPacking(rows, columns)
+        elif packing == 'dense':
+            # A cell shows both halves of a flap stacked
+            bounds = base_flaps[0].boundingBox()
+            cell_packing = CellPacking.dense(
+                rows,
+                columns,
+                bounds.width() / (2 * bounds.height()),
+                max_tiles,
+                num_images
+            )
+        else:
+            raise ValueError('Unknown packing: {}'.format(packing))
+        pool = utils.FlapVariantPool(
+            base_flaps,
+            layout_index,
+            rows,
+            columns,
+            cell_packing
+        )
+        choices = pool.choose(num_images, seed)
+
+        ProgressBar.set(30, 'Creating flap geo...')
+        flaps = utils.create_flap_mesh(
+            pool,
+            choices,
+            radius,
             name=flaps_name + '_geo',
-        )[0]
+        )
+
+        ProgressBar.set(50, 'Creating cloth flaps...')
+        cloth = utils.create_cloth_flaps(
+            pool.bounds(choices[0]),
+            num_images,
+            radius,
+            name=cloth_name + '_geo',
+        )
         pm.hide(cloth)
 
         # Create colliders
@@ -378,6 +1351,10 @@ class SplitFlap(object):
         split_flap.addAttr('layout_column', at='long', dv=c)
         split_flap.addAttr('number_of_rows', at='long', dv=rows)
         split_flap.addAttr('number_of_columns', at='long', dv=columns)
+        split_flap.addAttr('number_of_images', at='long', dv=num_images)
+        split_flap.addAttr('seed', at='long', dv=seed)
+        split_flap.addAttr('uv_packing', dt='string')
+        split_flap.uv_packing.set(json.dumps(cell_packing.to_dict()))
         split_flap.addAttr('flaps', at='message')
         split_flap.addAttr('cloth', at='message')
         split_flap.addAttr('collider', at='message')
@@ -410,3 +1387,121 @@ class SplitFlap(object):
         pm.group(ncloth_transforms + ncol_transforms + [base],
                  name='dynamics_grp',
                  parent=self.pynode)
+
+
+def load_manifest(path, placeholder=False, name=None):
+    '''
+    Rebuild a wall from a manifest without opening the scene it was built
+    in. The full rebuild is one flaps mesh with the base flaps of every cell
+    and a splitFlapWallDeformer showing the recorded images. The placeholder
+    is one box per cell, fast to create and draw.
+
+    :param path: Path of the manifest JSON
+    :param placeholder: Create boxes instead of flaps
+    :param name: Name of the group (default: the wall's name)
+    :returns: pymel.PyNode group
+    '''
+
+    wall_manifest = Manifest.read(path)
+    translations = wall_manifest.translations
+    prototype = mesh.MeshData(
+        wall_manifest.prototype_points,
+        wall_manifest.prototype_counts,
+        wall_manifest.prototype_connects,
+        wall_manifest.prototype_uvs,
+        wall_manifest.prototype_uv_connects,
+    )
+
+    if placeholder:
+        points = prototype.points
+        low = points.min(axis=0)
+        high = points.max(axis=0)
+        box = mesh.cube(high - low, (low + high) * 0.5)
+        node = utils.create_mesh(
+            mesh.copies(box, layout.translate_matrices(translations)),
+            name='placeholder_geo'
+        )
+    else:
+        node = utils.create_cell_mesh(
+            prototype,
+            translations,
+            wall_manifest.uv_offsets,
+            name='flaps_geo'
+        )
+        deformer = utils.create_wall_deformer(
+            node,
+            wall_manifest.num_cells,
+            translations,
+            wall_manifest.params['number_of_images']
+        )
+        splitflap_nodes.set_int_array(
+            splitflap_nodes.get_plug(deformer.cellIndices.name()),
+            wall_manifest.indices
+        )
+        deformer.useIndices.set(True)
+
+    grp = pm.group(node, name=name or wall_manifest.nodes['wall'])
+    grp.addAttr('manifest', dt='string')
+    grp.manifest.set(path)
+    grp.addAttr('manifest_hash', dt='string')
+    grp.manifest_hash.set(wall_manifest.hash)
+    return grp
+
+
+def compare_backends(split_flap, padding=(0.2, 0), rig='constraint',
+                     chunks=1):
+    '''
+    Build the same wall with each backend and compare their build times.
+    Every node of a build is deleted after it is measured, so the next
+    backend builds into the same scene.
+
+    :param split_flap: SplitFlap object
+    :param padding: Padding in cm between SplitFlaps
+    :param rig: Rig type to build each wall with
+    :param chunks: Number of chunks to build each wall with
+    :returns: Dict of backend to build seconds, with the pymel over
+        openmaya "speedup"
+    '''
+
+    results = {}
+    for backend in BACKENDS:
+        with utils.tracked_build() as registry:
+            s = time.time()
+            SplitFlapWall.create(
+                split_flap,
+                padding,
+                rig,
+                chunks,
+                backend=backend
+            )
+            results[backend] = time.time() - s
+            registry.stop()
+            registry.rollback()
+        split_flap.pynode.show()
+    results['speedup'] = results['pymel'] / results['openmaya']
+    return results
+
+
+def compare_rigs(split_flap, start=1, end=24, padding=(0.2, 0), chunks=1):
+    '''
+    Build a wall with each rig type and compare their per-frame evaluation
+    times. Every node of a build is deleted after it is measured, so the
+    next rig builds into the same scene.
+
+    :param split_flap: SplitFlap object
+    :param start: First frame
+    :param end: Last frame, inclusive
+    :param padding: Padding in cm between SplitFlaps
+    :param chunks: Number of chunks to build each wall with
+    :returns: Dict of rig type to average seconds per frame
+    '''
+
+    results = {}
+    for rig in ('constraint', 'matrix'):
+        with utils.tracked_build() as registry:
+            wall = SplitFlapWall.create(split_flap, padding, rig, chunks)
+            results[rig] = wall.time_frames(start, end)
+            registry.stop()
+            registry.rollback()
+        split_flap.pynode.show()
+    return results
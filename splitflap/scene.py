@@ -0,0 +1,202 @@
+'''
+Index of the split flaps and walls in the current scene.
+
+All roots are discovered with a single ls query and cached together with the
+SplitFlap and SplitFlapWall objects wrapping them, so the component nodes
+those objects cache are shared by every tool using the index. Adding or
+removing roots, connections to the message attributes of indexed roots and
+scene changes invalidate the index through Maya callbacks. Callbacks only
+run Python for transforms and indexed roots, not every connection made by
+a build.
+'''
+from __future__ import division, print_function
+import pymel.core as pm
+from maya.api import OpenMaya
+from .models import SplitFlap, SplitFlapWall
+
+
+# Message attributes linking roots to their component nodes
+COMPONENT_ATTRS = set([
+    'flaps',
+    'cloth',
+    'collider',
+    'rotate_grp',
+    'copy_grp',
+    'world_grp',
+    'anim_grp',
+    'dyn_grp',
+    'base_split_flap',
+    'flaps_chunks',
+    'cloth_chunks',
+    'collider_chunks',
+    'deformer',
+    'lod_grp',
+    'lod_decimated',
+    'lod_card',
+])
+
+ROOT_ATTRS = ('split_flap', 'split_flap_wall')
+
+# Added transforms checked for roots before refreshing instead
+MAX_ADDED = 1000
+
+
+def is_root(node):
+    '''Check if an OpenMaya.MObject is a split flap or wall root.'''
+
+    fn_node = OpenMaya.MFnDependencyNode(node)
+    return any(fn_node.hasAttribute(attr) for attr in ROOT_ATTRS)
+
+
+class SceneIndex(object):
+    '''
+    Cached SplitFlap and SplitFlapWall objects for every root in the scene.
+
+    Call start to invalidate the index automatically, or invalidate manually
+    after editing a hierarchy outside of splitflap.
+    '''
+
+    def __init__(self):
+        self._split_flaps = None
+        self._walls = None
+        self._callbacks = []
+        self._root_callbacks = []
+        self._added = []
+
+    @property
+    def split_flaps(self):
+        self._check_added()
+        if self._split_flaps is None:
+            self.refresh()
+        return self._split_flaps
+
+    @property
+    def walls(self):
+        self._check_added()
+        if self._walls is None:
+            self.refresh()
+        return self._walls
+
+    def refresh(self):
+        '''Discover all split flap and wall roots in one query.'''
+
+        roots = pm.ls(
+            ['*.split_flap', '*.split_flap_wall'],
+            objectsOnly=True,
+            recursive=True,
+        )
+        self._split_flaps = []
+        self._walls = []
+        for root in roots:
+            if root.hasAttr('split_flap_wall'):
+                self._walls.append(SplitFlapWall(root))
+            else:
+                self._split_flaps.append(SplitFlap(root))
+
+        if self._root_callbacks:
+            OpenMaya.MMessage.removeCallbacks(self._root_callbacks)
+        self._root_callbacks = []
+        if not self._callbacks:
+            return
+
+        selection = OpenMaya.MSelectionList()
+        for root in roots:
+            selection.add(root.name())
+        for i in range(selection.length()):
+            self._root_callbacks.append(
+                OpenMaya.MNodeMessage.addAttributeChangedCallback(
+                    selection.getDependNode(i),
+                    self._attribute_changed
+                )
+            )
+
+    def invalidate(self, *args):
+        '''Forget cached roots and the nodes cached by their objects.'''
+
+        for obj in (self._split_flaps or []) + (self._walls or []):
+            obj.clear_cache()
+        self._split_flaps = None
+        self._walls = None
+        self._added = []
+        if self._root_callbacks:
+            OpenMaya.MMessage.removeCallbacks(self._root_callbacks)
+        self._root_callbacks = []
+
+    def _check_added(self):
+        # Attributes are added after the node, check once they are used
+        added, self._added = self._added, []
+        for handle in added:
+            if handle.isValid() and is_root(handle.object()):
+                self.invalidate()
+                return
+
+    def _node_added(self, node, *args):
+        if self._split_flaps is None:
+            return
+        self._added.append(OpenMaya.MObjectHandle(node))
+
+        # Stop collecting when the index is not read, the next read
+        # refreshes it anyway
+        if len(self._added) > MAX_ADDED:
+            self.invalidate()
+
+    def _node_removed(self, node, *args):
+        if is_root(node):
+            self.invalidate()
+
+    def _attribute_changed(self, msg, plug, other_plug, *args):
+        connection = (
+            OpenMaya.MNodeMessage.kConnectionMade |
+            OpenMaya.MNodeMessage.kConnectionBroken
+        )
+        if not msg & connection:
+            return
+        name = plug.partialName(useLongNames=True).split('[')[0]
+        if name in COMPONENT_ATTRS:
+            self.invalidate()
+
+    def start(self):
+        '''Register callbacks that invalidate the index.'''
+
+        if self._callbacks:
+            return
+
+        self._callbacks = [
+            OpenMaya.MDGMessage.addNodeAddedCallback(
+                self._node_added,
+                'transform'
+            ),
+            OpenMaya.MDGMessage.addNodeRemovedCallback(
+                self._node_removed,
+                'transform'
+            ),
+            OpenMaya.MSceneMessage.addCallback(
+                OpenMaya.MSceneMessage.kAfterOpen,
+                self.invalidate
+            ),
+            OpenMaya.MSceneMessage.addCallback(
+                OpenMaya.MSceneMessage.kAfterNew,
+                self.invalidate
+            ),
+        ]
+
+        # Watch the roots already cached
+        self.invalidate()
+
+    def stop(self):
+        '''Remove callbacks registered by start.'''
+
+        if self._callbacks:
+            OpenMaya.MMessage.removeCallbacks(self._callbacks)
+        self._callbacks = []
+        self.invalidate()
+
+
+def get_scene_index(cache=[]):
+    '''Get the shared SceneIndex, callbacks are started on first use.'''
+
+    if not cache:
+        index = SceneIndex()
+        index.start()
+        cache.append(index)
+    return cache[0]
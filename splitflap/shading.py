@@ -0,0 +1,142 @@
+'''
+Per-cell uv offsets applied at shading time.
+
+Walls normally bake the udim of every image and the region of every cell
+into the uvs of the flaps. With offset uvs the flaps keep one canonical
+layout in map1, the uvs of the base split flap with its images moved to the
+first udim tile, and a second uv set OFFSET_SET holds one uv per cell and
+image. Every face vertex of a flap half points at the offset of its cell and
+image, the shader adds both sets before reading the udim texture, see
+utils.connect_offset_shader.
+
+Swapping the images shown by a built wall only rewrites the offset values,
+num_cells * num_images uvs, its faces and uv assignments are untouched.
+'''
+from __future__ import division, print_function
+import numpy as np
+
+
+# Named like the per instance primvar written by export.write_usd
+OFFSET_SET = 'uvOffset'
+
+
+def image_udims(images, columns=10):
+    '''
+    Get the (u, v) offset of the udim tile of every image, see
+    uv.index_to_udim.
+
+    :param images: int array of image indices
+    :returns: float array of shape images.shape + (2,)
+    '''
+
+    r, c = np.divmod(np.asarray(images, dtype=np.int64), columns)
+    return np.stack([c, r], axis=-1).astype(np.float64)
+
+
+def face_cells(counts, connects, num_vertices, num_cells):
+    '''
+    Get the cell of every face of a wall mesh whose vertices are grouped by
+    cell, like create_cell_mesh and the polyUnite of every cell's flaps.
+
+    :returns: int array of shape (num_faces,)
+    '''
+
+    if num_vertices % num_cells:
+        raise ValueError(
+            '{} vertices can not be split into {} cells'.format(
+                num_vertices,
+                num_cells
+            )
+        )
+    counts = np.asarray(counts, dtype=np.int64)
+    first = np.cumsum(counts) - counts
+    return np.asarray(connects)[first] // (num_vertices // num_cells)
+
+
+def split_uvs(uvs, counts, uv_connects, num_images, base_v=0, columns=10):
+    '''
+    Split uvs baked into the udim tile of each image into canonical uvs in
+    the first tile and the image of every face. Faces are assigned by the
+    center of their uvs so uvs on a tile border are not ambiguous.
+
+    :param uvs: float array of shape (num_uvs, 2)
+    :param counts: int array of vertices per face
+    :param uv_connects: int array of face vertex uv indices
+    :param num_images: Number of images
+    :param base_v: v shift of the tile holding the cell's region, see
+        uv.CellPacking.tile_offset. It is kept in the canonical uvs.
+    :returns: (canonical uvs, int array of the image of every face)
+    '''
+
+    uvs = np.asarray(uvs, dtype=np.float64)
+    counts = np.asarray(counts, dtype=np.int64)
+    uv_connects = np.asarray(uv_connects, dtype=np.int64)
+    faces = np.repeat(np.arange(len(counts)), counts)
+
+    centers = np.column_stack([
+        np.bincount(faces, uvs[uv_connects, i], len(counts))
+        for i in range(2)
+    ]) / counts[:, None]
+    c = np.floor(centers[:, 0]).astype(np.int64)
+    r = np.floor(centers[:, 1] - base_v).astype(np.int64)
+    images = r * columns + c
+    if len(images) and (
+            c.min() < 0 or c.max() >= columns or
+            images.min() < 0 or images.max() >= num_images):
+        raise ValueError(
+            'Uvs are outside the udim tiles of {} images'.format(num_images)
+        )
+
+    uv_images = np.zeros(len(uvs), dtype=np.int64)
+    uv_images[uv_connects] = images[faces]
+    return uvs - image_udims(uv_images, columns), images
+
+
+def cell_orders(orders, num_cells, num_images):
+    '''
+    Get the image shown in place of every image of every cell.
+
+    :param orders: Image indices of shape (num_images,) used by every
+        cell, or (num_cells, num_images). None shows every image in place.
+    :returns: int array of shape (num_cells, num_images)
+    '''
+
+    if orders is None:
+        orders = np.arange(num_images)
+    orders = np.asarray(orders, dtype=np.int64)
+    if orders.shape[-1:] != (num_images,):
+        raise ValueError('Orders need {} images per cell'.format(num_images))
+    if orders.size and (orders.min() < 0 or orders.max() >= num_images):
+        raise ValueError('Orders must index {} images'.format(num_images))
+    return np.broadcast_to(orders, (num_cells, num_images)).copy()
+
+
+def offset_table(cell_offsets, orders, num_images):
+    '''
+    Get the offset uv of every cell and image, the cell's uv offset plus the
+    udim of the image shown in its place.
+
+    :param cell_offsets: float array of shape (num_cells, 2)
+    :param orders: See cell_orders
+    :param num_images: Number of images
+    :returns: float array of shape (num_cells * num_images, 2), the offset
+        of image i of cell c is at c * num_images + i
+    '''
+
+    cell_offsets = np.asarray(cell_offsets, dtype=np.float64)
+    orders = cell_orders(orders, len(cell_offsets), num_images)
+    return (cell_offsets[:, None] + image_udims(orders)).reshape(-1, 2)
+
+
+def offset_ids(cells, images, counts, num_images):
+    '''
+    Get the offset uv index of every face vertex, see offset_table.
+
+    :param cells: int array of the cell of every face
+    :param images: int array of the image of every face
+    :param counts: int array of vertices per face
+    :param num_images: Number of images
+    '''
+
+    slots = np.asarray(cells) * num_images + np.asarray(images)
+    return np.repeat(slots, counts).astype(np.int32)
@@ -0,0 +1,632 @@
+'''
+Python API 2.0 nodes replacing the SOuP nodes used to build walls.
+
+splitFlapTransformsToArrays outputs the position and rotation of every
+input matrix and splitFlapCopier tiles an input mesh at those positions.
+Attribute names match SOuP's transformsToArrays and copier, so walls are
+connected the same way whichever nodes are used, see node_types.
+
+splitFlapWallDeformer rotates the flaps of every cell of a wall mesh from
+a single per-cell array attribute.
+
+This module is loaded as a Maya plugin with load().
+'''
+from __future__ import division, print_function
+import os
+import time
+import numpy as np
+from maya import cmds
+from maya.api import OpenMaya, OpenMayaAnim
+from splitflap import mesh, layout
+
+
+TRANSFORMS_TO_ARRAYS = 'splitFlapTransformsToArrays'
+COPIER = 'splitFlapCopier'
+WALL_DEFORMER = 'splitFlapWallDeformer'
+
+
+def maya_useNewAPI():
+    '''Tell Maya this plugin uses the Python API 2.0.'''
+
+
+def get_plugin_path():
+    return os.path.splitext(os.path.abspath(__file__))[0] + '.py'
+
+
+def load():
+    '''Load the splitflap nodes plugin.'''
+
+    if not cmds.pluginInfo('splitflap_nodes', q=True, loaded=True):
+        cmds.loadPlugin(get_plugin_path(), quiet=True)
+
+
+def load_copiers():
+    '''Load SOuP, falling back to the splitflap nodes when it is missing.'''
+
+    if cmds.pluginInfo('SOuP', q=True, loaded=True):
+        return
+    try:
+        cmds.loadPlugin('SOuP', quiet=True)
+    except RuntimeError:
+        load()
+
+
+def node_types():
+    '''
+    Get the (copier, transformsToArrays) node types to build walls with.
+
+    SOuP's nodes are used when SOuP can be loaded, set the SPLITFLAP_COPIER
+    environment variable to "native" or "soup" to choose explicitly.
+    '''
+
+    choice = os.environ.get('SPLITFLAP_COPIER')
+    if choice is None:
+        load_copiers()
+        soup_loaded = cmds.pluginInfo('SOuP', q=True, loaded=True)
+        choice = 'soup' if soup_loaded else 'native'
+
+    if choice == 'soup':
+        return 'copier', 'transformsToArrays'
+    if choice == 'native':
+        load()
+        return COPIER, TRANSFORMS_TO_ARRAYS
+    raise ValueError('Unknown SPLITFLAP_COPIER: {}'.format(choice))
+
+
+def to_point_array(points):
+    '''Convert a float array of shape (n, 3) to an MPointArray.'''
+
+    return OpenMaya.MPointArray(np.asarray(points).tolist())
+
+
+def from_point_array(points):
+    '''Convert an MPointArray to a float array of shape (n, 3).'''
+
+    return np.array(points, dtype=np.float64).reshape(-1, 4)[:, :3]
+
+
+def to_vector_array(vectors):
+    '''Convert a float array of shape (n, 3) to an MVectorArray.'''
+
+    return OpenMaya.MVectorArray(np.asarray(vectors).tolist())
+
+
+def time_conversions(num_points, repeat=10):
+    '''
+    Time moving points to Maya and back, the per-frame overhead of
+    WallDeformer on top of its vectorized rotation.
+
+    :param num_points: Number of points, the vertices of a wall mesh
+    :param repeat: Number of round trips to average
+    :returns: Seconds per round trip
+    '''
+
+    points = np.random.rand(num_points, 3)
+    start = time.time()
+    for _ in range(repeat):
+        from_point_array(to_point_array(points))
+    return (time.time() - start) / repeat
+
+
+def read_mesh_data(fn_mesh, uvs=True):
+    '''
+    Read the points, faces and uvs of a mesh.
+
+    :param fn_mesh: OpenMaya.MFnMesh
+    :param uvs: Read uvs
+    :returns: mesh.MeshData
+    '''
+
+    points = fn_mesh.getPoints(OpenMaya.MSpace.kObject)
+    counts, connects = fn_mesh.getVertices()
+    if not uvs:
+        return mesh.MeshData(
+            from_point_array(points),
+            list(counts),
+            list(connects),
+        )
+
+    us, vs = fn_mesh.getUVs()
+    _, uv_connects = fn_mesh.getAssignedUVs()
+    return mesh.MeshData(
+        from_point_array(points),
+        list(counts),
+        list(connects),
+        list(zip(us, vs)),
+        list(uv_connects),
+    )
+
+
+def create_mesh_data(data, uvs=True):
+    '''
+    Create a mesh data object from MeshData.
+
+    :param data: mesh.MeshData
+    :param uvs: Create uvs
+    :returns: OpenMaya.MObject of kMeshData
+    '''
+
+    mesh_data = OpenMaya.MFnMeshData().create()
+    if not data.num_faces:
+        return mesh_data
+
+    fn_mesh = OpenMaya.MFnMesh()
+    points = to_point_array(data.points)
+    counts = data.counts.tolist()
+    connects = data.connects.tolist()
+    if not uvs or data.uvs is None:
+        fn_mesh.create(points, counts, connects, parent=mesh_data)
+    else:
+        fn_mesh.create(
+            points,
+            counts,
+            connects,
+            data.uvs[:, 0].tolist(),
+            data.uvs[:, 1].tolist(),
+            parent=mesh_data
+        )
+        fn_mesh.assignUVs(counts, data.face_uvs.tolist())
+    return mesh_data
+
+
+def read_vectors(handle):
+    '''
+    Read a vectorArray data handle.
+
+    :returns: float array of shape (n, 3)
+    '''
+
+    obj = handle.data()
+    if obj.isNull():
+        return np.zeros((0, 3))
+    array = OpenMaya.MFnVectorArrayData(obj).array()
+    return np.array(array, dtype=np.float64).reshape(-1, 3)
+
+
+def read_array(handle, fn_data, dtype):
+    '''
+    Read an intArray or doubleArray data handle.
+
+    :param fn_data: OpenMaya.MFnIntArrayData or OpenMaya.MFnDoubleArrayData
+    :returns: numpy array of dtype
+    '''
+
+    obj = handle.data()
+    if obj.isNull():
+        return np.zeros(0, dtype=dtype)
+    return np.array(fn_data(obj).array(), dtype=dtype)
+
+
+def get_plug(name):
+    '''Get the OpenMaya.MPlug of an attribute name.'''
+
+    selection = OpenMaya.MSelectionList()
+    selection.add(name)
+    return selection.getPlug(0)
+
+
+def set_int_array(plug, values):
+    '''Set an intArray plug.'''
+
+    array = OpenMaya.MIntArray([int(v) for v in values])
+    plug.setMObject(OpenMaya.MFnIntArrayData().create(array))
+
+
+def set_double_array(plug, values):
+    '''Set a doubleArray plug.'''
+
+    array = OpenMaya.MDoubleArray([float(v) for v in values])
+    plug.setMObject(OpenMaya.MFnDoubleArrayData().create(array))
+
+
+def set_vector_array(plug, values):
+    '''Set a vectorArray plug.'''
+
+    array = to_vector_array(np.asarray(values, dtype=np.float64))
+    plug.setMObject(OpenMaya.MFnVectorArrayData().create(array))
+
+
+def write_vectors(handle, vectors):
+    '''Write a float array of shape (n, 3) to a vectorArray data handle.'''
+
+    data = OpenMaya.MFnVectorArrayData().create(to_vector_array(vectors))
+    handle.setMObject(data)
+    handle.setClean()
+
+
+class TransformsToArrays(OpenMaya.MPxNode):
+    '''
+    Output the position and rotation in degrees of every input matrix.
+    Rotations are decomposed in the inRotateOrder of their input, copy them
+    with a splitFlapCopier of the same rotateOrder.
+    '''
+
+    type_name = TRANSFORMS_TO_ARRAYS
+    type_id = OpenMaya.MTypeId(0x0007F5F0)
+
+    inTransforms = None
+    inMatrix = None
+    inRotateOrder = None
+    outPositionPP = None
+    outRotationPP = None
+
+    @classmethod
+    def creator(cls):
+        return cls()
+
+    @classmethod
+    def initialize(cls):
+        fn_matrix = OpenMaya.MFnMatrixAttribute()
+        cls.inMatrix = fn_matrix.create('inMatrix', 'im')
+
+        fn_enum = OpenMaya.MFnEnumAttribute()
+        cls.inRotateOrder = fn_enum.create('inRotateOrder', 'iro', 0)
+        for i, name in enumerate(layout.ROTATE_ORDERS):
+            fn_enum.addField(name, i)
+
+        fn_compound = OpenMaya.MFnCompoundAttribute()
+        cls.inTransforms = fn_compound.create('inTransforms', 'it')
+        fn_compound.addChild(cls.inMatrix)
+        fn_compound.addChild(cls.inRotateOrder)
+        fn_compound.array = True
+        fn_compound.usesArrayDataBuilder = True
+
+        fn_typed = OpenMaya.MFnTypedAttribute()
+        cls.outPositionPP = fn_typed.create(
+            'outPositionPP',
+            'opp',
+            OpenMaya.MFnData.kVectorArray
+        )
+        fn_typed.writable = False
+        fn_typed.storable = False
+        cls.outRotationPP = fn_typed.create(
+            'outRotationPP',
+            'orp',
+            OpenMaya.MFnData.kVectorArray
+        )
+        fn_typed.writable = False
+        fn_typed.storable = False
+
+        for attr in (cls.inTransforms, cls.outPositionPP, cls.outRotationPP):
+            cls.addAttribute(attr)
+        for attr in (cls.inTransforms, cls.inMatrix, cls.inRotateOrder):
+            cls.attributeAffects(attr, cls.outPositionPP)
+            cls.attributeAffects(attr, cls.outRotationPP)
+
+    def compute(self, plug, data):
+        if plug != self.outPositionPP and plug != self.outRotationPP:
+            return
+
+        handle = data.inputArrayValue(self.inTransforms)
+        values = []
+        orders = []
+        for i in range(len(handle)):
+            handle.jumpToPhysicalElement(i)
+            element = handle.inputValue()
+            values.extend(element.child(self.inMatrix).asMatrix())
+            orders.append(element.child(self.inRotateOrder).asShort())
+        matrices = np.array(values, dtype=np.float64).reshape(-1, 4, 4)
+        orders = np.array(orders, dtype=np.int64)
+
+        rotations = np.zeros((len(matrices), 3))
+        for order in np.unique(orders).tolist():
+            mask = orders == order
+            rotations[mask] = layout.matrix_to_euler(
+                matrices[mask],
+                layout.ROTATE_ORDERS[order]
+            )
+
+        write_vectors(
+            data.outputValue(self.outPositionPP),
+            matrices[:, 3, :3]
+        )
+        write_vectors(data.outputValue(self.outRotationPP), rotations)
+
+
+class Copier(OpenMaya.MPxNode):
+    '''
+    Copy input meshes to every position of posArray, rotated by the
+    rotations in degrees of rotArray in rotateOrder when orient is on. Copy
+    i uses inputMesh[i % number of input meshes].
+
+    Input meshes are only read again after they are dirtied, so playback
+    only pays for transforming the cached points. Dirty inputs are found
+    by setDependentsDirty in DG evaluation and by preEvaluation under the
+    Evaluation Manager, which does not call setDependentsDirty.
+    '''
+
+    type_name = COPIER
+    type_id = OpenMaya.MTypeId(0x0007F5F1)
+
+    inputMesh = None
+    posArray = None
+    rotArray = None
+    orient = None
+    rotateOrder = None
+    toggleUV = None
+    outputMesh = None
+
+    def __init__(self):
+        super(Copier, self).__init__()
+        self._meshes = None
+
+    @classmethod
+    def creator(cls):
+        return cls()
+
+    @classmethod
+    def initialize(cls):
+        fn_typed = OpenMaya.MFnTypedAttribute()
+        cls.inputMesh = fn_typed.create(
+            'inputMesh',
+            'im',
+            OpenMaya.MFnData.kMesh
+        )
+        fn_typed.array = True
+        fn_typed.storable = False
+        cls.posArray = fn_typed.create(
+            'posArray',
+            'pa',
+            OpenMaya.MFnData.kVectorArray
+        )
+        fn_typed.storable = False
+        cls.rotArray = fn_typed.create(
+            'rotArray',
+            'ra',
+            OpenMaya.MFnData.kVectorArray
+        )
+        fn_typed.storable = False
+        cls.outputMesh = fn_typed.create(
+            'outputMesh',
+            'om',
+            OpenMaya.MFnData.kMesh
+        )
+        fn_typed.writable = False
+        fn_typed.storable = False
+
+        fn_numeric = OpenMaya.MFnNumericAttribute()
+        cls.orient = fn_numeric.create(
+            'orient',
+            'ori',
+            OpenMaya.MFnNumericData.kBoolean,
+            False
+        )
+        fn_numeric.keyable = True
+        cls.toggleUV = fn_numeric.create(
+            'toggleUV',
+            'tuv',
+            OpenMaya.MFnNumericData.kBoolean,
+            True
+        )
+        fn_numeric.keyable = True
+
+        fn_enum = OpenMaya.MFnEnumAttribute()
+        cls.rotateOrder = fn_enum.create('rotateOrder', 'ro', 0)
+        for i, name in enumerate(layout.ROTATE_ORDERS):
+            fn_enum.addField(name, i)
+
+        inputs = (
+            cls.inputMesh,
+            cls.posArray,
+            cls.rotArray,
+            cls.orient,
+            cls.rotateOrder,
+            cls.toggleUV,
+        )
+        for attr in inputs + (cls.outputMesh,):
+            cls.addAttribute(attr)
+        for attr in inputs:
+            cls.attributeAffects(attr, cls.outputMesh)
+
+    def setDependentsDirty(self, plug, affected):
+        if plug.attribute() == self.inputMesh or plug == self.toggleUV:
+            self._meshes = None
+
+    def preEvaluation(self, context, evaluation_node):
+        if not context.isNormal():
+            return
+        dirty = evaluation_node.dirtyPlugExists
+        if dirty(self.inputMesh) or dirty(self.toggleUV):
+            self._meshes = None
+
+    def read_meshes(self, data):
+        uvs = data.inputValue(self.toggleUV).asBool()
+        handle = data.inputArrayValue(self.inputMesh)
+        meshes = []
+        for i in range(len(handle)):
+            handle.jumpToPhysicalElement(i)
+            obj = handle.inputValue().asMesh()
+            if obj.isNull():
+                continue
+            meshes.append(read_mesh_data(OpenMaya.MFnMesh(obj), uvs))
+        return meshes
+
+    def compute(self, plug, data):
+        if plug != self.outputMesh:
+            return
+
+        if self._meshes is None:
+            self._meshes = self.read_meshes(data)
+        meshes = self._meshes
+
+        positions = read_vectors(data.inputValue(self.posArray))
+        rotations = read_vectors(data.inputValue(self.rotArray))
+        orient = data.inputValue(self.orient).asBool()
+        if orient and len(rotations) == len(positions):
+            order = data.inputValue(self.rotateOrder).asShort()
+            matrices = layout.euler_matrices(
+                rotations,
+                positions,
+                layout.ROTATE_ORDERS[order]
+            )
+        else:
+            matrices = layout.translate_matrices(positions)
+
+        if not meshes or not len(matrices):
+            result = mesh.MeshData(np.zeros((0, 3)), [], [])
+        elif len(meshes) == 1:
+            result = mesh.copies(meshes[0], matrices)
+        else:
+            result = mesh.combine([
+                mesh.copies(meshes[i % len(meshes)], matrices[i:i + 1])
+                for i in range(len(matrices))
+            ])
+
+        handle = data.outputValue(self.outputMesh)
+        handle.setMObject(create_mesh_data(result))
+        handle.setClean()
+
+
+class WallDeformer(OpenMayaAnim.MPxDeformerNode):
+    '''
+    Rotate the flaps of every cell of a wall around the X-axis through the
+    cell's pivot in one vectorized compute.
+
+    vertexCells and cellPivots are computed once when the deformer is
+    created. Each frame only cellRotations, or cellIndices when useIndices
+    is on, needs to be set. Index i shows image i at i * 360 /
+    numberOfImages degrees. Cells missing from the arrays are not rotated.
+    '''
+
+    type_name = WALL_DEFORMER
+    type_id = OpenMaya.MTypeId(0x0007F5F2)
+
+    vertexCells = None
+    cellPivots = None
+    cellRotations = None
+    cellIndices = None
+    useIndices = None
+    numberOfImages = None
+
+    @classmethod
+    def creator(cls):
+        return cls()
+
+    @classmethod
+    def initialize(cls):
+        fn_typed = OpenMaya.MFnTypedAttribute()
+        cls.vertexCells = fn_typed.create(
+            'vertexCells',
+            'vc',
+            OpenMaya.MFnData.kIntArray
+        )
+        cls.cellPivots = fn_typed.create(
+            'cellPivots',
+            'cp',
+            OpenMaya.MFnData.kVectorArray
+        )
+        cls.cellRotations = fn_typed.create(
+            'cellRotations',
+            'cr',
+            OpenMaya.MFnData.kDoubleArray
+        )
+        cls.cellIndices = fn_typed.create(
+            'cellIndices',
+            'ci',
+            OpenMaya.MFnData.kIntArray
+        )
+
+        fn_numeric = OpenMaya.MFnNumericAttribute()
+        cls.useIndices = fn_numeric.create(
+            'useIndices',
+            'ui',
+            OpenMaya.MFnNumericData.kBoolean,
+            False
+        )
+        fn_numeric.keyable = True
+        cls.numberOfImages = fn_numeric.create(
+            'numberOfImages',
+            'noi',
+            OpenMaya.MFnNumericData.kInt,
+            1
+        )
+        fn_numeric.setMin(1)
+
+        output = OpenMayaAnim.MPxGeometryFilter.outputGeom
+        inputs = (
+            cls.vertexCells,
+            cls.cellPivots,
+            cls.cellRotations,
+            cls.cellIndices,
+            cls.useIndices,
+            cls.numberOfImages,
+        )
+        for attr in inputs:
+            cls.addAttribute(attr)
+            cls.attributeAffects(attr, output)
+
+    def cell_rotations(self, data):
+        if not data.inputValue(self.useIndices).asBool():
+            return read_array(
+                data.inputValue(self.cellRotations),
+                OpenMaya.MFnDoubleArrayData,
+                np.float64
+            )
+
+        indices = read_array(
+            data.inputValue(self.cellIndices),
+            OpenMaya.MFnIntArrayData,
+            np.int64
+        )
+        num_images = data.inputValue(self.numberOfImages).asInt()
+        return indices * (360 / num_images)
+
+    def deform(self, data, iterator, matrix, multi_index):
+        envelope = data.inputValue(
+            OpenMayaAnim.MPxGeometryFilter.envelope
+        ).asFloat()
+        if not envelope:
+            return
+
+        cells = read_array(
+            data.inputValue(self.vertexCells),
+            OpenMaya.MFnIntArrayData,
+            np.int64
+        )
+        pivots = read_vectors(data.inputValue(self.cellPivots))
+        rotations = self.cell_rotations(data)
+        if not len(rotations) or not len(pivots):
+            return
+
+        positions = iterator.allPositions()
+        if not cells.size or len(positions) != len(cells):
+            return
+
+        # Pad so cells beyond the arrays stay at rest
+        num_cells = max(len(pivots), cells.max() + 1)
+        angles = np.zeros(num_cells)
+        angles[:min(len(rotations), num_cells)] = rotations[:num_cells]
+        padded = np.zeros((num_cells, 3))
+        padded[:len(pivots)] = pivots[:num_cells]
+
+        points = layout.rotate_points_x(
+            from_point_array(positions),
+            angles[cells] * envelope,
+            padded[cells]
+        )
+        iterator.setAllPositions(to_point_array(points))
+
+
+NODES = (TransformsToArrays, Copier, WallDeformer)
+
+
+def initializePlugin(plugin):
+    fn_plugin = OpenMaya.MFnPlugin(plugin)
+    for node in NODES:
+        if issubclass(node, OpenMayaAnim.MPxDeformerNode):
+            node_type = OpenMaya.MPxNode.kDeformerNode
+        else:
+            node_type = OpenMaya.MPxNode.kDependNode
+        fn_plugin.registerNode(
+            node.type_name,
+            node.type_id,
+            node.creator,
+            node.initialize,
+            node_type
+        )
+
+
+def uninitializePlugin(plugin):
+    fn_plugin = OpenMaya.MFnPlugin(plugin)
+    for node in NODES:
+        fn_plugin.deregisterNode(node.type_id)
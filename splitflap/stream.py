@@ -0,0 +1,267 @@
+'''
+Compact binary stream of per-cell flap rotations for real-time playback.
+
+Layout, all values little endian::
+
+    header   magic, version, num_cells, num_frames, start_frame, fps,
+             keyframe_interval, index_offset
+    frames   one record per frame
+    index    one uint64 file offset per frame record
+
+A record starts with a type byte and a varint count. Key records store the
+quantized angle of every cell. Delta records store only the cells that
+changed, as varint gaps between sorted cell ids followed by their angles.
+Every keyframe_interval frames a key record is written, so any frame can be
+decoded from the nearest key record without reading the whole file.
+'''
+from __future__ import division, print_function
+from array import array
+import mmap
+import struct
+import sys
+
+
+MAGIC = b'SFLP'
+VERSION = 1
+HEADER = struct.Struct('<4sHIIifIQ')
+BYTE = struct.Struct('<B')
+KEY = 1
+DELTA = 0
+
+
+def quantize_angle(angle):
+    '''Quantize an angle in degrees to an unsigned 16 bit int.'''
+    return int(round((angle % 360) / 360 * 65536)) & 0xFFFF
+
+
+def dequantize_angle(value):
+    '''Get the angle in degrees of a quantized angle.'''
+    return value / 65536 * 360
+
+
+def encode_varint(value, out):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def decode_varint(data, offset):
+    value = 0
+    shift = 0
+    while True:
+        byte = BYTE.unpack_from(data, offset)[0]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
+
+
+def _to_bytes(values):
+    values = array('H', values)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values.tostring() if sys.version_info[0] < 3 else values.tobytes()
+
+
+def _from_bytes(data):
+    values = array('H')
+    if sys.version_info[0] < 3:
+        values.fromstring(bytes(data))
+    else:
+        values.frombytes(data)
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+class StreamWriter(object):
+    '''
+    Write per-frame flap rotations of every cell to a stream file.
+
+    :param path: Output file path
+    :param num_cells: Number of cells per frame
+    :param start_frame: Frame of the first record, a whole number
+    :param fps: Frames per second
+    :param keyframe_interval: Frames between full key records
+    '''
+
+    def __init__(self, path, num_cells, start_frame=1, fps=24.0,
+                 keyframe_interval=240):
+        if start_frame != int(start_frame):
+            raise ValueError(
+                'Start frame must be a whole number, got {}'.format(
+                    start_frame
+                )
+            )
+        self.num_cells = num_cells
+        self.start_frame = int(start_frame)
+        self.fps = fps
+        self.keyframe_interval = keyframe_interval
+        self.offsets = []
+        self.previous = None
+        self.file = open(path, 'wb')
+        self.file.write(b'\0' * HEADER.size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def add_frame(self, angles):
+        '''
+        Add the next frame.
+
+        :param angles: Flap rotation in degrees of every cell
+        '''
+
+        values = [quantize_angle(angle) for angle in angles]
+        if len(values) != self.num_cells:
+            raise ValueError(
+                'Expected {} cells got {}'.format(self.num_cells, len(values))
+            )
+
+        record = bytearray()
+        if len(self.offsets) % self.keyframe_interval == 0:
+            record.append(KEY)
+            encode_varint(len(values), record)
+            record.extend(_to_bytes(values))
+        else:
+            previous = self.previous
+            changed = [i for i, value in enumerate(values)
+                       if value != previous[i]]
+            record.append(DELTA)
+            encode_varint(len(changed), record)
+            last = 0
+            for i in changed:
+                encode_varint(i - last, record)
+                last = i
+            record.extend(_to_bytes([values[i] for i in changed]))
+
+        self.offsets.append(self.file.tell())
+        self.file.write(record)
+        self.previous = values
+
+    def close(self):
+        if self.file.closed:
+            return
+
+        index_offset = self.file.tell()
+        self.file.write(struct.pack('<{}Q'.format(len(self.offsets)),
+                                    *self.offsets))
+        self.file.seek(0)
+        self.file.write(HEADER.pack(
+            MAGIC,
+            VERSION,
+            self.num_cells,
+            len(self.offsets),
+            self.start_frame,
+            self.fps,
+            self.keyframe_interval,
+            index_offset,
+        ))
+        self.file.close()
+
+
+class StreamReader(object):
+    '''
+    Memory map a stream file and decode any frame on demand.
+
+    Sequential playback applies one record per frame, seeking decodes from
+    the nearest key record.
+
+    :param path: Stream file path
+    '''
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.num_cells, self.num_frames, self.start_frame,
+         self.fps, self.keyframe_interval, index_offset) = HEADER.unpack_from(
+            self.data, 0
+        )
+        if magic != MAGIC:
+            raise IOError('{} is not a split flap stream'.format(path))
+        if version != VERSION:
+            raise IOError('Unsupported stream version {}'.format(version))
+
+        self.offsets = struct.unpack_from(
+            '<{}Q'.format(self.num_frames),
+            self.data,
+            index_offset
+        )
+        self._frame = None
+        self._state = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.num_frames
+
+    def close(self):
+        self.data.close()
+        self.file.close()
+
+    def changes(self, frame):
+        '''
+        Decode the record of a frame.
+
+        :returns: (is_key, cells, values) where cells is None for key records
+        '''
+
+        i = frame - self.start_frame
+        if not 0 <= i < self.num_frames:
+            raise IndexError('Frame {} out of range'.format(frame))
+
+        offset = self.offsets[i]
+        kind = BYTE.unpack_from(self.data, offset)[0]
+        count, offset = decode_varint(self.data, offset + 1)
+        if kind == KEY:
+            values = _from_bytes(self.data[offset:offset + count * 2])
+            return True, None, values
+
+        cells = []
+        cell = 0
+        for _ in range(count):
+            gap, offset = decode_varint(self.data, offset)
+            cell += gap
+            cells.append(cell)
+        return False, cells, _from_bytes(self.data[offset:offset + count * 2])
+
+    def state(self, frame):
+        '''
+        Get the quantized angle of every cell at frame.
+
+        :returns: array of unsigned 16 bit ints, see dequantize_angle
+        '''
+
+        i = frame - self.start_frame
+        ahead = None if self._frame is None else i - self._frame
+        if ahead is not None and 0 <= ahead < self.keyframe_interval:
+            start = self._frame + 1
+            state = self._state
+        else:
+            start = i - i % self.keyframe_interval
+            state = None
+
+        for j in range(start, i + 1):
+            is_key, cells, values = self.changes(self.start_frame + j)
+            if is_key:
+                state = values
+                continue
+            for cell, value in zip(cells, values):
+                state[cell] = value
+
+        self._frame = i
+        self._state = state
+        return array('H', state)
+
+    def angles(self, frame):
+        '''Get the flap rotation in degrees of every cell at frame.'''
+        return [dequantize_angle(value) for value in self.state(frame)]
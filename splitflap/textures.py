@@ -0,0 +1,237 @@
+'''
+Render flap textures into the UDIM layout expected by SplitFlap.create.
+
+Image i of a split flap lives in its own UDIM tile (see index_to_udim), and
+each cell of the row, column layout owns a region of that tile given by the
+split flap's uv.CellPacking. The top half of a cell region maps to the top
+flap half and the bottom half to the bottom flap half.
+'''
+from __future__ import division, print_function
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+from Qt import QtGui, QtCore
+from .uv import index_to_udim, udim_rows, CellPacking
+
+
+def udim(i, num_images, tile=0):
+    '''
+    Get the UDIM tile number of image i, tiles past the first of an image
+    are stacked udim_rows(num_images) rows up.
+    '''
+
+    c, r = index_to_udim(i, num_images)
+    r += tile * udim_rows(num_images)
+    return int(1001 + c + r * 10)
+
+
+def get_mayapy():
+    '''
+    Get the mayapy executable next to the running Maya executable. Child
+    processes must not be spawned with maya itself.
+    '''
+
+    exe_dir, exe_name = os.path.split(sys.executable)
+    if not exe_name.lower().startswith('maya'):
+        return sys.executable
+    if exe_name.lower().endswith('.exe'):
+        return os.path.join(exe_dir, 'mayapy.exe')
+    return os.path.join(exe_dir, 'mayapy')
+
+
+def get_pool(processes=None, initializer=None):
+    '''
+    Get a Pool of mayapy worker processes. Workers are spawned, forking
+    would copy the running Maya session into every worker.
+    '''
+
+    multiprocessing.set_executable(get_mayapy())
+    context = multiprocessing.get_context('spawn')
+    return context.Pool(processes, initializer=initializer)
+
+
+def get_item(item):
+    '''
+    Get the (kind, value) of an item of generate_textures. Items are
+    ("image", path) or ("char", text) tuples, plain strings are characters.
+    '''
+
+    kind, value = item if isinstance(item, tuple) else ('char', item)
+    if kind == 'image':
+        if not os.path.isfile(value):
+            raise IOError('Image not found: {}'.format(value))
+        return kind, os.path.abspath(value)
+    if kind == 'char':
+        return kind, value
+    raise ValueError('Unknown item kind: {}'.format(kind))
+
+
+def hash_job(job):
+    '''
+    Hash every input of a tile job. Image inputs are hashed by content.
+    '''
+
+    data = dict(job)
+    data.pop('path')
+    sha = hashlib.sha1(json.dumps(data, sort_keys=True).encode('utf-8'))
+    if job['kind'] == 'image':
+        with open(job['value'], 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                sha.update(chunk)
+    return sha.hexdigest()
+
+
+def init_worker():
+    '''
+    Make sure a QGuiApplication exists, text can not be rendered without one.
+    '''
+
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    if not QtGui.QGuiApplication.instance():
+        init_worker.app = QtGui.QGuiApplication(['splitflap'])
+
+
+def render_tile(job):
+    '''
+    Render and write a single UDIM tile.
+
+    :param job: Dict describing the tile created by generate_textures
+    :returns: (udim, hash) of the written tile
+    '''
+
+    width, height = job['resolution']
+    packing = CellPacking.from_dict(job['packing'])
+    regions = [
+        (QtCore.QRectF(*source), QtCore.QRectF(
+            target[0] * width,
+            target[1] * height,
+            target[2] * width,
+            target[3] * height
+        ))
+        for _, source, target in packing.tile_regions(job['tile'])
+    ]
+
+    image = QtGui.QImage(width, height, QtGui.QImage.Format_ARGB32)
+    image.fill(QtGui.QColor(*job['background']))
+
+    painter = QtGui.QPainter()
+    painter.begin(image)
+    painter.setRenderHint(QtGui.QPainter.Antialiasing)
+    painter.setRenderHint(QtGui.QPainter.SmoothPixmapTransform)
+
+    if job['kind'] == 'image':
+        # Each cell shows its part of the image spread over the whole wall
+        source = QtGui.QImage(job['value'])
+        for part, rect in regions:
+            part = QtCore.QRectF(
+                part.x() * source.width(),
+                part.y() * source.height(),
+                part.width() * source.width(),
+                part.height() * source.height()
+            )
+            painter.drawImage(rect, source, part)
+    elif regions:
+        font = QtGui.QFont(job['font'])
+        font.setStyleHint(QtGui.QFont.Monospace)
+        font.setPixelSize(
+            max(int(regions[0][1].height() * job['font_scale']), 1)
+        )
+        painter.setFont(font)
+        painter.setPen(QtGui.QColor(*job['foreground']))
+        for _, rect in regions:
+            painter.drawText(rect, QtCore.Qt.AlignCenter, job['value'])
+
+    painter.end()
+
+    if not image.save(job['path']):
+        raise IOError('Failed to write {}'.format(job['path']))
+
+    return job['udim'], job['hash']
+
+
+def generate_textures(items, output_dir, rows, columns, name='flaps',
+                      resolution=(2048, 2048), font='Courier',
+                      font_scale=0.7, foreground=(0, 0, 0),
+                      background=(255, 255, 255), ext='png',
+                      processes=None, force=False, packing=None):
+    '''
+    Render a character set or list of images into UDIM tiles matching the uv
+    layout of SplitFlap.create and SplitFlapWall.create.
+
+    Tiles are rendered in parallel and written as soon as they are done.
+    A json file next to the tiles records the hash of each tile's inputs,
+    tiles whose inputs are unchanged are skipped.
+
+    :param items: String of characters, or list of characters and
+        ("image", path) or ("char", text) tuples, see get_item
+    :param output_dir: Directory to write tiles to
+    :param rows: Number of rows in layout
+    :param columns: Number of columns in layout
+    :param name: Tile file prefix, tiles are named <name>.<UDIM>.<ext>
+    :param resolution: Width and height of each tile
+    :param font: Font family used to render characters
+    :param font_scale: Character height relative to cell height
+    :param foreground: RGB text color
+    :param background: RGB background color
+    :param ext: Image file extension
+    :param processes: Number of worker processes (default: cpu count)
+    :param force: Render all tiles even when their inputs are unchanged
+    :param packing: uv.CellPacking of the split flap, see SplitFlap.packing
+        (default: rows x columns grid)
+    :returns: List of tile paths that were rendered
+    '''
+
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+
+    manifest_path = os.path.join(output_dir, name + '.json')
+    manifest = {}
+    if os.path.isfile(manifest_path) and not force:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+
+    packing = packing or CellPacking(rows, columns)
+    num_images = len(items)
+    jobs = []
+    for i, item in enumerate(items):
+        kind, value = get_item(item)
+        for sub_tile in range(packing.tiles):
+            tile = udim(i, num_images, sub_tile)
+            job = dict(
+                udim=tile,
+                kind=kind,
+                value=value,
+                packing=packing.to_dict(),
+                tile=sub_tile,
+                resolution=list(resolution),
+                font=font,
+                font_scale=font_scale,
+                foreground=list(foreground),
+                background=list(background),
+                path=os.path.join(
+                    output_dir,
+                    '{}.{}.{}'.format(name, tile, ext)
+                ),
+            )
+            job['hash'] = hash_job(job)
+            unchanged = manifest.get(str(tile)) == job['hash']
+            if unchanged and os.path.isfile(job['path']):
+                continue
+            jobs.append(job)
+
+    if not jobs:
+        return []
+
+    pool = get_pool(processes, initializer=init_worker)
+    try:
+        for tile, tile_hash in pool.imap_unordered(render_tile, jobs):
+            manifest[str(tile)] = tile_hash
+            with open(manifest_path, 'w') as f:
+                json.dump(manifest, f, indent=4, sort_keys=True)
+    finally:
+        pool.close()
+        pool.join()
+
+    return [job['path'] for job in jobs]
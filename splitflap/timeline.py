@@ -0,0 +1,196 @@
+'''
+Random-access timeline of the image every cell of a wall shows per frame.
+
+Changes are stored as sparse events in flat int arrays sorted by frame. A
+snapshot of every cell is kept every snapshot_interval frames, so the state
+at any frame is a snapshot plus the events since it. Recent queries are
+memoized for scrubbing.
+'''
+from __future__ import division, print_function
+from collections import OrderedDict
+import numpy as np
+
+
+class StateTimeline(object):
+    '''
+    Per-cell flap index changes over a frame range.
+
+    :param initial: Flap index of every cell before the first change
+    :param start: First frame
+    :param end: Last frame, inclusive
+    :param snapshot_interval: Frames between full snapshots
+    :param cache_size: Number of recent states to memoize
+    '''
+
+    def __init__(self, initial, start, end, snapshot_interval=100,
+                 cache_size=32):
+        self.initial = np.array(initial, dtype=np.int32)
+        self.start = int(start)
+        self.end = int(end)
+        self.snapshot_interval = snapshot_interval
+        self.cache_size = cache_size
+        self.frames = np.zeros(0, dtype=np.int32)
+        self.cells = np.zeros(0, dtype=np.int32)
+        self.indices = np.zeros(0, dtype=np.int32)
+        self._pending = []
+        self._snapshots = None
+        self._cache = OrderedDict()
+
+    @property
+    def num_cells(self):
+        return len(self.initial)
+
+    @property
+    def num_events(self):
+        self._compact()
+        return len(self.frames)
+
+    def __len__(self):
+        return self.end - self.start + 1
+
+    @classmethod
+    def from_states(cls, states, start, **kwargs):
+        '''
+        Create a timeline from the dense flap index of every cell per frame.
+
+        :param states: int array of shape (num_frames, num_cells)
+        :param start: Frame of the first row
+        '''
+
+        states = np.asarray(states, dtype=np.int32)
+        timeline = cls(states[0], start, start + len(states) - 1, **kwargs)
+        rows, cells = np.nonzero(states[1:] != states[:-1])
+        timeline.frames = (rows + start + 1).astype(np.int32)
+        timeline.cells = cells.astype(np.int32)
+        timeline.indices = states[rows + 1, cells]
+        return timeline
+
+    @classmethod
+    def from_rotations(cls, rotations, num_images, start, **kwargs):
+        '''
+        Create a timeline from the rotateX of every anim joint per frame.
+
+        :param rotations: Degrees of shape (num_frames, num_cells)
+        :param num_images: Number of images in sequence
+        :param start: Frame of the first row
+        '''
+
+        step = 360 / num_images
+        rotations = np.asarray(rotations, dtype=np.float64)
+        states = np.round(rotations / step).astype(np.int64) % num_images
+        return cls.from_states(states, start, **kwargs)
+
+    def add(self, frame, cells, indices):
+        '''
+        Add flap index changes at frame.
+
+        :param frame: Frame the cells change
+        :param cells: Flat row, column indices of changed cells
+        :param indices: Flap image indices to change to
+        '''
+
+        if not self.start <= frame <= self.end:
+            raise IndexError('Frame {} out of range'.format(frame))
+
+        cells = np.asarray(cells, dtype=np.int32)
+        indices = np.asarray(indices, dtype=np.int32)
+        if len(cells) != len(indices):
+            raise ValueError('cells and indices must be the same length')
+        self._pending.append((
+            np.full(len(cells), frame, dtype=np.int32),
+            cells,
+            indices
+        ))
+        self._snapshots = None
+        self._cache.clear()
+
+    def _compact(self):
+        if not self._pending:
+            return
+
+        frames, cells, indices = zip(*self._pending)
+        frames = np.concatenate((self.frames,) + frames)
+        cells = np.concatenate((self.cells,) + cells)
+        indices = np.concatenate((self.indices,) + indices)
+
+        # Stable sort keeps the order changes were added within a frame
+        order = np.argsort(frames, kind='mergesort')
+        self.frames = frames[order]
+        self.cells = cells[order]
+        self.indices = indices[order]
+        self._pending = []
+
+    def _build_snapshots(self):
+        self._compact()
+        snapshots = [self.initial.copy()]
+        state = self.initial.copy()
+        a = 0
+        for frame in range(self.start, self.end + 1, self.snapshot_interval):
+            if frame == self.start:
+                continue
+            b = np.searchsorted(self.frames, frame, side='left')
+            state[self.cells[a:b]] = self.indices[a:b]
+            snapshots.append(state.copy())
+            a = b
+        self._snapshots = snapshots
+
+    def state(self, frame):
+        '''
+        Get the flap index of every cell at frame.
+
+        :returns: Read-only int array of shape (num_cells,)
+        '''
+
+        frame = int(frame)
+        if not self.start <= frame <= self.end:
+            raise IndexError('Frame {} out of range'.format(frame))
+
+        if frame in self._cache:
+            self._cache[frame] = self._cache.pop(frame)
+            return self._cache[frame]
+
+        if self._snapshots is None:
+            self._build_snapshots()
+
+        # Snapshot k holds the state before the changes at its frame
+        k = (frame - self.start) // self.snapshot_interval
+        snapshot_frame = self.start + k * self.snapshot_interval
+        a = np.searchsorted(self.frames, snapshot_frame, side='left')
+        b = np.searchsorted(self.frames, frame, side='right')
+        state = self._snapshots[k].copy()
+        state[self.cells[a:b]] = self.indices[a:b]
+        state.setflags(write=False)
+
+        self._cache[frame] = state
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return state
+
+    def changes(self, frame):
+        '''
+        Get the changes at frame.
+
+        :returns: (cells, indices) int arrays
+        '''
+
+        self._compact()
+        a = np.searchsorted(self.frames, frame, side='left')
+        b = np.searchsorted(self.frames, frame, side='right')
+        return self.cells[a:b], self.indices[a:b]
+
+    def states(self, start=None, end=None):
+        '''
+        Get the dense flap index of every cell per frame.
+
+        :returns: int array of shape (num_frames, num_cells)
+        '''
+
+        start = self.start if start is None else start
+        end = self.end if end is None else end
+        state = self.state(start).copy()
+        states = [state.copy()]
+        for frame in range(start + 1, end + 1):
+            cells, indices = self.changes(frame)
+            state[cells] = indices
+            states.append(state.copy())
+        return np.array(states, dtype=np.int32)
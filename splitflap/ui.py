@@ -1,6 +1,8 @@
 from __future__ import division
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
+from contextlib import contextmanager
 from Qt import QtWidgets, QtGui, QtCore
+from . import cost
 
 
 class RepaintProperty(object):
@@ -23,6 +25,140 @@ class RepaintProperty(object):
         inst.repaint()
 
 
+def message_to_cells(message, rows, columns):
+    '''
+    Split a message into one character per cell of a row, column layout.
+
+    Lines separated by newlines start on a new row, otherwise the message
+    flows from cell to cell. Cells without a character are blank.
+
+    :param message: Text to display
+    :param rows: Number of rows in layout
+    :param columns: Number of columns in layout
+    '''
+
+    lines = message.split('\n')
+    if len(lines) == 1:
+        lines = [message[i:i + columns]
+                 for i in range(0, len(message), columns)]
+
+    cells = []
+    for line in lines[:rows]:
+        cells.extend(line[:columns].ljust(columns))
+    cells.extend(' ' * (rows * columns - len(cells)))
+    return cells
+
+
+class GlyphAtlas(object):
+    '''
+    Pre-rasterized split flap cards for a font at a specific cell size.
+
+    Every glyph is drawn once into a single pixmap, cells are then painted
+    with one drawPixmap call. Glyphs missing from the atlas are rasterized
+    on first use.
+    '''
+
+    chars = (
+        ' ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+        'abcdefghijklmnopqrstuvwxyz'
+        '0123456789.,:;!?\'"-+=/()&@#$%*'
+    )
+    cache_size = 8
+    _cache = OrderedDict()
+
+    def __init__(self, font, width, height):
+        self.font = font
+        self.width = width
+        self.height = height
+        self.columns = 16
+        self.rects = {}
+        self.extra = {}
+
+        rows = -(-len(self.chars) // self.columns)
+        self.pixmap = QtGui.QPixmap(self.columns * width, rows * height)
+        self.pixmap.fill(QtCore.Qt.transparent)
+
+        painter = QtGui.QPainter()
+        painter.begin(self.pixmap)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        for i, char in enumerate(self.chars):
+            x = (i % self.columns) * width
+            y = (i // self.columns) * height
+            rect = QtCore.QRect(x, y, width, height)
+            self.draw_card(painter, rect, char)
+            self.rects[char] = rect
+        painter.end()
+
+    @classmethod
+    def get(cls, font, width, height):
+        '''Get a cached atlas for font and cell size.'''
+
+        width, height = max(int(width), 1), max(int(height), 1)
+        key = (font.toString(), width, height)
+        atlas = cls._cache.pop(key, None)
+        if not atlas:
+            atlas = cls(font, width, height)
+        cls._cache[key] = atlas
+        while len(cls._cache) > cls.cache_size:
+            cls._cache.popitem(last=False)
+        return atlas
+
+    def draw_card(self, painter, rect, char):
+        rect = QtCore.QRectF(rect)
+
+        # Get round rect radius
+        rscale = rect.width() / rect.height()
+        if rscale < 1:
+            rx = 25
+            ry = rx * rscale
+        else:
+            rscale = rect.height() / rect.width()
+            ry = 25
+            rx = ry * rscale
+
+        painter.setPen(QtCore.Qt.NoPen)
+        painter.setBrush(QtGui.QColor(145, 145, 145))
+        painter.drawRoundRect(rect, rx, ry)
+
+        painter.setFont(self.font)
+        painter.setPen(QtGui.QColor(37, 37, 37))
+        painter.drawText(rect, QtCore.Qt.AlignCenter, char)
+
+        pen = QtGui.QPen(
+            QtGui.QColor(37, 37, 37),
+            rect.height() * 0.025,
+            QtCore.Qt.SolidLine)
+        painter.setPen(pen)
+        mid = rect.center().y()
+        painter.drawLine(
+            QtCore.QPointF(rect.left(), mid),
+            QtCore.QPointF(rect.right(), mid)
+        )
+
+    def glyph(self, char):
+        '''Get the source pixmap and rect for a character.'''
+
+        if char in self.rects:
+            return self.pixmap, self.rects[char]
+
+        if char not in self.extra:
+            pixmap = QtGui.QPixmap(self.width, self.height)
+            pixmap.fill(QtCore.Qt.transparent)
+            painter = QtGui.QPainter()
+            painter.begin(pixmap)
+            painter.setRenderHint(QtGui.QPainter.Antialiasing)
+            self.draw_card(painter, pixmap.rect(), char)
+            painter.end()
+            self.extra[char] = pixmap
+
+        pixmap = self.extra[char]
+        return pixmap, pixmap.rect()
+
+    def draw(self, painter, target, char):
+        pixmap, source = self.glyph(char)
+        painter.drawPixmap(target, pixmap, source)
+
+
 class GridWidget(QtWidgets.QWidget):
     '''
     A Widget displaying an array of cards based on some parameters
@@ -43,11 +179,105 @@ class GridWidget(QtWidgets.QWidget):
         self.height = height
         self.padding = padding
         self.pixmap = None
+        self.message = None
+        self.cells = []
+        self.cells_layout = None
 
     def set_image(self, image_path):
         self.pixmap = None
         self.image = image_path
 
+    def set_message(self, message):
+        '''
+        Preview a message on the grid, one character per cell. Only cells
+        whose character changed are redrawn. Pass None to show cell indices.
+        '''
+
+        if not message:
+            self.message = None
+            self.cells = []
+            self.cells_layout = None
+            self.repaint()
+            return
+
+        layout = (self.rows, self.columns)
+        cells = message_to_cells(message, *layout)
+        previous = self.cells
+        self.message = message
+        self.cells = cells
+
+        if self.cells_layout != layout:
+            self.cells_layout = layout
+            self.update()
+            return
+
+        rects = self.cell_rects(self.rect())
+        for rect, old, new in zip(rects, previous, cells):
+            if old != new:
+                self.update(rect.toAlignedRect())
+
+    def grid_transform(self, rect):
+        '''
+        Get the scale and translation used to fit the grid into rect.
+        '''
+
+        g_width = self.columns * self.width + self.padding
+        g_height = self.rows * self.height + self.padding
+
+        scale = min(rect.height() / g_height, rect.width() / g_width)
+        tx = (rect.width() - g_width * scale) * 0.5
+        ty = (rect.height() - g_height * scale) * 0.5
+        return scale, tx, ty
+
+    def cell_rects(self, rect):
+        '''
+        Get the rects of all cells in rect, in row, column order.
+        '''
+
+        scale, tx, ty = self.grid_transform(rect)
+        padding = self.padding * scale
+        width = self.width * scale
+        height = self.height * scale
+        cell = QtCore.QRectF(
+            padding,
+            padding,
+            width - padding,
+            height - padding
+        )
+
+        rects = []
+        for y in range(self.rows):
+            for x in range(self.columns):
+                rects.append(cell.translated(x * width + tx, y * height + ty))
+        return rects
+
+    def draw_message(self, painter, event):
+
+        layout = (self.rows, self.columns)
+        if self.cells_layout != layout:
+            self.cells = message_to_cells(self.message, *layout)
+            self.cells_layout = layout
+
+        rects = self.cell_rects(self.rect())
+        if not rects:
+            return
+
+        scale, _, _ = self.grid_transform(self.rect())
+        font = QtGui.QFont('')
+        font.setStyleHint(QtGui.QFont.Monospace)
+        font.setStretch(90)
+        size = min(self.width, self.height) * scale * 0.7
+        font.setPixelSize(max(int(size), 1))
+
+        cell = rects[0].toAlignedRect()
+        atlas = GlyphAtlas.get(font, cell.width(), cell.height())
+
+        dirty = event.rect()
+        for rect, char in zip(rects, self.cells):
+            target = rect.toAlignedRect()
+            if target.intersects(dirty):
+                atlas.draw(painter, target, char)
+
     def draw_geometry(self, painter, event):
 
         ev_width = event.rect().width()
@@ -171,15 +401,23 @@ class GridWidget(QtWidgets.QWidget):
         painter.drawRect(event.rect())
 
         # Draw Rects
-        self.draw_geometry(painter, event)
+        if self.message:
+            self.draw_message(painter, event)
+        else:
+            self.draw_geometry(painter, event)
 
         painter.end()
 
 
 class Dialog(QtWidgets.QDialog):
 
+    # Estimates above these limits are highlighted
+    max_bytes = 16 * 1024 ** 3
+    max_build_seconds = 30 * 60
+
     def __init__(self, parent=None):
         super(Dialog, self).__init__(parent)
+        self.cost_model = cost.CostModel()
 
         self.grid = GridWidget(
             rows=3,
@@ -205,19 +443,25 @@ class Dialog(QtWidgets.QDialog):
         padding_label = QtWidgets.QLabel('padding')
         padding_label.setAlignment(QtCore.Qt.AlignRight)
 
+        message_label = QtWidgets.QLabel('message')
+        message_label.setAlignment(QtCore.Qt.AlignRight)
+
         self.rows = QtWidgets.QSpinBox()
         self.rows.setMinimum(1)
         self.rows.setValue(3)
         self.rows.valueChanged.connect(self.grid_attr_changed('rows'))
+        self.rows.valueChanged.connect(self.update_estimate)
 
         self.columns = QtWidgets.QSpinBox()
         self.columns.setMinimum(1)
         self.columns.setValue(4)
         self.columns.valueChanged.connect(self.grid_attr_changed('columns'))
+        self.columns.valueChanged.connect(self.update_estimate)
 
         self.num_images = QtWidgets.QSpinBox()
         self.num_images.setValue(32)
         self.num_images.setMinimum(8)
+        self.num_images.valueChanged.connect(self.update_estimate)
 
         self.radius = QtWidgets.QDoubleSpinBox()
         self.radius.setValue(0.225)
@@ -230,6 +474,10 @@ class Dialog(QtWidgets.QDialog):
         self.padding.setSingleStep(0.025)
         self.padding.setDecimals(3)
 
+        self.message = QtWidgets.QLineEdit()
+        self.message.setPlaceholderText('Preview a message...')
+        self.message.textChanged.connect(self.grid.set_message)
+
         control_layout = QtWidgets.QGridLayout()
         control_layout.setContentsMargins(20, 20, 20, 20)
         control_layout.addWidget(row_label, 0, 0)
@@ -242,6 +490,43 @@ class Dialog(QtWidgets.QDialog):
         control_layout.addWidget(self.radius, 3, 1)
         control_layout.addWidget(padding_label, 4, 0)
         control_layout.addWidget(self.padding, 4, 1)
+        control_layout.addWidget(message_label, 5, 0)
+        control_layout.addWidget(self.message, 5, 1)
+
+        self.undoable = QtWidgets.QCheckBox('Undoable build')
+        self.undoable.setToolTip(
+            'Record builds in the undo queue. Large walls build faster and '
+            'use less memory without undo, failed or canceled builds are '
+            'still cleaned up.'
+        )
+        self.undoable.toggled.connect(self.update_estimate)
+        control_layout.addWidget(self.undoable, 6, 1)
+
+        self.dense_uvs = QtWidgets.QCheckBox('Dense uv packing')
+        self.dense_uvs.setToolTip(
+            'Pack cells with the aspect of the flaps instead of a row, column '
+            'grid. Walls far from square need smaller textures.'
+        )
+        control_layout.addWidget(self.dense_uvs, 7, 1)
+
+        self.write_manifest = QtWidgets.QCheckBox('Write manifest')
+        self.write_manifest.setToolTip(
+            'Publish a manifest of generated walls to a manifests folder '
+            'next to the saved scene.'
+        )
+        control_layout.addWidget(self.write_manifest, 8, 1)
+
+        self.calibrate = QtWidgets.QCheckBox('Calibrate estimate')
+        self.calibrate.setToolTip(
+            'Record the build time, memory and a short simulation of '
+            'generated walls to calibrate the cost estimate. The simulation '
+            'adds a few frames of dynamics to each build.'
+        )
+        control_layout.addWidget(self.calibrate, 9, 1)
+
+        self.estimate = QtWidgets.QLabel()
+        self.estimate.setWordWrap(True)
+        self.estimate.setContentsMargins(20, 0, 20, 0)
 
         self.generate_base_flaps = QtWidgets.QPushButton('Generate Base Flaps')
         self.generate_wall = QtWidgets.QPushButton('Generate Wall')
@@ -256,8 +541,58 @@ class Dialog(QtWidgets.QDialog):
         self.setWindowTitle('Split Flap Display Builder')
         layout.addWidget(self.grid)
         layout.addLayout(control_layout)
+        layout.addWidget(self.estimate)
         layout.addLayout(button_layout)
 
+        self.update_estimate()
+
+    def base_mesh_stats(self):
+        '''
+        Get the vertex and face count of the base flap mesh, or None when
+        there is no base mesh. Subclasses read these from the scene.
+        '''
+
+        return None
+
+    def backend(self):
+        '''Get the backend of wall builds, undoable builds need pymel.'''
+        return 'pymel' if self.undoable.isChecked() else 'openmaya'
+
+    def update_estimate(self):
+        stats = self.base_mesh_stats()
+        if not stats:
+            self.estimate.setText('Select a base mesh to estimate build cost')
+            self.estimate.setStyleSheet('')
+            return
+
+        estimate = self.cost_model.estimate(
+            self.rows.value(),
+            self.columns.value(),
+            self.num_images.value(),
+            *stats,
+            backend=self.backend()
+        )
+        self.estimate.setText(
+            '{:,} verts | {:,} faces | {:,} nodes | ~{}\n'
+            'build ~{} | sim ~{}/frame'.format(
+                estimate['vertices'],
+                estimate['faces'],
+                estimate['nodes'],
+                cost.format_bytes(estimate['bytes']),
+                cost.format_seconds(estimate['build_seconds']),
+                cost.format_seconds(estimate['frame_seconds']),
+            )
+        )
+
+        oversized = (
+            estimate['bytes'] > self.max_bytes or
+            estimate['build_seconds'] > self.max_build_seconds
+        )
+        if oversized:
+            self.estimate.setStyleSheet('color: rgb(255, 96, 96)')
+        else:
+            self.estimate.setStyleSheet('')
+
     def grid_attr_changed(self, attr):
 
         def change_value():
@@ -265,33 +600,62 @@ class Dialog(QtWidgets.QDialog):
         return change_value
 
 
+class BuildCanceled(Exception):
+    '''Raised by ProgressBar.set after the user cancels a build.'''
+
+
 class ProgressBar(object):
 
     _instance = None
     _suppress = True
+    _canceled = False
 
     @classmethod
     def suppress(cls, value):
         cls._suppress = value
 
     @classmethod
-    def create(self, parent=None):
+    @contextmanager
+    def shown(cls):
+        '''
+        Show the progress of builds started inside, they can be canceled
+        from the dialog.
+        '''
+
+        suppressed = cls._suppress
+        cls._suppress = False
+        try:
+            yield
+        finally:
+            # A click after the last set must not cancel the next build
+            cls._canceled = False
+            cls._suppress = suppressed
+
+    @classmethod
+    def create(cls, parent=None):
         dialog = QtWidgets.QDialog(parent=parent)
         layout = QtWidgets.QVBoxLayout()
         layout.setContentsMargins(20, 20, 20, 20)
         dialog.setLayout(layout)
-        dialog.setFixedSize(300, 100)
+        dialog.setFixedSize(300, 130)
 
         dialog.progress_bar = QtWidgets.QProgressBar()
         dialog.progress_bar.setMinimum(0)
         dialog.progress_bar.setMaximum(100)
         dialog.label = QtWidgets.QLabel()
+        dialog.cancel_button = QtWidgets.QPushButton('Cancel')
+        dialog.cancel_button.clicked.connect(cls.cancel)
 
         layout.addWidget(dialog.progress_bar)
         layout.addWidget(dialog.label)
+        layout.addWidget(dialog.cancel_button)
 
         return dialog
 
+    @classmethod
+    def cancel(cls):
+        cls._canceled = True
+
     @classmethod
     def set_title(cls, title):
         if cls._suppress:
@@ -306,6 +670,12 @@ class ProgressBar(object):
         if text:
             cls._instance.label.setText(text)
 
+        QtWidgets.QApplication.processEvents()
+        if cls._canceled:
+            cls._canceled = False
+            cls._instance.hide()
+            raise BuildCanceled('Build canceled')
+
     @classmethod
     def set_maximum(cls, value):
         if cls._suppress:
@@ -331,6 +701,7 @@ class ProgressBar(object):
         if not cls._instance:
             cls._instance = cls.create(parent=parent)
 
+        cls._canceled = False
         cls.set_title(title)
         cls.set_maximum(maximum)
         cls.set(0, text)
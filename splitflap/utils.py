@@ -1,33 +1,42 @@
 from __future__ import print_function, division
 from contextlib import contextmanager
-import math
 import re
-from random import choice
+import random
+import time
 import pymel.core as pm
-from pymel.core.runtime import nClothCreate, nClothMakeCollide
-from PySide import QtGui, QtCore
-from maya.OpenMayaUI import MQtUtil
+from maya.api import OpenMaya, OpenMayaAnim
+import numpy as np
 from .ui import ProgressBar
-import shiboken
-import time
+from . import mesh, layout, shading, splitflap_nodes
+from .layout import advance_rotation, rotation_to_index
+from .uv import (
+    get_uvs_in_range, get_row_col, pack_uvs, index_to_udim, shift_uvs,
+    CellPacking,
+)
 
 
 def get_maya_window():
     '''Get Maya MainWindow as a QWidget.'''
 
-    ptr = long(MQtUtil.mainWindow())
-    return shiboken.wrapInstance(ptr, QtGui.QWidget)
+    from Qt import QtWidgets
+    from Qt.QtCompat import wrapInstance
+    from maya.OpenMayaUI import MQtUtil
+
+    return wrapInstance(int(MQtUtil.mainWindow()), QtWidgets.QWidget)
 
 
 def wait(delay=1):
     '''Delay python execution for a specified amount of time'''
 
-    s = time.clock()
+    from Qt import QtWidgets
+
+    s = time.time()
 
     while True:
-        if time.clock() - s >= delay:
+        if time.time() - s >= delay:
             return
-        QtGui.qApp.processEvents()
+        QtWidgets.QApplication.processEvents()
+
 
 @contextmanager
 def selection(nodes):
@@ -64,6 +73,87 @@ def undo_chunk(auto_undo=False, exc_callback=None):
         pm.undoInfo(closeChunk=True)
 
 
+class NodeRegistry(object):
+    '''
+    Track every node created while started, so a build can be rolled back
+    without the undo queue.
+    '''
+
+    def __init__(self):
+        self.handles = []
+        self._callback = None
+
+    def start(self):
+        if self._callback is None:
+            self._callback = OpenMaya.MDGMessage.addNodeAddedCallback(
+                self._node_added,
+                'dependNode'
+            )
+
+    def stop(self):
+        if self._callback is not None:
+            OpenMaya.MMessage.removeCallback(self._callback)
+            self._callback = None
+
+    def _node_added(self, node, *args):
+        self.handles.append(OpenMaya.MObjectHandle(node))
+
+    def nodes(self):
+        '''Get the MObjects of tracked nodes that still exist.'''
+        return [h.object() for h in self.handles if h.isValid()]
+
+    def rollback(self):
+        '''
+        Delete every tracked node that still exists. Dag nodes are deleted
+        from their top most tracked parent in one batch, then any dependency
+        nodes left behind in a second.
+        '''
+
+        dag_paths = set()
+        for obj in self.nodes():
+            if obj.hasFn(OpenMaya.MFn.kDagNode):
+                dag_paths.add(OpenMaya.MFnDagNode(obj).fullPathName())
+
+        roots = [path for path in dag_paths
+                 if not any(path.startswith(other + '|')
+                            for other in dag_paths)]
+        if roots:
+            pm.delete(roots)
+
+        names = [OpenMaya.MFnDependencyNode(obj).name()
+                 for obj in self.nodes()
+                 if not obj.hasFn(OpenMaya.MFn.kDagNode)]
+        names = [name for name in names if pm.objExists(name)]
+        if names:
+            pm.delete(names)
+        self.handles = []
+
+
+@contextmanager
+def tracked_build(exc_callback=None):
+    '''
+    Build context manager with undo recording turned off. Nodes created
+    inside are tracked in a NodeRegistry and deleted if the build raises,
+    including when it is canceled from the ProgressBar.
+    '''
+
+    registry = NodeRegistry()
+    undo_state = pm.undoInfo(query=True, state=True)
+    pm.undoInfo(stateWithoutFlush=False)
+    registry.start()
+    try:
+        yield registry
+    except BaseException as e:
+        registry.stop()
+        registry.rollback()
+        if exc_callback:
+            exc_callback(e)
+        raise
+    finally:
+        registry.stop()
+        pm.undoInfo(stateWithoutFlush=undo_state)
+
+
 def replace_in_hierarchy(root, regex, substitute):
 
     hierarchy = pm.ls(root, dag=True)
@@ -93,169 +183,438 @@ def get_uvs(mesh):
     [(u,v)...]
     '''
 
-    return zip(*mesh.getUVs())
+    return list(zip(*mesh.getUVs()))
 
 
-def get_uvs_in_range(uvs, u_min, v_min, u_max, v_max):
+def evaluate_rotations(joints, start, end):
+    '''
+    Evaluate the rotateX of anim joints over a frame range directly from
+    their animCurves, the scene time is not changed. Joints without an
+    animCurve keep their current rotation.
+
+    :param joints: List of pymel.PyNode joints
+    :param start: First frame
+    :param end: Last frame, inclusive
+    :returns: Degrees of shape (num_frames, num_joints)
     '''
-    Get the indices of uvs that fall within the specified uv range.
 
-    :param uvs: List of tuples representing uv values [(u, v)...]
-    :param u_min: Minimum u value
-    :param v_min: Minimum v value
-    :param u_max: Maximum u value
-    :param v_max: Maximum v value
+    selection = OpenMaya.MSelectionList()
+    for joint in joints:
+        selection.add(joint.rotateX.name())
+
+    frames = range(int(start), int(end) + 1)
+    unit = OpenMaya.MTime.uiUnit()
+    times = [OpenMaya.MTime(frame, unit) for frame in frames]
+    rotations = np.zeros((len(frames), selection.length()))
+    for i in range(selection.length()):
+        plug = selection.getPlug(i)
+        curves = OpenMayaAnim.MAnimUtil.findAnimation(plug)
+        if not curves:
+            rotations[:, i] = plug.asDouble()
+            continue
+        curve = OpenMayaAnim.MFnAnimCurve(curves[0])
+        rotations[:, i] = [curve.evaluate(time) for time in times]
+    return np.degrees(rotations)
+
+
+def create_card_flaps(cloth, num_flaps, layout_index, rows, columns,
+                      name='cards_geo', shading_engine='initialShadingGroup',
+                      packing=None):
+    '''
+    Create double sided card flaps from a split flap's cloth flaps, a light
+    stand in for the full flaps. Uvs are packed and shifted like
+    create_flap_mesh.
+
+    :param cloth: pymel.PyNode cloth flaps
+    :param num_flaps: Number of flaps
+    :param layout_index: Index of the flaps in the row column layout
+    :param rows: Number of rows in layout
+    :param columns: Number of columns in layout
+    :param name: Name of the mesh transform
+    :param shading_engine: Shading engine to assign
+    :param packing: uv.CellPacking (default: rows x columns grid)
     '''
 
-    uvids = []
-    for i, (u, v) in enumerate(uvs):
-        if u_min < u < u_max and v_min < v < v_max:
-            uvids.append(i)
-    return uvids
+    packing = packing or CellPacking(rows, columns)
+    data, flaps, top = mesh.card_flaps(read_mesh(cloth), num_flaps)
+    uvs = [tuple(uv) for uv in data.uvs.tolist()]
+    packing.pack(uvs, range(len(uvs)), layout_index)
+    udims = np.array([index_to_udim(i, num_flaps)
+                      for i in range(num_flaps + 1)])
+    data.uvs = np.array(uvs) + np.where(
+        top[:, None],
+        udims[flaps],
+        udims[flaps + 1]
+    )
+    return create_mesh(data, name, shading_engine)
 
 
-def get_row_col(index, max_index, num_columns):
+def create_reduced_mesh(node, percentage, name='reduced_geo'):
     '''
-    Get the row and coloumn for the specified index.
+    Create a decimated copy of a mesh, keeping borders and uv borders.
 
-    :param index: Index of item
-    :param max_index: Maximum number of items in loop
-    :param num_colums: Number of columns
+    :param node: pymel.PyNode mesh transform
+    :param percentage: Percentage of vertices to remove
+    :param name: Name of the copy
     '''
 
-    if max_index:
-        if index >= max_index:
-            index -= max_index
-
-    row = index/(num_columns)
-    col = index%(num_columns)
-    return math.floor(row), math.floor(col)
+    reduced = node.duplicate(name=name, rc=True)[0]
+    pm.polyReduce(
+        reduced,
+        percentage=percentage,
+        keepBorder=True,
+        keepMapBorder=True,
+        keepQuadsWeight=1,
+        replaceOriginal=True,
+        constructionHistory=False
+    )
+    return reduced
 
 
-def pack_uvs(uvs, uvids, i, rows, columns):
+def create_cell_mesh(data, translations, uv_offsets, name='cells_geo',
+                     shading_engine='initialShadingGroup'):
+    '''
+    Create one mesh with a copy of data at every cell translation, the uvs
+    of each copy are shifted by the cell's uv offset.
+
+    :param data: mesh.MeshData
+    :param translations: float array of shape (num_cells, 3)
+    :param uv_offsets: float array of shape (num_cells, 2)
+    :param name: Name of the mesh transform
+    :param shading_engine: Shading engine to assign
     '''
-    Pack the specified uvs into a specific uv space based on index in a row,
-    column layout.
 
-    :param uvs: List of tuples representing uv values [(u, v)...]
-    :param uvids: List of uvids to shift [0, 2, 10...]
-    :param i: Layout index
-    :param rows: Number of rows in layout
-    :param columns: Number of columns in layout
+    num_cells = len(translations)
+    combined = mesh.copies(data, layout.translate_matrices(translations))
+    uvs = combined.uvs.reshape(num_cells, data.num_uvs, 2)
+    combined.uvs = (uvs + np.asarray(uv_offsets)[:, None]).reshape(-1, 2)
+    return create_mesh(combined, name, shading_engine)
+
+
+def get_shading_engine(node):
+    '''Get the shading engine assigned to a mesh.'''
+
+    shape = node.getShape(noIntermediate=True)
+    engines = shape.listConnections(type='shadingEngine')
+    return engines[0] if engines else 'initialShadingGroup'
+
+
+def get_input_shape(node):
+    '''
+    Get the shape holding a mesh's own data, its intermediate input shape
+    when deformed, so edits are not lost to its history.
     '''
-    r, c = get_row_col(i, None, columns)
-    sx = 1 / columns
-    sy = 1 / rows
 
-    for uvid in uvids:
-        u, v = uvs[uvid]
-        u = u * sx + c * sx
-        v = v * sy + (1 - sy - r * sy)
-        uvs[uvid] = (u, v)
+    for shape in node.getShapes():
+        if shape.intermediateObject.get() and not shape.inMesh.inputs():
+            return shape
+    return node.getShape(noIntermediate=True)
+
+
+def get_fn_mesh(shape):
+    '''Get the OpenMaya.MFnMesh of a pymel.PyNode mesh shape.'''
+
+    selection = OpenMaya.MSelectionList()
+    selection.add(shape.name())
+    return OpenMaya.MFnMesh(selection.getDagPath(0))
 
 
-def index_to_udim(i, max_i, columns=10):
+def add_offset_uvs(node, cell_offsets, num_images, base_v=0, orders=None):
     '''
-    Convert index to udim column and row
+    Move the cell and image shifts baked into the uvs of a wall mesh to the
+    shading.OFFSET_SET uv set, leaving one canonical uv layout in the
+    current uv set, see shading.py.
+
+    :param node: pymel.PyNode mesh whose vertices are grouped by cell, like
+        create_cell_mesh
+    :param cell_offsets: float array of shape (num_cells, 2), the uv offset
+        the uvs of every cell were shifted by
+    :param num_images: Number of images
+    :param base_v: v shift of the tile of the base split flap's region, see
+        uv.CellPacking.tile_offset
+    :param orders: Images shown by every cell, see shading.cell_orders
     '''
 
-    r, c = get_row_col(i, max_i, columns)
-    return c, r
+    fn_mesh = get_fn_mesh(get_input_shape(node))
+    data = splitflap_nodes.read_mesh_data(fn_mesh)
+    cell_offsets = np.asarray(cell_offsets, dtype=np.float64)
+    cells = shading.face_cells(
+        data.counts,
+        data.connects,
+        data.num_vertices,
+        len(cell_offsets)
+    )
+
+    # Every cell gets the uvs of the base split flap
+    uv_cells = np.zeros(data.num_uvs, dtype=np.int64)
+    uv_cells[data.face_uvs] = np.repeat(cells, data.counts)
+    uvs, images = shading.split_uvs(
+        data.uvs - cell_offsets[uv_cells],
+        data.counts,
+        data.face_uvs,
+        num_images,
+        base_v
+    )
+    fn_mesh.setUVs(
+        uvs[:, 0].tolist(),
+        uvs[:, 1].tolist(),
+        fn_mesh.currentUVSetName()
+    )
+
+    if shading.OFFSET_SET not in fn_mesh.getUVSetNames():
+        fn_mesh.createUVSet(shading.OFFSET_SET)
+    set_offset_uvs(node, cell_offsets, num_images, orders)
+    fn_mesh.assignUVs(
+        data.counts.tolist(),
+        shading.offset_ids(cells, images, data.counts, num_images).tolist(),
+        shading.OFFSET_SET
+    )
 
 
-def shift_uvs(uvs, uvids, u_shift, v_shift):
+def set_offset_uvs(node, cell_offsets, num_images, orders=None):
     '''
-    Shift the uvs matched uvids in place, by a specific u and v amount.
+    Set the images shown by the cells of a mesh with offset uvs, see
+    add_offset_uvs. Only the num_cells * num_images offset uvs are written.
 
-    :param uvs: List of tuples representing uv values [(u, v)...]
-    :param uvids: List of uvids to shift [0, 2, 10...]
-    :param u_shift: Amount in u to shift
-    :param v_shift: Amount in v to shift
+    :param node: pymel.PyNode mesh with offset uvs
+    :param cell_offsets: float array of shape (num_cells, 2)
+    :param num_images: Number of images
+    :param orders: Images shown by every cell, see shading.cell_orders
     '''
 
-    for uvid in uvids:
-        u, v = uvs[uvid]
-        u += u_shift
-        v += v_shift
-        uvs[uvid] = (u, v)
+    table = shading.offset_table(cell_offsets, orders, num_images)
+    get_fn_mesh(get_input_shape(node)).setUVs(
+        table[:, 0].tolist(),
+        table[:, 1].tolist(),
+        shading.OFFSET_SET
+    )
+
+
+def connect_offset_shader(meshes, texture):
+    '''
+    Make a udim file texture read the canonical uvs plus the offset uvs of
+    wall meshes, see add_offset_uvs. A uvChooser picks each uv set of every
+    mesh and a plusMinusAverage adds them into the texture's uvCoord.
 
+    :param meshes: List of pymel.PyNode mesh transforms with offset uvs
+    :param texture: pymel.PyNode file texture
+    :returns: pymel.PyNode plusMinusAverage
+    '''
 
-def create_cloth_flap(flap, subdivisions_width=1, subdivisions_height=1):
+    canonical = pm.createNode('uvChooser', name='canonical_uvChooser#')
+    offset = pm.createNode('uvChooser', name='offset_uvChooser#')
+    for k, node in enumerate(meshes):
+        shape = node.getShape(noIntermediate=True)
+        names = [shape.uvSet[i].uvSetName
+                 for i in shape.uvSet.getArrayIndices()]
+        for name in names:
+            if name.get() == shading.OFFSET_SET:
+                name.connect(offset.uvSets[k], force=True)
+                break
+        for name in names:
+            if name.get() != shading.OFFSET_SET:
+                name.connect(canonical.uvSets[k], force=True)
+                break
+
+    add = pm.createNode('plusMinusAverage', name='uv_offset_add#')
+    canonical.outUv.connect(add.input2D[0])
+    offset.outUv.connect(add.input2D[1])
+    add.output2D.connect(texture.uvCoord, force=True)
+    return add
+
+
+def create_cloth_flaps(flap_bounds, num_flaps, radius,
+                       name='cloth_flap_geo',
+                       subdivisions_width=1, subdivisions_height=1):
     '''
-    Create flap geometry that will be used for nCloth simulation.
+    Create radially arranged flap geometry for nCloth simulation as a single
+    mesh.
 
-    :param flap: Flap object that will later be wrap deformed
+    :param flap_bounds: (width, height, center) of the flap that will later
+        be wrap deformed, see FlapVariantPool.bounds
+    :param num_flaps: Number of flaps
+    :param radius: Radius of arrangement
+    :param name: Name of the mesh transform
     :param subdivisions_width: Number of subdivisions along X-axis
     :param subdivisions_height: Number of subdivisions in Y-axis
     '''
 
-    bounds = flap.boundingBox()
-    plane, plane_shape = pm.polyPlane(
-        width=bounds.width(),
-        height=bounds.height(),
-        sx=subdivisions_width,
-        sy=subdivisions_height,
-        axis=[0, 0, 1],
-        cuv=1,
+    width, height, center = flap_bounds
+    data = mesh.cloth_flaps(
+        width,
+        height,
+        center,
+        num_flaps,
+        radius,
+        subdivisions_width,
+        subdivisions_height,
     )
-    plane.setTranslation(bounds.center())
-    pm.makeIdentity(plane, apply=True, t=True, r=True, s=True, n=False)
-    plane.setPivots([0, 0, 0])
-    return plane
+    return create_mesh(data, name)
 
 
-def create_flaps(num_flaps, base_flaps, layout_index, rows, columns):
+def create_mesh(data, name='mesh#', shading_engine='initialShadingGroup'):
     '''
-    Create flaps from a set of base flap geometry and pack_uvs according to
-    index in a set of rows and columns.
+    Create a mesh from MeshData with a single MFnMesh.create call.
 
-    :param num_flaps: Number of flaps to create
-    :param base_flaps: List of base flap geometry to choose at random
-    :param layout_index: Index of the flaps in the row column layout
-    :param rows: Number of rows in layout
-    :param columns: Number of columns in layout
+    :param data: mesh.MeshData
+    :param name: Name of the mesh transform
+    :param shading_engine: Shading engine to assign
+    :returns: pymel.PyNode transform
     '''
 
-    ProgressBar.setup(
-        title='Creating Split Flaps',
-        text='Duplicating base geometry...',
-        maximum=100,
-        parent=utils.get_maya_window()
-    )
+    points = splitflap_nodes.to_point_array(data.points)
+    fn_mesh = OpenMaya.MFnMesh()
+    counts = data.counts.tolist()
+    connects = data.connects.tolist()
+    if data.uvs is None:
+        transform = fn_mesh.create(points, counts, connects)
+    else:
+        transform = fn_mesh.create(
+            points,
+            counts,
+            connects,
+            data.uvs[:, 0].tolist(),
+            data.uvs[:, 1].tolist(),
+        )
+        fn_mesh.assignUVs(counts, data.face_uvs.tolist())
+
+    node = pm.PyNode(OpenMaya.MFnDagNode(transform).fullPathName())
+    node.rename(name)
+    pm.sets(shading_engine, edit=True, forceElement=node)
+    return node
+
+
+def read_mesh(node):
+    '''
+    Read the object space points, faces and uvs of a mesh.
 
-    # Name and group geometry
-    r, c = get_row_col(layout_index, None, columns)
-    flaps = [choice(base_flaps).duplicate(rc=True)[0]
-             for i in xrange(num_flaps)]
-
-    ProgressBar.set(25, 'Packing UVs...')
-    # Pack UVS
-    uvs = get_uvs(flaps[0].getShape(noIntermediate=True))
-    top_uvids = get_uvs_in_range(uvs, 0, 0.5, 1, 1)
-    bottom_uvids = get_uvs_in_range(uvs, 0, 0, 1, 0.5)
-    pack_uvs(
-        uvs,
-        top_uvids + bottom_uvids,
-        layout_index,
-        rows,
-        columns
-    )
+    :param node: pymel.PyNode mesh or transform
+    :returns: mesh.MeshData
+    '''
+
+    selection = OpenMaya.MSelectionList()
+    selection.add(node.name())
+    dag_path = selection.getDagPath(0)
+    dag_path.extendToShape()
+    return splitflap_nodes.read_mesh_data(OpenMaya.MFnMesh(dag_path))
 
-    ProgressBar.set(50, 'Shifting UVs')
-    step = 50.0 / len(flaps)
-    for i, flap in enumerate(flaps):
-        ProgressBar.set(50 + i * step)
-        mesh = flap.getShape(noIntermediate=True)
 
-        # Shift UVS according to UDIM
-        mesh_uvs = list(uvs)
-        shift_uvs(mesh_uvs, top_uvids, *index_to_udim(i, num_flaps))
-        shift_uvs(mesh_uvs, bottom_uvids, *index_to_udim(i + 1, num_flaps))
-        set_uvs(mesh, mesh_uvs)
+class FlapVariantPool(object):
+    '''
+    Distinct base flaps, each read and uv packed once.
 
-    ProgressBar.set(100, 'Done!!')
+    Flaps of a split flap are built from the pool and only differ by their
+    udim offset, so the work and memory needed to prepare them grows with
+    the number of distinct base flaps instead of the number of images.
 
-    return flaps
+    :param base_flaps: List of base flap geometry
+    :param layout_index: Index of the flaps in the row column layout
+    :param rows: Number of rows in layout
+    :param columns: Number of columns in layout
+    :param packing: uv.CellPacking (default: rows x columns grid)
+    '''
+
+    def __init__(self, base_flaps, layout_index, rows, columns,
+                 packing=None):
+        self.base_flaps = list(base_flaps)
+        self.layout_index = layout_index
+        self.rows = rows
+        self.columns = columns
+        self.packing = packing or CellPacking(rows, columns)
+        self._variants = {}
+
+    def __len__(self):
+        return len(self._variants)
+
+    def choose(self, num_flaps, seed=None):
+        '''
+        Choose a base flap for every image. The same seed always produces
+        the same choices.
+
+        :returns: List of base flap indices
+        '''
+
+        rng = random.Random(seed)
+        return [rng.randrange(len(self.base_flaps)) for i in range(num_flaps)]
+
+    def get(self, index):
+        '''
+        Get the prepared variant of a base flap.
+
+        :returns: (MeshData with packed uvs, top uv mask, bottom uv mask)
+        '''
+
+        if index not in self._variants:
+            data = read_mesh(self.base_flaps[index])
+            uvs = [tuple(uv) for uv in data.uvs.tolist()]
+            top_uvids = get_uvs_in_range(uvs, 0, 0.5, 1, 1)
+            bottom_uvids = get_uvs_in_range(uvs, 0, 0, 1, 0.5)
+            self.packing.pack(
+                uvs,
+                top_uvids + bottom_uvids,
+                self.layout_index
+            )
+            data.uvs = np.array(uvs, dtype=np.float64)
+            top = np.zeros(len(uvs), dtype=bool)
+            top[top_uvids] = True
+            bottom = np.zeros(len(uvs), dtype=bool)
+            bottom[bottom_uvids] = True
+            self._variants[index] = data, top, bottom
+        return self._variants[index]
+
+    def bounds(self, index):
+        '''Get the width, height and center of a base flap.'''
+        return mesh.bounds(self.get(index)[0].points)
+
+    def shading_engine(self, index):
+        '''Get the shading engine assigned to a base flap.'''
+        return get_shading_engine(self.base_flaps[index])
+
+
+def create_flap_mesh(pool, choices, radius, name='flaps_geo'):
+    '''
+    Create the radially arranged flaps of a split flap as a single mesh from
+    a FlapVariantPool. Flap i uses base flap choices[i], its top uvs are
+    shifted to the udim of image i and its bottom uvs to image i + 1.
+
+    :param pool: FlapVariantPool
+    :param choices: Base flap index of every image, see FlapVariantPool.choose
+    :param radius: Radius of arrangement
+    :param name: Name of the mesh transform
+    '''
+
+    num_flaps = len(choices)
+    matrices = layout.radial_matrices(num_flaps, radius)
+    udims = np.array([index_to_udim(i, num_flaps)
+                      for i in range(num_flaps + 1)])
+    choices = np.asarray(choices)
+
+    parts = []
+    for index in np.unique(choices).tolist():
+        data, top, bottom = pool.get(index)
+        images = np.flatnonzero(choices == index)
+        uvs = np.repeat(data.uvs[None], len(images), axis=0)
+        uvs[:, top] += udims[images][:, None]
+        uvs[:, bottom] += udims[images + 1][:, None]
+        for image, points, image_uvs in zip(
+                images,
+                layout.transform_points(data.points, matrices[images]),
+                uvs):
+            parts.append((image, mesh.MeshData(
+                points,
+                data.counts,
+                data.connects,
+                image_uvs,
+                data.uv_connects
+            )))
+
+    parts.sort(key=lambda part: part[0])
+    data = mesh.combine([part for _, part in parts])
+    return create_mesh(
+        data,
+        name,
+        shading_engine=pool.shading_engine(int(choices[0]))
+    )
 
 
 def radial_arrangement(transforms, radius):
@@ -266,22 +625,160 @@ def radial_arrangement(transforms, radius):
     :param radius: Radius of arrangement
     '''
 
-    ProgressBar.setup(
-        title='Arranging Flaps',
-        text='Arranging Flaps...',
-        maximum=len(transforms),
-        parent=utils.get_maya_window()
-    )
+    num_transforms = len(transforms)
+    rotations = np.zeros((num_transforms, 3))
+    rotations[:, 0] = layout.radial_angles(num_transforms)
+    translations = layout.radial_translations(num_transforms, radius)
+    set_transforms(transforms, translations, rotations)
+
+
+def set_transforms(transforms, translations=None, rotations=None):
+    '''
+    Set the translate and rotate of many transforms with one MDGModifier.
+
+    :param transforms: List of pymel.PyNode transforms
+    :param translations: Sequence of (x, y, z) translations
+    :param rotations: Sequence of (x, y, z) rotations in degrees
+    '''
+
+    selection = OpenMaya.MSelectionList()
+    for transform in transforms:
+        selection.add(transform.name())
+
+    values = []
+    if translations is not None:
+        values.append(('translate', np.asarray(translations, dtype=float)))
+    if rotations is not None:
+        values.append(('rotate', np.radians(rotations)))
+
+    modifier = OpenMaya.MDGModifier()
+    for i in range(selection.length()):
+        node = OpenMaya.MFnDependencyNode(selection.getDependNode(i))
+        for attr, array in values:
+            for axis, value in zip('XYZ', array[i].tolist()):
+                plug = node.findPlug(attr + axis, False)
+                modifier.newPlugValueDouble(plug, value)
+    modifier.doIt()
+
 
-    rotate_step = 360 / len(transforms)
-    radians = math.pi / 180
+def get_mobject(name):
+    '''Get the OpenMaya.MObject of a node name.'''
 
-    for i, t in enumerate(transforms):
-        ProgressBar.set(i + 1)
-        rx = rotate_step * i
-        theta = rx * radians
-        translation = [0, math.cos(theta) * radius, -math.sin(theta) * radius]
-        pm.xform(t, rotation=[-rx, 0, 0], translation=translation)
+    selection = OpenMaya.MSelectionList()
+    selection.add(name)
+    return selection.getDependNode(0)
+
+
+def create_dag_nodes(node_type, names, parents):
+    '''
+    Create many DAG nodes with one MDagModifier.
+
+    :param node_type: Type of node to create
+    :param names: Name of every node
+    :param parents: OpenMaya.MObject parent of every node
+    :returns: List of OpenMaya.MObject
+    '''
+
+    modifier = OpenMaya.MDagModifier()
+    nodes = []
+    for name, parent in zip(names, parents):
+        node = modifier.createNode(node_type, parent)
+        modifier.renameNode(node, name)
+        nodes.append(node)
+    modifier.doIt()
+    return nodes
+
+
+def find_plug(node, name):
+    '''
+    Get a plug of an OpenMaya.MObject, array elements and compound children
+    are given like "inTransforms[0].inMatrix".
+    '''
+
+    fn_node = OpenMaya.MFnDependencyNode(node)
+    plug = None
+    for part in name.split('.'):
+        attr, _, index = part.partition('[')
+        if plug is None:
+            plug = fn_node.findPlug(attr, False)
+        else:
+            plug = plug.child(fn_node.attribute(attr))
+        if index:
+            plug = plug.elementByLogicalIndex(int(index.rstrip(']')))
+    return plug
+
+
+def connect_plugs(connections):
+    '''
+    Connect many plugs with one MDGModifier.
+
+    :param connections: List of (source, destination) OpenMaya.MPlug
+    '''
+
+    modifier = OpenMaya.MDGModifier()
+    for source, destination in connections:
+        modifier.connect(source, destination)
+    modifier.doIt()
+
+
+def key_plugs(plugs, frames, values):
+    '''
+    Key many angle plugs with the same keys, one animCurveTA per plug.
+
+    :param plugs: List of OpenMaya.MPlug
+    :param frames: Frame of every key
+    :param values: Value of every key in degrees
+    '''
+
+    unit = OpenMaya.MTime.uiUnit()
+    times = OpenMaya.MTimeArray([OpenMaya.MTime(f, unit) for f in frames])
+    angles = OpenMaya.MDoubleArray(np.radians(values).tolist())
+    for plug in plugs:
+        curve = OpenMayaAnim.MFnAnimCurve()
+        curve.create(plug, OpenMayaAnim.MFnAnimCurve.kAnimCurveTA)
+        curve.addKeys(times, angles)
+
+
+def create_wall_deformer(geometry, num_cells, pivots, num_images):
+    '''
+    Create a splitFlapWallDeformer on a combined wall mesh whose vertices
+    are grouped by cell, like the polyUnite of every cell's flaps.
+
+    :param geometry: pymel.PyNode wall mesh
+    :param num_cells: Number of cells in the mesh
+    :param pivots: Sequence of (x, y, z) rotation pivot of every cell
+    :param num_images: Number of images per cell
+    :returns: pymel.PyNode deformer
+    '''
+
+    splitflap_nodes.load()
+
+    num_vertices = geometry.getShape(noIntermediate=True).numVertices()
+    if num_vertices % num_cells:
+        raise ValueError(
+            '{} vertices can not be split into {} cells'.format(
+                num_vertices,
+                num_cells
+            )
+        )
+    cells = np.repeat(np.arange(num_cells), num_vertices // num_cells)
+
+    deformer = pm.deformer(
+        geometry,
+        type=splitflap_nodes.WALL_DEFORMER,
+        name='wall_deformer#'
+    )[0]
+    deformer.numberOfImages.set(num_images)
+    get_plug = splitflap_nodes.get_plug
+    splitflap_nodes.set_int_array(
+        get_plug(deformer.vertexCells.name()),
+        cells
+    )
+    splitflap_nodes.set_vector_array(
+        get_plug(deformer.cellPivots.name()),
+        pivots
+    )
+    return deformer
 
 
 def create_wrap_deformer(influence, deformed, **kwargs):
@@ -293,17 +790,14 @@ def create_wrap_deformer(influence, deformed, **kwargs):
     :param kwargs: Wrap attribute values
     '''
 
-
-    pm.select(deformed, replace=True)
-
     kwargs.setdefault('weightThreshold', 0.0)
     kwargs.setdefault('maxDistance', 1.0)
     kwargs.setdefault('exclusiveBind', False)
     kwargs.setdefault('autoWeightThreshold', True)
     kwargs.setdefault('falloffMode', 1)
 
-    wrap = pm.deformer(type='wrap')[0]
-    for k, v in kwargs.iteritems():
+    wrap = pm.deformer(deformed, type='wrap')[0]
+    for k, v in kwargs.items():
         wrap.attr(k).set(v)
 
     if not influence.hasAttr('dropoff'):
@@ -338,44 +832,167 @@ def create_collider(flaps, radius):
     :param radius: Radius of inner wheel allows us to estimate collider geo
     '''
 
-    tx = flaps.boundingBox().width() * 0.5
-    ty = flaps.boundingBox().height() * 0.505 - radius
-    tz = radius * 1.08
-    tz2 = radius * 1.15
-    cubea, cubea_shape = pm.polyCube(width=0.2, height=0.05, depth=0.05)
-    cubeb, cubeb_shape = pm.polyCube(width=0.2, height=0.05, depth=0.05)
-    cubec, cubec_shape = pm.polyCube(width=0.2, height=0.05, depth=0.05)
-    cubed, cubed_shape = pm.polyCube(width=0.2, height=0.05, depth=0.05)
-    cubea.setTranslation([tx, ty, tz])
-    cubeb.setTranslation([-tx, ty, tz])
-    cubec.setTranslation([tx, -ty, -tz2])
-    cubed.setTranslation([-tx, -ty, -tz2])
-    merge_verts(cubea, 7, 5)
-    merge_verts(cubea, 6, 4)
-    merge_verts(cubeb, 7, 5)
-    merge_verts(cubeb, 6, 4)
-    merge_verts(cubec, 3, 1)
-    merge_verts(cubec, 2, 0)
-    merge_verts(cubed, 3, 1)
-    merge_verts(cubed, 2, 0)
-    collider = pm.polyUnite(
-        [cubea, cubeb, cubec, cubed],
-        ch=False,
-        mergeUVSets=True,
-        name=flaps.replace('geo', 'collider_geo')
-    )[0]
-    return collider
+    bounds = flaps.boundingBox()
+    data = mesh.collider(bounds.width(), bounds.height(), radius)
+    return create_mesh(data, name=flaps.replace('geo', 'collider_geo'))
 
 
 def insert_parent(node):
     pass
 
 
-def merge_verts(mesh, a, b):
-    a = mesh.vtx[a]
-    b = mesh.vtx[b]
-    a.setPosition(b.getPosition(space='world'), space='world')
-    pm.polyMergeVertex([a, b], d=0.0000001)
+def get_nucleus():
+    '''Get the first nucleus in the scene, creating one when there is none.'''
+
+    nuclei = pm.ls(type='nucleus')
+    if nuclei:
+        return nuclei[0]
+    nucleus = pm.createNode('nucleus', name='nucleus1')
+    pm.PyNode('time1').outTime.connect(nucleus.currentTime)
+    return nucleus
+
+
+INT_TYPES = (
+    OpenMaya.MFnNumericData.kByte,
+    OpenMaya.MFnNumericData.kChar,
+    OpenMaya.MFnNumericData.kShort,
+    OpenMaya.MFnNumericData.kInt,
+    OpenMaya.MFnNumericData.kLong,
+)
+
+
+def set_plugs(values):
+    '''
+    Set many numeric plugs with one MDGModifier. Values are written with the
+    setter of the attribute's type, so ints can set float attributes.
+
+    :param values: List of (OpenMaya.MPlug, value)
+    '''
+
+    modifier = OpenMaya.MDGModifier()
+    for plug, value in values:
+        attribute = plug.attribute()
+        numeric_type = None
+        if attribute.hasFn(OpenMaya.MFn.kNumericAttribute):
+            fn_attribute = OpenMaya.MFnNumericAttribute(attribute)
+            numeric_type = fn_attribute.numericType()
+
+        if numeric_type == OpenMaya.MFnNumericData.kBoolean:
+            modifier.newPlugValueBool(plug, bool(value))
+        elif (numeric_type in INT_TYPES or
+                attribute.hasFn(OpenMaya.MFn.kEnumAttribute)):
+            modifier.newPlugValueInt(plug, int(value))
+        else:
+            modifier.newPlugValueDouble(plug, float(value))
+    modifier.doIt()
+
+
+def next_indices(plug, count):
+    '''Get count logical indices after the last element of an array plug.'''
+
+    indices = plug.getExistingArrayAttributeIndices()
+    start = max(indices) + 1 if len(indices) else 0
+    return list(range(start, start + count))
+
+
+def create_nucleus_objects(node_type, nodes, nucleus, **kwargs):
+    '''
+    Create and connect nCloth or nRigid shapes for many meshes at once with
+    OpenMaya modifiers, without the nClothCreate and nClothMakeCollide
+    runtime commands or changing the selection.
+
+    nCloth meshes get an output mesh shape driven by the nCloth, their
+    original shape becomes the intermediate input.
+
+    :param node_type: "nCloth" or "nRigid"
+    :param nodes: List of pymel.PyNode mesh transforms
+    :param nucleus: pymel.PyNode nucleus to solve them with
+    :param kwargs: Attribute values of every shape
+    :returns: (shapes, transforms) lists of pymel.PyNode
+    '''
+
+    active = node_type == 'nCloth'
+    names = [node.nodeName() for node in nodes]
+    mesh_shapes = [node.getShape(noIntermediate=True) for node in nodes]
+    transforms = create_dag_nodes(
+        'transform',
+        ['{}_{}'.format(name, node_type) for name in names],
+        [OpenMaya.MObject.kNullObj] * len(nodes)
+    )
+    shapes = create_dag_nodes(
+        node_type,
+        ['{}_{}Shape'.format(name, node_type) for name in names],
+        transforms
+    )
+    if active:
+        outputs = create_dag_nodes(
+            'mesh',
+            ['{}OutputShape'.format(name) for name in names],
+            [get_mobject(node.name()) for node in nodes]
+        )
+
+    nucleus_obj = get_mobject(nucleus.name())
+    out_time = find_plug(get_mobject('time1'), 'outTime')
+    inputs = 'inputActive' if active else 'inputPassive'
+    indices = next_indices(find_plug(nucleus_obj, inputs), len(nodes))
+
+    connections = []
+    values = []
+    for i, (shape, index) in enumerate(zip(shapes, indices)):
+        mesh_obj = get_mobject(mesh_shapes[i].name())
+        nucleus_input = '{}[{}]'.format(inputs, index)
+        nucleus_start = '{}Start[{}]'.format(inputs, index)
+        connections.extend([
+            (out_time, find_plug(shape, 'currentTime')),
+            (
+                find_plug(mesh_obj, 'worldMesh[0]'),
+                find_plug(shape, 'inputMesh')
+            ),
+            (
+                find_plug(shape, 'currentState'),
+                find_plug(nucleus_obj, nucleus_input)
+            ),
+            (
+                find_plug(shape, 'startState'),
+                find_plug(nucleus_obj, nucleus_start)
+            ),
+        ])
+        if active:
+            connections.extend([
+                (
+                    find_plug(nucleus_obj, 'outputObjects[{}]'.format(index)),
+                    find_plug(shape, 'nextState')
+                ),
+                (
+                    find_plug(nucleus_obj, 'startFrame'),
+                    find_plug(shape, 'startFrame')
+                ),
+                (
+                    find_plug(shape, 'outputMesh'),
+                    find_plug(outputs[i], 'inMesh')
+                ),
+            ])
+            values.append((find_plug(mesh_obj, 'intermediateObject'), True))
+        for attr, value in kwargs.items():
+            values.append((find_plug(shape, attr), value))
+
+    connect_plugs(connections)
+    set_plugs(values)
+
+    get_path = OpenMaya.MDagPath.getAPathTo
+    if active:
+        for node, mesh_shape, output in zip(nodes, mesh_shapes, outputs):
+            shading_engine = mesh_shape.listConnections(type='shadingEngine')
+            pm.sets(
+                shading_engine[0] if shading_engine else 'initialShadingGroup',
+                edit=True,
+                forceElement=get_path(output).fullPathName()
+            )
+
+    return (
+        [pm.PyNode(get_path(shape).fullPathName()) for shape in shapes],
+        [pm.PyNode(get_path(xform).fullPathName()) for xform in transforms],
+    )
 
 
 def make_nCloth(*args, **kwargs):
@@ -383,10 +1000,12 @@ def make_nCloth(*args, **kwargs):
     Convert nodes to nCloth objects
 
     :param args: List of pymel.PyNode transforms
-    :param kwargs: nCloth attribute values
+    :param kwargs: nCloth attribute values, and the nucleus to solve them
+        with (default: see get_nucleus)
     '''
 
     nodes = args
+    nucleus = kwargs.pop('nucleus', None) or get_nucleus()
     kwargs.setdefault('stretchResistance', 20)
     kwargs.setdefault('compressionResistance', 10)
     kwargs.setdefault('bendResistance', 0.6)
@@ -405,14 +1024,17 @@ def make_nCloth(*args, **kwargs):
     ramp.colorEntryList[1].color.set(0, 0, 0)
     ramp.interpolation.set(0)
 
-    with selection(nodes):
-        nClothCreate()
-        ncloth_shapes = pm.selected()
-        for ncloth in ncloth_shapes:
-            for attr, value in kwargs.iteritems():
-                ncloth.attr(attr).set(value)
-            ramp.outAlpha.connect(ncloth.inputAttractMap)
-        ncloth_transforms = [n.getParent() for n in ncloth_shapes]
+    ncloth_shapes, ncloth_transforms = create_nucleus_objects(
+        'nCloth',
+        nodes,
+        nucleus,
+        **kwargs
+    )
+    out_alpha = find_plug(get_mobject(ramp.name()), 'outAlpha')
+    connect_plugs([
+        (out_alpha, find_plug(get_mobject(n.name()), 'inputAttractMap'))
+        for n in ncloth_shapes
+    ])
 
     return ncloth_shapes, ncloth_transforms
 
@@ -422,26 +1044,32 @@ def make_nCollider(*args, **kwargs):
     Convert nodes to nRigid objects
 
     :param args: List of pymel.PyNode transforms
-    :param kwargs: nRigid attribute values
+    :param kwargs: nRigid attribute values, and the nucleus to solve them
+        with (default: see get_nucleus)
     '''
 
     nodes = args
+    nucleus = kwargs.pop('nucleus', None) or get_nucleus()
     kwargs.setdefault('collisionFlag', 3)
     kwargs.setdefault('collideStrength', 0.5)
     kwargs.setdefault('thickness', 0.005)
 
-    with selection(nodes):
-        nClothMakeCollide()
-        collider_shapes = pm.selected()
-        for collider in collider_shapes:
-            for attr, value in kwargs.iteritems():
-                collider.attr(attr).set(value)
-        collider_transforms = [c.getParent() for c in collider_shapes]
-
-    return collider_shapes, collider_transforms
+    return create_nucleus_objects('nRigid', nodes, nucleus, **kwargs)
 
 
 def create_copier(in_meshes, name='out_geo#', in_array=None, rotate=True):
+    '''
+    Copy meshes to the positions of a transforms array node. SOuP's nodes
+    are used when available, otherwise the splitflap_nodes plugin.
+
+    :param in_meshes: List of meshes to copy
+    :param name: Name of the output mesh transform
+    :param in_array: Existing transforms array node to connect
+    :param rotate: Rotate copies by the array's rotations
+    :returns: (out_xform, copier, array)
+    '''
+
+    copier_type, array_type = splitflap_nodes.node_types()
 
     # Create output mesh
     out_shape = pm.createNode('mesh')
@@ -449,7 +1077,7 @@ def create_copier(in_meshes, name='out_geo#', in_array=None, rotate=True):
     out_xform.rename(name)
 
     # Create copier node
-    copier = pm.createNode('copier')
+    copier = pm.createNode(copier_type)
     copier.orient.set(1)
     copier.toggleUV.set(1)
     copier.outputMesh.connect(out_shape.inMesh)
@@ -461,7 +1089,7 @@ def create_copier(in_meshes, name='out_geo#', in_array=None, rotate=True):
 
     if not in_array:
         # Connect input transforms
-        array = pm.createNode('transformsToArrays')
+        array = pm.createNode(array_type)
     else:
         array = in_array
 
@@ -472,6 +1100,30 @@ def create_copier(in_meshes, name='out_geo#', in_array=None, rotate=True):
     return out_xform, copier, array
 
 
+def time_frames(plugs, start, end):
+    '''
+    Measure the average time to evaluate plugs per frame. Time is changed
+    without updating the scene so only the graph upstream of plugs is
+    evaluated.
+
+    :param plugs: List of pymel.Attribute to evaluate
+    :param start: First frame
+    :param end: Last frame, inclusive
+    '''
+
+    current = pm.currentTime(query=True)
+    frames = range(int(start), int(end) + 1)
+    try:
+        s = time.time()
+        for frame in frames:
+            pm.currentTime(frame, update=False)
+            pm.dgeval(plugs)
+        elapsed = time.time() - s
+    finally:
+        pm.currentTime(current, update=True)
+    return elapsed / len(frames)
+
+
 def create_joint(name):
     pm.select(clear=True)
     return pm.joint(name=name)
@@ -0,0 +1,299 @@
+'''
+UV math for packing flaps into udim tiles and wall cells.
+
+Uvs are lists of (u, v) tuples as returned by utils.get_uvs. This module is
+pure Python so layouts can be planned outside Maya.
+'''
+from __future__ import division, print_function
+import math
+
+
+def get_uvs_in_range(uvs, u_min, v_min, u_max, v_max):
+    '''
+    Get the indices of uvs that fall within the specified uv range.
+
+    :param uvs: List of tuples representing uv values [(u, v)...]
+    :param u_min: Minimum u value
+    :param v_min: Minimum v value
+    :param u_max: Maximum u value
+    :param v_max: Maximum v value
+    '''
+
+    uvids = []
+    for i, (u, v) in enumerate(uvs):
+        if u_min < u < u_max and v_min < v < v_max:
+            uvids.append(i)
+    return uvids
+
+
+def get_row_col(index, max_index, num_columns):
+    '''
+    Get the row and coloumn for the specified index.
+
+    :param index: Index of item
+    :param max_index: Maximum number of items in loop
+    :param num_colums: Number of columns
+    '''
+
+    if max_index:
+        if index >= max_index:
+            index -= max_index
+
+    row = index/(num_columns)
+    col = index%(num_columns)
+    return math.floor(row), math.floor(col)
+
+
+def pack_uvs(uvs, uvids, i, rows, columns):
+    '''
+    Pack the specified uvs into a specific uv space based on index in a row,
+    column layout.
+
+    :param uvs: List of tuples representing uv values [(u, v)...]
+    :param uvids: List of uvids to shift [0, 2, 10...]
+    :param i: Layout index
+    :param rows: Number of rows in layout
+    :param columns: Number of columns in layout
+    '''
+    r, c = get_row_col(i, None, columns)
+    sx = 1 / columns
+    sy = 1 / rows
+
+    for uvid in uvids:
+        u, v = uvs[uvid]
+        u = u * sx + c * sx
+        v = v * sy + (1 - sy - r * sy)
+        uvs[uvid] = (u, v)
+
+
+def index_to_udim(i, max_i, columns=10):
+    '''
+    Convert index to udim column and row
+    '''
+
+    r, c = get_row_col(i, max_i, columns)
+    return c, r
+
+
+def shift_uvs(uvs, uvids, u_shift, v_shift):
+    '''
+    Shift the uvs matched uvids in place, by a specific u and v amount.
+
+    :param uvs: List of tuples representing uv values [(u, v)...]
+    :param uvids: List of uvids to shift [0, 2, 10...]
+    :param u_shift: Amount in u to shift
+    :param v_shift: Amount in v to shift
+    '''
+
+    for uvid in uvids:
+        u, v = uvs[uvid]
+        u += u_shift
+        v += v_shift
+        uvs[uvid] = (u, v)
+
+
+def udim_rows(num_images, columns=10):
+    '''
+    Get the number of udim rows holding one tile per image, see
+    index_to_udim.
+    '''
+
+    return int(math.ceil(num_images / columns))
+
+
+class CellPacking(object):
+    '''
+    Placement of every cell of a row, column layout in the udim tile of each
+    image. Regions of scale (u, v) fill a pack_rows x pack_columns grid from
+    the top left of a tile. When tiles is more than one, cells spill over
+    to copies of the image tiles stacked above them.
+
+    The default packing matches pack_uvs, a uniform 1 / columns x 1 / rows
+    region per cell. See dense for an aspect aware packing.
+
+    :param rows: Number of rows in layout
+    :param columns: Number of columns in layout
+    :param pack_rows: Number of rows of regions in a tile
+    :param pack_columns: Number of columns of regions in a tile
+    :param scale: (u, v) size of a region (default: fill the tile)
+    :param tiles: Number of udim tiles per image
+    :param num_images: Number of images, needed when tiles > 1
+    '''
+
+    def __init__(self, rows, columns, pack_rows=None, pack_columns=None,
+                 scale=None, tiles=1, num_images=None):
+        self.rows = rows
+        self.columns = columns
+        self.pack_rows = pack_rows or rows
+        self.pack_columns = pack_columns or columns
+        self.scale = tuple(scale or (
+            1 / self.pack_columns,
+            1 / self.pack_rows
+        ))
+        self.tiles = tiles
+        self.num_images = num_images
+        if self.pack_rows * self.pack_columns * tiles < self.num_cells:
+            raise ValueError('Packing does not fit every cell')
+        if tiles > 1 and not num_images:
+            raise ValueError('num_images is needed to pack multiple tiles')
+
+    @classmethod
+    def dense(cls, rows, columns, aspect, max_tiles=1, num_images=None):
+        '''
+        Pack cells with the aspect of the flaps, choosing the grid and number
+        of tiles that cover the most texels with flaps.
+
+        :param rows: Number of rows in layout
+        :param columns: Number of columns in layout
+        :param aspect: Width over height of the image shown by a cell, both
+            flap halves
+        :param max_tiles: Maximum number of udim tiles per image
+        :param num_images: Number of images, needed when max_tiles > 1
+        '''
+
+        num_cells = rows * columns
+        best = None
+        for tiles in range(1, max_tiles + 1):
+            per_tile = int(math.ceil(num_cells / tiles))
+            for pack_columns in range(1, per_tile + 1):
+                pack_rows = int(math.ceil(per_tile / pack_columns))
+                height = min(1 / pack_rows, 1 / (pack_columns * aspect))
+                coverage = num_cells * aspect * height ** 2 / tiles
+                key = (round(coverage, 9), -tiles)
+                if best is None or key > best[0]:
+                    best = key, pack_rows, pack_columns, height, tiles
+
+        _, pack_rows, pack_columns, height, tiles = best
+        return cls(
+            rows,
+            columns,
+            pack_rows,
+            pack_columns,
+            (aspect * height, height),
+            tiles,
+            num_images if tiles > 1 else None
+        )
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def to_dict(self):
+        return dict(
+            rows=self.rows,
+            columns=self.columns,
+            pack_rows=self.pack_rows,
+            pack_columns=self.pack_columns,
+            scale=list(self.scale),
+            tiles=self.tiles,
+            num_images=self.num_images,
+        )
+
+    @property
+    def num_cells(self):
+        return self.rows * self.columns
+
+    def coverage(self, aspect=None):
+        '''
+        Get the fraction of the texels of every tile covered by cells.
+
+        :param aspect: Width over height of the image shown by a cell. When
+            given, regions stretched from it only count the texels of their
+            lower resolution axis.
+        '''
+
+        su, sv = self.scale
+        if aspect:
+            sv = min(sv, su / aspect)
+            su = sv * aspect
+        return self.num_cells * su * sv / self.tiles
+
+    def region(self, index):
+        '''
+        Get the region of a cell.
+
+        :param index: Layout index of the cell
+        :returns: (tile, u, v) tile of the image the cell is on and the
+            bottom left corner of its region in the tile
+        '''
+
+        per_tile = self.pack_rows * self.pack_columns
+        tile, index = divmod(index, per_tile)
+        r, c = divmod(index, self.pack_columns)
+        su, sv = self.scale
+        return tile, c * su, 1 - (r + 1) * sv
+
+    def tile_offset(self, index):
+        '''
+        Get the v offset of the tile holding a cell's region, tiles past the
+        first are udim_rows(num_images) rows up.
+        '''
+
+        tile = self.region(index)[0]
+        if not tile:
+            return 0
+        return tile * udim_rows(self.num_images)
+
+    def offset(self, index):
+        '''
+        Get the (u, v) offset of a cell's region from the first image tile,
+        see tile_offset.
+        '''
+
+        _, u, v = self.region(index)
+        return u, v + self.tile_offset(index)
+
+    def cell_offsets(self, base_index=0):
+        '''
+        Get the (u, v) shift of every cell's uvs from the uvs of the cell at
+        base_index, in row, column order.
+        '''
+
+        base_u, base_v = self.offset(base_index)
+        offsets = []
+        for index in range(self.num_cells):
+            u, v = self.offset(index)
+            offsets.append((u - base_u, v - base_v))
+        return offsets
+
+    def pack(self, uvs, uvids, index):
+        '''
+        Pack uvs in the 0-1 range into the region of a cell in place, like
+        pack_uvs.
+
+        :param uvs: List of tuples representing uv values [(u, v)...]
+        :param uvids: List of uvids to pack [0, 2, 10...]
+        :param index: Layout index
+        '''
+
+        su, sv = self.scale
+        u_offset, v_offset = self.offset(index)
+        for uvid in uvids:
+            u, v = uvs[uvid]
+            uvs[uvid] = (u * su + u_offset, v * sv + v_offset)
+
+    def tile_regions(self, tile):
+        '''
+        Get the cells packed in a tile for rendering textures.
+
+        :returns: List of (index, source, target) where source is the
+            (x, y, width, height) of the cell in the full wall image and
+            target is its region in the tile, both normalized with y down
+        '''
+
+        su, sv = self.scale
+        per_tile = self.pack_rows * self.pack_columns
+        start = tile * per_tile
+        regions = []
+        for index in range(start, min(start + per_tile, self.num_cells)):
+            r, c = divmod(index, self.columns)
+            source = (
+                c / self.columns,
+                r / self.rows,
+                1 / self.columns,
+                1 / self.rows
+            )
+            _, u, v = self.region(index)
+            target = (u, 1 - v - sv, su, sv)
+            regions.append((index, source, target))
+        return regions
@@ -0,0 +1,287 @@
+'''
+Drive a SplitFlapWall from an image sequence.
+
+Frames are read one at a time, reduced to one color per cell and quantized
+to the nearest flap image. Only cells whose index differs from the previous
+frame produce keys on the wall's anim joints.
+'''
+from __future__ import division, print_function
+import math
+import re
+import numpy as np
+from Qt import QtGui, QtCore
+from maya.api import OpenMaya, OpenMayaAnim
+from . import utils
+from .timeline import StateTimeline
+
+
+def expand_sequence(pattern, start, end):
+    '''
+    Get the paths of an image sequence.
+
+    :param pattern: Path with a #### or %04d frame token
+    :param start: First frame
+    :param end: Last frame, inclusive
+    '''
+
+    match = re.search(r'#+', pattern)
+    if match:
+        padding = len(match.group(0))
+        pattern = pattern.replace(match.group(0), '%0{}d'.format(padding))
+
+    for frame in range(start, end + 1):
+        yield pattern % frame
+
+
+def image_to_array(image):
+    '''
+    Get an RGB numpy array of shape (height, width, 3) from a QImage.
+    '''
+
+    image = image.convertToFormat(QtGui.QImage.Format_RGB32)
+    width, height = image.width(), image.height()
+    bits = image.constBits()
+    if hasattr(bits, 'setsize'):
+        bits.setsize(image.byteCount())
+    pixels = np.frombuffer(bits, dtype=np.uint8)
+    pixels = pixels.reshape(height, image.bytesPerLine())[:, :width * 4]
+    return pixels.reshape(height, width, 4)[..., 2::-1].astype(np.float32)
+
+
+def read_frame(path, rows, columns, samples=4):
+    '''
+    Read an image reduced to the average color of each cell.
+
+    :param path: Image path
+    :param rows: Number of rows in layout
+    :param columns: Number of columns in layout
+    :param samples: Samples per cell along each axis
+    :returns: numpy array of shape (rows, columns, 3)
+    '''
+
+    image = QtGui.QImage(path)
+    if image.isNull():
+        raise IOError('Failed to read {}'.format(path))
+
+    image = image.scaled(
+        columns * samples,
+        rows * samples,
+        QtCore.Qt.IgnoreAspectRatio,
+        QtCore.Qt.SmoothTransformation
+    )
+    pixels = image_to_array(image)
+    pixels = pixels.reshape(rows, samples, columns, samples, 3)
+    return pixels.mean(axis=(1, 3))
+
+
+def read_frames(paths, rows, columns, samples=4):
+    '''
+    Generator reading one frame at a time, see read_frame.
+    '''
+
+    for path in paths:
+        yield read_frame(path, rows, columns, samples)
+
+
+def build_palette(images, rows, columns, samples=4):
+    '''
+    Build a palette from the flap images of a wall. Cell r, c of image i
+    holds the average color that cell shows when displaying image i.
+
+    :param images: Flap image paths in image index order
+    :returns: numpy array of shape (num_images, rows, columns, 3)
+    '''
+
+    return np.stack([
+        read_frame(image, rows, columns, samples) for image in images
+    ])
+
+
+def quantize(frame, palette):
+    '''
+    Get the index of the nearest palette entry for every cell.
+
+    :param frame: numpy array of shape (rows, columns, 3)
+    :param palette: Array of shape (num_images, 3) shared by all cells or
+        (num_images, rows, columns, 3) per cell
+    :returns: int numpy array of shape (rows, columns)
+    '''
+
+    frame = np.asarray(frame, dtype=np.float32)
+    palette = np.asarray(palette, dtype=np.float32)
+    if palette.ndim == 2:
+        distance = np.square(frame[:, :, None, :] - palette).sum(axis=-1)
+        return distance.argmin(axis=-1)
+
+    distance = np.square(palette - frame).sum(axis=-1)
+    return distance.argmin(axis=0)
+
+
+def iter_changes(frames, palette, start=1, step=1):
+    '''
+    Generator yielding the cells that change between frames.
+
+    :param frames: Iterable of frames, see read_frames
+    :param palette: Palette, see quantize
+    :param start: Frame number of the first frame
+    :param step: Frames between consecutive frames
+    :returns: (frame, cells, indices) where cells are flat row, column
+        indices and indices the flap image each cell changes to
+    '''
+
+    previous = None
+    for i, frame in enumerate(frames):
+        indices = quantize(frame, palette).ravel()
+        if previous is None:
+            cells = np.arange(indices.size)
+        else:
+            cells = np.flatnonzero(indices != previous)
+        if cells.size:
+            yield start + i * step, cells, indices[cells]
+        previous = indices
+
+
+class WallKeyer(object):
+    '''
+    Collects flap index changes and writes them to the rotateX animCurves of
+    a SplitFlapWall's anim joints in one batch per joint. Cells start from
+    the image shown by their current rotation.
+
+    :param wall: SplitFlapWall object
+    :param num_images: Number of images (default: wall.number_of_images)
+    :param flip_frames: Frames a cell takes to reach a new image
+    '''
+
+    def __init__(self, wall, num_images=None, flip_frames=2):
+        self.joints = wall.anim_joints
+        self.num_images = num_images or wall.number_of_images.get()
+        self.flip_frames = flip_frames
+        step = 360 / self.num_images
+        self.rotations = [
+            utils.rotation_to_index(j.rotateX.get(), self.num_images) * step
+            for j in self.joints
+        ]
+        self.keys = [[] for _ in self.joints]
+        self.last_frames = [None] * len(self.joints)
+        self.start = None
+        self.flushed = set()
+
+    def add(self, frame, cells, indices):
+        '''
+        Add flap index changes at frame.
+
+        :param frame: Frame the cells start flipping
+        :param cells: Flat row, column indices of changed cells
+        :param indices: Flap image indices to change to
+        '''
+
+        if self.start is None:
+            self.start = frame
+
+        for cell, index in zip(cells.tolist(), indices.tolist()):
+            rotation = self.rotations[cell]
+            new_rotation = utils.advance_rotation(
+                rotation,
+                index,
+                self.num_images
+            )
+            if new_rotation == rotation:
+                continue
+
+            # Wait for a flip in progress, even one already flushed
+            keys = self.keys[cell]
+            start = frame
+            last = self.last_frames[cell]
+            if last is not None and last >= start:
+                start = last
+            else:
+                keys.append((start, rotation))
+            keys.append((start + self.flip_frames, new_rotation))
+            self.rotations[cell] = new_rotation
+            self.last_frames[cell] = start + self.flip_frames
+
+    def flush(self):
+        '''
+        Write collected keys and forget them. The first flush replaces the
+        existing rotateX keys of every joint, joints without changes hold
+        their image from the first frame.
+        '''
+
+        unit = OpenMaya.MTime.uiUnit()
+        for cell, (joint, keys) in enumerate(zip(self.joints, self.keys)):
+            if cell not in self.flushed and not keys:
+                if self.start is None:
+                    continue
+                keys = [(self.start, self.rotations[cell])]
+                self.last_frames[cell] = self.start
+            if not keys:
+                continue
+
+            selection = OpenMaya.MSelectionList()
+            selection.add(joint.rotateX.name())
+            plug = selection.getPlug(0)
+
+            curves = OpenMayaAnim.MAnimUtil.findAnimation(plug)
+            if curves:
+                curve = OpenMayaAnim.MFnAnimCurve(curves[0])
+            else:
+                curve = OpenMayaAnim.MFnAnimCurve()
+                curve.create(plug, OpenMayaAnim.MFnAnimCurve.kAnimCurveTA)
+
+            times = OpenMaya.MTimeArray()
+            for frame, _ in keys:
+                times.append(OpenMaya.MTime(frame, unit))
+            values = [math.radians(value) for _, value in keys]
+            curve.addKeys(
+                times,
+                values,
+                OpenMayaAnim.MFnAnimCurve.kTangentLinear,
+                OpenMayaAnim.MFnAnimCurve.kTangentLinear,
+                cell in self.flushed,
+            )
+            self.flushed.add(cell)
+
+        self.keys = [[] for _ in self.joints]
+
+
+def drive_wall(wall, paths, palette, start=1, step=1, flip_frames=2,
+               samples=4, flush_frames=100):
+    '''
+    Key a SplitFlapWall to display an image sequence. Every change is also
+    recorded in a StateTimeline, the random-access state of the sequence.
+
+    :param wall: SplitFlapWall object
+    :param paths: Iterable of image paths, see expand_sequence
+    :param palette: Palette, see build_palette and quantize
+    :param start: Frame of the first image
+    :param step: Frames between images
+    :param flip_frames: Frames a cell takes to reach a new image
+    :param samples: Samples per cell along each axis
+    :param flush_frames: Write collected keys every flush_frames frames so
+        memory does not grow with the length of the sequence
+    :returns: StateTimeline of the image every cell is set to per frame,
+        its num_events is the number of cell changes keyed
+    '''
+
+    paths = list(paths)
+    rows = wall.number_of_rows.get()
+    columns = wall.number_of_columns.get()
+    num_images = palette.shape[0]
+    keyer = WallKeyer(wall, num_images, flip_frames)
+    timeline = StateTimeline(
+        [utils.rotation_to_index(r, num_images) for r in keyer.rotations],
+        start,
+        start + max(len(paths) - 1, 0) * step
+    )
+
+    flushed = start
+    frames = read_frames(paths, rows, columns, samples)
+    for frame, cells, indices in iter_changes(frames, palette, start, step):
+        keyer.add(frame, cells, indices)
+        timeline.add(frame, cells, indices)
+        if frame - flushed >= flush_frames:
+            keyer.flush()
+            flushed = frame
+
+    keyer.flush()
+    return timeline
@@ -0,0 +1,73 @@
+'''
+Canceling a build from the progress dialog rolls it back. Runs in mayapy.
+'''
+import pytest
+
+pm = pytest.importorskip('pymel.core')
+
+from Qt import QtWidgets
+from splitflap import utils
+from splitflap.models import SplitFlap
+from splitflap.ui import ProgressBar, BuildCanceled
+
+
+@pytest.fixture
+def app():
+    return (
+        QtWidgets.QApplication.instance() or
+        QtWidgets.QApplication(['splitflap'])
+    )
+
+
+@pytest.fixture
+def base_flap():
+    pm.newFile(force=True)
+    return pm.polyPlane(width=1, height=1, sx=1, sy=2, axis=(0, 0, 1))[0]
+
+
+def test_cancel_rolls_back(app, base_flap, monkeypatch):
+    setup = ProgressBar.setup
+
+    def setup_and_cancel(*args, **kwargs):
+        dialog = setup(*args, **kwargs)
+        dialog.cancel_button.click()
+        return dialog
+
+    monkeypatch.setattr(ProgressBar, 'setup', setup_and_cancel)
+    before = set(pm.ls())
+    with pytest.raises(BuildCanceled):
+        with ProgressBar.shown(), utils.tracked_build():
+            SplitFlap.create([base_flap], 4, 1, 1, 0.2)
+    assert set(pm.ls()) == before
+
+
+@pytest.mark.parametrize('calls', [4, 6])
+def test_cancel_mid_build_rolls_back(app, base_flap, monkeypatch, calls):
+    set_progress = ProgressBar.set
+    before = set(pm.ls())
+    created = []
+
+    def set_and_cancel(*args, **kwargs):
+        created.append(len(set(pm.ls()) - before))
+        if len(created) == calls:
+            ProgressBar._instance.cancel_button.click()
+        return set_progress(*args, **kwargs)
+
+    monkeypatch.setattr(ProgressBar, 'set', set_and_cancel)
+    with pytest.raises(BuildCanceled):
+        with ProgressBar.shown(), utils.tracked_build():
+            SplitFlap.create([base_flap], 4, 1, 1, 0.2)
+
+    # The click is seen by the set it happens in, after nodes were built
+    assert len(created) == calls
+    assert created[-1] > 0
+    assert set(pm.ls()) == before
+    assert not ProgressBar._canceled
+
+
+def test_suppressed_outside_shown(app, base_flap, monkeypatch):
+    monkeypatch.setattr(ProgressBar, '_instance', None)
+    with ProgressBar.shown():
+        pass
+    SplitFlap.create([base_flap], 4, 1, 1, 0.2)
+    assert ProgressBar._instance is None
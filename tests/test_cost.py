@@ -0,0 +1,53 @@
+import os
+import pytest
+from splitflap import cost
+
+
+PARAMS = [
+    dict(rows=r, columns=c, num_images=n, base_vertices=8, base_faces=6)
+    for r, c, n in [(2, 2, 10), (4, 8, 20), (10, 10, 40), (20, 30, 60)]
+]
+
+
+def test_node_counts_follow_rig_and_backend():
+    counts = dict(
+        (key, cost.features(4, 4, 10, 8, 6, *key)['nodes'])
+        for key in cost.NODES_PER_CELL
+    )
+    assert counts['matrix', 'openmaya'] < counts['constraint', 'pymel']
+    assert counts['constraint', 'pymel'] == 16 * 13 + cost.NODES_PER_WALL
+
+
+def test_calibrate_recovers_coefficients():
+    coefficients = {'cloth_vertices': 1e-5, 'cells': 2e-3, 'constant': 0.1}
+    timings = []
+    for params in PARAMS:
+        values = cost.features(**params)
+        frame_seconds = sum(
+            coefficients[n] * values[n] for n in coefficients
+        )
+        timings.append(dict(params=params, frame_seconds=frame_seconds))
+
+    calibrated = cost.calibrate(timings)
+    assert calibrated['frame_seconds'] == pytest.approx(coefficients)
+    assert calibrated['bytes'] == cost.DEFAULT_COEFFICIENTS['bytes']
+
+
+def test_record_timing_round_trip(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    cost.record_timing(PARAMS[0], 'timings.json', build_seconds=3.0)
+    cost.record_timing(PARAMS[1], 'timings.json', build_seconds=5.0)
+    timings = cost.load_timings('timings.json')
+    assert os.path.isfile(str(tmp_path / 'timings.json'))
+    assert [t['build_seconds'] for t in timings] == [3.0, 5.0]
+    assert timings[1]['params'] == PARAMS[1]
+
+
+def test_estimate_uses_coefficients():
+    model = cost.CostModel(cost.DEFAULT_COEFFICIENTS)
+    result = model.estimate(4, 4, 10, 8, 6, 'matrix', 'openmaya')
+    expected = sum(
+        cost.DEFAULT_COEFFICIENTS['bytes'][n] * result[n]
+        for n in cost.MODELS['bytes']
+    )
+    assert result['bytes'] == pytest.approx(expected)
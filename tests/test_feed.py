@@ -0,0 +1,75 @@
+import socket
+import time
+import pytest
+from splitflap import feed
+
+
+def test_parse_text():
+    assert feed.parse_update('  HELLO WORLD \n') == ('text', 'HELLO WORLD')
+    assert feed.parse_update('{"text": "HI"}') == ('text', 'HI')
+    assert feed.parse_update('   ') is None
+
+
+def test_parse_cells():
+    update = feed.parse_update('{"cells": {"0": 4, "12": "7"}}')
+    assert update == ('cells', {0: 4, 12: 7})
+    update = feed.parse_update('{"indices": [4, 7, 0]}')
+    assert update == ('cells', {0: 4, 1: 7, 2: 0})
+
+
+@pytest.mark.parametrize('line', [
+    '{"nope": 1}',
+    '{"cells": [1',
+    '{"cells": [1, 2]}',
+    '{"cells": {"0": "a"}}',
+    '{"indices": 5}',
+    '{"indices": [[1]]}',
+    '{"text": 5}',
+])
+def test_parse_malformed(line):
+    with pytest.raises(ValueError):
+        feed.parse_update(line)
+
+
+def test_parse_address():
+    assert feed.parse_address('localhost:5007') == ('localhost', 5007)
+    assert feed.parse_address(':80') == ('127.0.0.1', 80)
+    assert feed.parse_address('/tmp/wall.sock') == '/tmp/wall.sock'
+
+
+def wait_for(server, count, timeout=5):
+    updates = []
+    end = time.time() + timeout
+    while len(updates) < count and time.time() < end:
+        updates.extend(server.take())
+        time.sleep(0.01)
+    return updates
+
+
+def test_server_round_trip():
+    server = feed.FeedServer(('127.0.0.1', 0))
+    address = server.start()
+    try:
+        feed.send(address, [
+            'HELLO',
+            {'cells': [1, 2]},
+            {'cells': {'3': 12}},
+            '{"bad"',
+        ])
+        updates = wait_for(server, 2)
+    finally:
+        server.stop()
+    assert updates == [('text', 'HELLO'), ('cells', {3: 12})]
+
+
+def test_server_skips_undecodable_lines():
+    server = feed.FeedServer(('127.0.0.1', 0))
+    address = server.start()
+    try:
+        sock = socket.create_connection(address)
+        sock.sendall(b'\xff\xfe\nWORLD\n')
+        sock.close()
+        updates = wait_for(server, 1)
+    finally:
+        server.stop()
+    assert updates == [('text', 'WORLD')]
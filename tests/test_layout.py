@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+from splitflap import layout
+
+
+@pytest.fixture
+def rotations():
+    return np.random.RandomState(0).uniform(-80, 80, (20, 3))
+
+
+@pytest.mark.parametrize('order', layout.ROTATE_ORDERS)
+def test_euler_round_trip(rotations, order):
+    matrices = layout.euler_matrices(rotations, order=order)
+    euler = layout.matrix_to_euler(matrices, order)
+    assert np.allclose(euler, rotations)
+
+
+@pytest.mark.parametrize('order', layout.ROTATE_ORDERS)
+def test_euler_order(rotations, order):
+    # Row vectors rotate about the first axis of the order first
+    matrices = [
+        layout.euler_matrices(
+            rotations * (np.arange(3) == 'xyz'.index(axis)),
+            order=order
+        )
+        for axis in order
+    ]
+    expected = np.matmul(np.matmul(*matrices[:2]), matrices[2])
+    result = layout.euler_matrices(rotations, order=order)
+    assert np.allclose(result, expected)
+
+
+def test_grid_translations():
+    translations = layout.grid_translations(2, 3, 1.5, 2)
+    assert translations[0].tolist() == [-1.5, 2, 0]
+    assert translations[-1].tolist() == [1.5, 0, 0]
+
+
+def test_chunk_cells():
+    chunks = layout.chunk_cells(10, 3)
+    assert [len(chunk) for chunk in chunks] == [4, 3, 3]
+    assert np.concatenate(chunks).tolist() == list(range(10))
+    assert len(layout.chunk_cells(2, 5)) == 2
+    assert len(layout.chunk_cells(2, 0)) == 1
+
+
+def test_rotate_points_x_matches_matrices():
+    rng = np.random.RandomState(0)
+    points = rng.uniform(-1, 1, (10, 3))
+    pivots = rng.uniform(-1, 1, (10, 3))
+    angles = rng.uniform(0, 360, 10)
+    matrices = layout.rotate_x_matrices(angles)
+    expected = np.array([
+        layout.transform_points([p - pivot], m[None])[0, 0] + pivot
+        for p, pivot, m in zip(points, pivots, matrices)
+    ])
+    result = layout.rotate_points_x(points, angles, pivots)
+    assert np.allclose(result, expected)
+
+
+def test_flap_matrices():
+    table = layout.LayoutTable(2, 2, 4, 0.5, 1, 1)
+    matrices = table.flap_matrices()
+    assert matrices.shape == (4, 4, 4, 4)
+    expected = np.matmul(table.radial[1], table.cell_matrix(1, 0))
+    assert np.allclose(matrices[2, 1], expected)
+
+
+def test_advance_rotation_turns_forward():
+    assert layout.advance_rotation(0, 2, 8) == 90
+    assert layout.advance_rotation(90, 1, 8) == 405
+    assert layout.advance_rotation(405, 1, 8) == 405
+    assert layout.rotation_to_index(405, 8) == 1
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+from splitflap import layout, mesh
+
+
+def face_normals(data):
+    faces = np.split(data.connects, np.cumsum(data.counts)[:-1])
+    normals = []
+    for face in faces:
+        a, b, c = data.points[face[:3]]
+        normals.append(np.cross(b - a, c - b))
+    return np.array(normals)
+
+
+def test_cube_faces_point_out():
+    data = mesh.cube((2, 1, 0.5), center=(1, 2, 3))
+    centers = np.array([
+        data.points[face].mean(axis=0)
+        for face in np.split(data.connects, np.cumsum(data.counts)[:-1])
+    ])
+    outward = (face_normals(data) * (centers - (1, 2, 3))).sum(axis=1)
+    assert (outward > 0).all()
+
+
+def test_cube_matches_poly_cube():
+    pm = pytest.importorskip('pymel.core')
+    pm.newFile(force=True)
+    shape = pm.polyCube(width=2, height=1, depth=0.5)[0].getShape()
+    data = mesh.cube((2, 1, 0.5))
+    points = [tuple(p) for p in shape.getPoints()]
+    assert np.allclose(points, data.points)
+    for i, face in enumerate(mesh.CUBE_FACES):
+        assert tuple(shape.f[i].getVertices()) == face
+
+
+def test_plane():
+    data = mesh.plane(2, 4, (0, 1, 0), 2, 3)
+    assert data.num_vertices == 12
+    assert data.num_faces == 6
+    assert np.allclose(data.points.min(axis=0), (-1, -1, 0))
+    assert np.allclose(data.points.max(axis=0), (1, 3, 0))
+    uvs = data.points[:, :2] * (0.5, 0.25) + (0.5, 0.25)
+    assert np.allclose(data.uvs, uvs)
+    assert (face_normals(data)[:, 2] > 0).all()
+
+
+def test_copies_match_transformed_points():
+    data = mesh.plane(1, 1)
+    matrices = layout.grid_matrices(2, 3, 1.5, 2)
+    result = mesh.copies(data, matrices)
+    assert result.num_faces == 6
+    assert result.num_uvs == 6 * data.num_uvs
+    expected = layout.transform_points(data.points, matrices)
+    assert np.allclose(result.points, expected.reshape(-1, 3))
+    assert result.connects.max() == result.num_vertices - 1
+
+
+def test_combine_offsets_faces():
+    a = mesh.plane(1, 1)
+    b = mesh.cube((1, 1, 1))
+    result = mesh.combine([a, b])
+    assert result.num_vertices == a.num_vertices + b.num_vertices
+    assert result.connects[4:].min() == a.num_vertices
+    assert result.uvs is None
+
+
+def test_merge_vertices_removes_collapsed_faces():
+    data = mesh.merge_vertices(mesh.cube((1, 1, 1)), [(7, 5), (6, 4)])
+    assert data.num_vertices == 6
+    assert data.num_faces == 5
+    assert data.counts.tolist().count(3) == 2
+
+
+def test_card_flaps_are_double_sided():
+    cloth = mesh.cloth_flaps(1, 0.5, (0, 0.25, 0), 4, 0.1)
+    cards, flaps, top = mesh.card_flaps(cloth, 4)
+    assert cards.num_faces == 2 * cloth.num_faces
+    normals = face_normals(cards)
+    front, back = normals[:cloth.num_faces], normals[cloth.num_faces:]
+    assert np.allclose(front, -back)
+    expected = np.tile(np.repeat(np.arange(4), cloth.num_uvs // 4), 2)
+    assert np.array_equal(flaps, expected)
+    assert top.sum() == cloth.num_uvs
@@ -0,0 +1,11 @@
+import splitflap
+
+
+def test_core_modules_import():
+    for name in ('layout', 'uv', 'mesh', 'timeline', 'stream', 'feed'):
+        assert hasattr(splitflap, name)
+
+
+def test_unknown_names_raise_attribute_error():
+    assert not hasattr(splitflap, 'anything')
+    assert getattr(splitflap, 'x', None) is None
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from splitflap import shading
+
+
+@pytest.fixture
+def faces():
+    # One quad per image in the udim tile of its image
+    num_images = 12
+    quad = np.array([(0.1, 0.2), (0.4, 0.2), (0.4, 0.5), (0.1, 0.5)])
+    tiles = shading.image_udims(np.arange(num_images))
+    uvs = (quad[None] + tiles[:, None]).reshape(-1, 2)
+    counts = np.full(num_images, 4)
+    return uvs, counts, np.arange(len(uvs)), num_images
+
+
+def test_split_uvs_round_trip(faces):
+    uvs, counts, uv_connects, num_images = faces
+    canonical, images = shading.split_uvs(
+        uvs, counts, uv_connects, num_images
+    )
+    assert images.tolist() == list(range(num_images))
+    assert canonical.max() < 1
+    uv_images = np.repeat(images, counts)
+    assert np.allclose(canonical + shading.image_udims(uv_images), uvs)
+
+
+def test_split_uvs_outside_tiles(faces):
+    uvs, counts, uv_connects, num_images = faces
+    with pytest.raises(ValueError):
+        shading.split_uvs(uvs, counts, uv_connects, num_images - 1)
+
+
+def test_offset_table():
+    offsets = [(0, 0), (0.5, -0.25)]
+    orders = [[0, 1, 2], [2, 0, 1]]
+    table = shading.offset_table(offsets, orders, 3)
+    ids = shading.offset_ids([1, 1, 0], [0, 2, 1], [4, 4, 4], 3)
+    assert table.shape == (6, 2)
+    assert np.allclose(table[ids[0]], (2.5, -0.25))
+    assert np.allclose(table[ids[4]], (1.5, -0.25))
+    assert np.allclose(table[ids[8]], (1, 0))
+
+
+def test_face_cells():
+    counts = [4, 4, 4]
+    connects = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11]
+    assert shading.face_cells(counts, connects, 12, 3).tolist() == [0, 1, 2]
+    with pytest.raises(ValueError):
+        shading.face_cells(counts, connects, 12, 5)
+
+
+def test_cell_orders():
+    assert shading.cell_orders(None, 2, 3).tolist() == [[0, 1, 2]] * 2
+    with pytest.raises(ValueError):
+        shading.cell_orders([0, 1, 3], 2, 3)
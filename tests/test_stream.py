@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+from splitflap import stream
+
+
+@pytest.fixture
+def frames():
+    # Sparse changes like a wall flipping a few cells per frame
+    rng = np.random.RandomState(0)
+    angles = np.zeros((50, 30))
+    for i in range(1, len(angles)):
+        angles[i] = angles[i - 1]
+        cells = rng.choice(30, 3, replace=False)
+        angles[i, cells] = rng.uniform(0, 360, 3)
+    return angles
+
+
+@pytest.fixture
+def path(tmp_path, frames):
+    path = str(tmp_path / 'wall.sflp')
+    with stream.StreamWriter(path, 30, start_frame=10,
+                             keyframe_interval=8) as writer:
+        for angles in frames:
+            writer.add_frame(angles.tolist())
+    return path
+
+
+def quantized(angles):
+    return [stream.quantize_angle(angle) for angle in angles]
+
+
+def test_varint_round_trip():
+    for value in (0, 1, 127, 128, 300, 2 ** 32):
+        out = bytearray()
+        stream.encode_varint(value, out)
+        assert stream.decode_varint(bytes(out), 0) == (value, len(out))
+
+
+def test_header(path, frames):
+    with stream.StreamReader(path) as reader:
+        assert len(reader) == len(frames)
+        assert reader.num_cells == 30
+        assert reader.start_frame == 10
+        assert reader.keyframe_interval == 8
+
+
+def test_dense_decode(path, frames):
+    with stream.StreamReader(path) as reader:
+        for i, angles in enumerate(frames):
+            assert list(reader.state(10 + i)) == quantized(angles)
+
+
+def test_seek_matches_dense_decode(path, frames):
+    order = np.random.RandomState(1).permutation(len(frames))
+    with stream.StreamReader(path) as reader:
+        for i in order.tolist():
+            assert list(reader.state(10 + i)) == quantized(frames[i])
+
+
+def test_delta_records(path):
+    with stream.StreamReader(path) as reader:
+        is_key, cells, values = reader.changes(11)
+        assert not is_key
+        assert len(cells) == len(values) == 3
+        assert reader.changes(18)[0]
+
+
+def test_frame_out_of_range(path):
+    with stream.StreamReader(path) as reader:
+        with pytest.raises(IndexError):
+            reader.state(9)
+        with pytest.raises(IndexError):
+            reader.changes(60)
+
+
+def test_float_start_frame(tmp_path):
+    path = str(tmp_path / 'wall.sflp')
+    with stream.StreamWriter(path, 2, 1.0) as writer:
+        writer.add_frame([0, 90])
+    with stream.StreamReader(path) as reader:
+        assert reader.start_frame == 1
+        assert list(reader.state(1)) == quantized([0, 90])
+
+
+def test_fractional_start_frame(tmp_path):
+    with pytest.raises(ValueError):
+        stream.StreamWriter(str(tmp_path / 'wall.sflp'), 2, 1.5)
+
+
+def test_cell_count_mismatch(tmp_path):
+    with stream.StreamWriter(str(tmp_path / 'wall.sflp'), 3) as writer:
+        with pytest.raises(ValueError):
+            writer.add_frame([0, 90])
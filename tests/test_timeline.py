@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+from splitflap.timeline import StateTimeline
+
+
+@pytest.fixture
+def states():
+    rng = np.random.RandomState(0)
+    states = np.zeros((120, 20), dtype=np.int32)
+    for i in range(1, len(states)):
+        states[i] = states[i - 1]
+        cells = rng.choice(20, 2, replace=False)
+        states[i, cells] = rng.randint(0, 8, 2)
+    return states
+
+
+def replay(states, start=1, **kwargs):
+    timeline = StateTimeline(states[0], start, start + len(states) - 1,
+                             **kwargs)
+    for i in range(1, len(states)):
+        cells = np.flatnonzero(states[i] != states[i - 1])
+        timeline.add(start + i, cells, states[i, cells])
+    return timeline
+
+
+def test_from_states(states):
+    timeline = StateTimeline.from_states(states, 1, snapshot_interval=16)
+    assert len(timeline) == len(states)
+    assert np.array_equal(timeline.states(), states)
+
+
+def test_state_matches_replay(states):
+    timeline = replay(states, snapshot_interval=16, cache_size=4)
+    order = np.random.RandomState(1).permutation(len(states))
+    for i in order.tolist():
+        assert np.array_equal(timeline.state(1 + i), states[i])
+    assert np.array_equal(timeline.states(), states)
+
+
+def test_replay_matches_from_states(states):
+    timeline = replay(states)
+    dense = StateTimeline.from_states(states, 1)
+    assert timeline.num_events == dense.num_events
+    for frame in (2, 50, 120):
+        for a, b in zip(timeline.changes(frame), dense.changes(frame)):
+            assert np.array_equal(np.sort(a), np.sort(b))
+
+
+def test_later_changes_win():
+    timeline = StateTimeline([0, 0], 1, 10)
+    timeline.add(5, [0], [3])
+    timeline.add(5, [0], [4])
+    assert timeline.state(4).tolist() == [0, 0]
+    assert timeline.state(5).tolist() == [4, 0]
+
+
+def test_state_is_read_only(states):
+    timeline = StateTimeline.from_states(states, 1)
+    with pytest.raises(ValueError):
+        timeline.state(1)[0] = 1
+
+
+def test_from_rotations():
+    rotations = [[0, 45], [90, 360], [270, 314]]
+    timeline = StateTimeline.from_rotations(rotations, 8, 1)
+    assert timeline.states().tolist() == [[0, 1], [2, 0], [6, 7]]
+
+
+def test_frame_out_of_range(states):
+    timeline = StateTimeline.from_states(states, 1)
+    with pytest.raises(IndexError):
+        timeline.state(0)
+    with pytest.raises(IndexError):
+        timeline.add(121, [0], [1])
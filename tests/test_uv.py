@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from splitflap import uv
+
+
+@pytest.fixture
+def uvs():
+    return [(0.0, 0.0), (1.0, 0.0), (1.0, 1.0), (0.0, 1.0), (0.25, 0.75)]
+
+
+@pytest.mark.parametrize('rows, columns', [(1, 1), (3, 4), (5, 2)])
+def test_grid_matches_pack_uvs(uvs, rows, columns):
+    packing = uv.CellPacking(rows, columns)
+    uvids = list(range(len(uvs)))
+    for index in range(rows * columns):
+        expected = list(uvs)
+        uv.pack_uvs(expected, uvids, index, rows, columns)
+        packed = list(uvs)
+        packing.pack(packed, uvids, index)
+        assert np.allclose(packed, expected)
+
+
+def test_cell_offsets(uvs):
+    packing = uv.CellPacking(3, 4)
+    uvids = list(range(len(uvs)))
+    base = list(uvs)
+    packing.pack(base, uvids, 5)
+    for index, (du, dv) in enumerate(packing.cell_offsets(5)):
+        packed = list(uvs)
+        packing.pack(packed, uvids, index)
+        shifted = list(base)
+        uv.shift_uvs(shifted, uvids, du, dv)
+        assert np.allclose(shifted, packed)
+
+
+def test_dense_fits_every_cell():
+    packing = uv.CellPacking.dense(4, 16, 2.0)
+    assert packing.pack_rows * packing.pack_columns >= packing.num_cells
+    assert packing.coverage() > uv.CellPacking(4, 16).coverage(2.0)
+    for index in range(packing.num_cells):
+        tile, u, v = packing.region(index)
+        assert tile == 0
+        assert 0 <= u and u + packing.scale[0] <= 1 + 1e-9
+        assert 0 <= v and v + packing.scale[1] <= 1 + 1e-9
+
+
+def test_dense_spills_to_tiles():
+    packing = uv.CellPacking.dense(10, 10, 8.0, max_tiles=4, num_images=12)
+    assert packing.tiles > 1
+    last = packing.num_cells - 1
+    assert packing.tile_offset(last) == packing.region(last)[0] * 2
+
+
+def test_dict_round_trip():
+    packing = uv.CellPacking.dense(3, 7, 1.5)
+    copy = uv.CellPacking.from_dict(packing.to_dict())
+    assert copy.to_dict() == packing.to_dict()
+
+
+def test_packing_too_small():
+    with pytest.raises(ValueError):
+        uv.CellPacking(4, 4, pack_rows=2, pack_columns=2)
+
+
+def test_tile_regions_cover_cells():
+    packing = uv.CellPacking(2, 3)
+    regions = packing.tile_regions(0)
+    assert [index for index, _, _ in regions] == list(range(6))
+    index, source, target = regions[4]
+    assert source == pytest.approx((1 / 3, 0.5, 1 / 3, 0.5))
+    assert target == pytest.approx(source)
+
+
+def test_uvs_in_range(uvs):
+    assert uv.get_uvs_in_range(uvs, -0.5, -0.5, 0.5, 0.9) == [0, 4]